@@ -16,6 +16,25 @@ from routes import notifications_routes
 from routes.search_routes import router as search_routes
 from routes.listen_routes import router as listen_router
 from routes.likes import router as likes_router
+from routes.stream_routes import router as stream_router
+from services.search_index import search_index
+from services.catalog_cache import catalog_cache
+from database.async_db import close_async_client
+from database.db import close_client
+from utils.gemini_api import close_gemini_client
+from utils.media_validator import media_validator
+from services.media_upload import media_upload, MEDIA_STORAGE, LOCAL_MEDIA_ROOT
+from services.listen_ingestor import listen_ingestor
+from services.recommendation_engine import recommendation_engine
+from services.song_similarity import song_similarity
+from services.audio_features import audio_features
+from services.chart_service import chart_service
+from services.trending import trending
+from database.indexes import ensure_indexes
+from database.id_migration import id_migration
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import os
 
 # Optional routes (tồn tại ở nhánh quoc2210)
@@ -35,6 +54,9 @@ load_dotenv()
 app = FastAPI(title="VibeSync API")
 
 app.mount("/audio", StaticFiles(directory="audio"), name="audio")
+if MEDIA_STORAGE == "local":
+    # Media upload lưu local (dev / test)
+    app.mount("/media", StaticFiles(directory=LOCAL_MEDIA_ROOT, check_dir=False), name="media")
 
 # === CORS setup ===
 app.add_middleware(
@@ -53,6 +75,7 @@ app.include_router(chat_routes.router)
 app.include_router(recomment_routes.router, prefix="/api")
 app.include_router(history_songs_routes.router)
 app.include_router(listen_router)
+app.include_router(stream_router)
 app.include_router(playlist_routes.router, prefix="/api")
 app.include_router(albums_routes.router, prefix="/api")
 app.include_router(artist_routes.router, prefix="/api")
@@ -79,6 +102,97 @@ app.include_router(artist_profile_router, prefix="/api")
 app.include_router(artist_song_router, prefix="/api")
 app.include_router(artist_album_router, prefix="/api")
 
+# === Startup ===
+@app.on_event("startup")
+async def check_id_migration():
+    # UserRepository chỉ tìm user theo _id chuỗi: DB còn user _id ObjectId mà chưa chạy
+    # seeds_data/update/normalize_ids.py thì các user đó sẽ bị 401 → không cho app khởi động
+    try:
+        await run_in_threadpool(id_migration.check)
+    except PyMongoError as e:
+        print(f"[❌ ID MIGRATION] Check failed: {e}")
+
+@app.on_event("startup")
+async def build_search_index():
+    try:
+        await run_in_threadpool(search_index.build)
+    except Exception as e:
+        # Không chặn startup: SearchService sẽ fallback về regex Mongo
+        print(f"[❌ SEARCH INDEX] Build failed: {e}")
+    # Theo dõi thay đổi catalog từ ngoài app (change stream / polling)
+    catalog_cache.start()
+
+@app.on_event("startup")
+async def load_song_similarity():
+    # Nạp ma trận co-listen đã build offline; chưa có file thì build nền.
+    # Sau đó theo dõi file: build lại offline (seeds_data/update/build_song_similarity.py) được nạp không cần restart
+    async def rebuild():
+        try:
+            await run_in_threadpool(song_similarity.rebuild)
+        except Exception as e:
+            print(f"[❌ SONG SIMILARITY] Build failed: {e}")
+
+    try:
+        loaded = await run_in_threadpool(song_similarity.load)
+    except Exception as e:
+        print(f"[❌ SONG SIMILARITY] Load failed: {e}")
+        loaded = False
+    if not loaded:
+        asyncio.create_task(rebuild())
+    await song_similarity.start()
+
+@app.on_event("startup")
+async def load_audio_features():
+    # Đặc trưng âm thanh build offline (seeds_data/update/build_audio_features.py); chưa có file thì bỏ qua
+    try:
+        await run_in_threadpool(audio_features.load)
+    except Exception as e:
+        print(f"[❌ AUDIO FEATURES] Load failed: {e}")
+
+@app.on_event("startup")
+async def create_indexes():
+    # Index khai báo trong database/indexes.py (idempotent; lỗi không chặn startup)
+    try:
+        report = await run_in_threadpool(ensure_indexes)
+        for failure in report["failed"]:
+            print(f"[❌ INDEX] {failure}")
+    except Exception as e:
+        print(f"[❌ INDEX] Create failed: {e}")
+
+@app.on_event("startup")
+async def start_chart_refresh():
+    # Top 100 theo thể loại: tính lại khi lượt nghe đổi quá ngưỡng
+    await chart_service.start()
+
+@app.on_event("startup")
+async def start_trending():
+    # Dựng trending từ sự kiện gần đây rồi làm mới định kỳ (sự kiện mới được cộng ngay khi ghi)
+    await trending.start()
+
+@app.on_event("startup")
+async def start_listen_ingestor():
+    await listen_ingestor.start()
+
+@app.on_event("startup")
+async def start_recommendation_refresh():
+    # Refresh ứng viên gợi ý định kỳ (chỉ user có sự kiện mới; chỉ worker giữ lease chạy, RECOMMEND_REFRESH_IN_APP=false để chỉ chạy qua CLI)
+    await recommendation_engine.start()
+
+@app.on_event("shutdown")
+async def close_mongo_clients():
+    # Xả hàng đợi lượt nghe trước khi đóng kết nối
+    await listen_ingestor.stop()
+    await recommendation_engine.stop()
+    await song_similarity.stop()
+    await chart_service.stop()
+    await trending.stop()
+    catalog_cache.stop()
+    await close_gemini_client()
+    await media_validator.close()
+    media_upload.shutdown()
+    close_async_client()
+    close_client()
+
 # === Root endpoint ===
 @app.get("/")
 def root():
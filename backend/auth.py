@@ -3,7 +3,9 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
-from services.user_service import UserService
+from typing import Optional
+from services.user_service import UserService, user_principal_cache, banned_users
+from database.repositories.async_user_repository import AsyncUserRepository
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +16,9 @@ if not SECRET_KEY:
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 90
+# true = tin role / artist_id trong token (do /user/login ký), không đọc DB mỗi request;
+# trạng thái ban lấy từ banned_users (nạp lại sau AUTH_BAN_LIST_TTL giây), đổi role chỉ có hiệu lực với token mới
+TOKEN_CLAIMS_ONLY = os.getenv("AUTH_TOKEN_CLAIMS_ONLY", "false").lower() == "true"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login")
 
@@ -23,21 +28,38 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if not user_id:
-            raise credentials_exception
-        user = UserService.get_user_by_id(user_id)
-        if not user:
-            raise credentials_exception
+async def _load_user(user_id: str):
+    # Dùng Motor để không chặn event loop trong mỗi request có xác thực
+    user = await AsyncUserRepository.find_by_id(user_id)
+    return UserService._convert_to_user_in_db(user) if user else None
+
+async def _resolve_principal(payload: dict) -> Optional[dict]:
+    """
+    Thông tin user cho request:
+    - TOKEN_CLAIMS_ONLY: dựng từ claim trong token (sub, role, artist_id), không truy vấn user; banned lấy từ banned_users
+    - Mặc định: cache theo user_id (TTL ngắn, UserService xoá khi ban / đổi role / sửa hồ sơ), miss mới đọc DB
+    """
+    user_id = payload.get("sub")
+    if not user_id:
+        return None
+    if TOKEN_CLAIMS_ONLY and "role" in payload:
         return {
+            "id": user_id,
+            "name": None,
+            "email": None,
+            "role": payload["role"],
+            "avatar": None,
+            "banned": await banned_users.contains(user_id),
+            "verified": None,
+            "artist_id": payload.get("artist_id")
+        }
+
+    principal = user_principal_cache.get(user_id)
+    if principal is None:
+        user = await _load_user(user_id)
+        if not user:
+            return None
+        principal = {
             "id": user.id,
             "name": user.name,
             "email": user.email,
@@ -47,8 +69,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             "verified": user.verified,
             "artist_id": getattr(user, "artist_id", None)
         }
+        user_principal_cache.set(user_id, principal)
+    return dict(principal)  # bản sao: route có thể sửa dict mà không ảnh hưởng cache
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        user = await _resolve_principal(payload)
+        if not user:
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
+    # Token còn hạn nhưng tài khoản đã bị ban (giống kiểm tra lúc /user/login)
+    if user["banned"]:
+        raise HTTPException(status_code=403, detail="Account is banned")
+    return user
 
 
 async def get_current_admin(token: str = Depends(oauth2_scheme)):
@@ -73,19 +113,6 @@ async def get_optional_user(token: str = Security(bearer_scheme)):
         return None
     try:
         payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if not user_id:
-            return None
-        user = UserService.get_user_by_id(user_id)
-        if not user:
-            return None
-        return {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "role": user.role,
-            "avatar": user.avatar,
-            "banned": user.banned
-        }
+        return await _resolve_principal(payload)
     except JWTError:
         return None
@@ -0,0 +1,35 @@
+# database/async_db.py - MongoDB async (Motor) connection
+from typing import Optional
+from motor.motor_asyncio import AsyncIOMotorClient
+from database.db import mongo_uri, db_name, client_options
+
+_client = None
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """Client Motor dùng chung cho cả process (tạo lần đầu khi được gọi, cùng cấu hình với database/db.py)."""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(mongo_uri(), **client_options())
+    return _client
+
+
+def get_async_db():
+    return get_async_client()[db_name()]
+
+
+def get_async_collection(name: str):
+    return get_async_db()[name]
+
+
+def set_async_client(client: Optional[AsyncIOMotorClient]):
+    """Thay client đang dùng (test: mongod local hoặc stand-in in-memory)."""
+    global _client
+    _client = client
+
+
+def close_async_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
@@ -0,0 +1,219 @@
+# database/id_migration.py - chuẩn hoá kiểu id (string / ObjectId) trong các collection
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database.db import db, users_collection, migrations_collection
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "normalize_ids"
+VERSION = 1
+BATCH_SIZE = 1000
+
+# Kiểu chuẩn của từng field tham chiếu (theo kiểu mà code ghi hiện tại đang dùng)
+# "str" = chuỗi hex 24 ký tự, "oid" = ObjectId
+ID_SCHEMA: Dict[str, Dict[str, str]] = {
+    "songs": {"artistId": "str"},
+    "listen_song": {"user_id": "str", "song_id": "str", "artist_id": "str"},
+    "history": {"user_id": "oid", "song_id": "oid"},
+    "song_history": {"user_id": "oid", "song_id": "oid"},
+    "follows": {"user_id": "oid", "artist_id": "oid"},
+}
+USERS_STEP = "users._id"
+PARKED_EMAIL = "_migrating_email"  # email thật của bản cũ trong lúc chép sang _id mới (users.email là unique)
+DUPLICATE_KEY = 11000
+
+
+def _convert(value, target: str):
+    """Giá trị đã chuẩn hoá, hoặc None nếu không cần / không thể đổi."""
+    if target == "str" and isinstance(value, ObjectId):
+        return str(value)
+    if target == "oid" and isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+class IdMigration:
+    """
+    Migration 1 lần, có version và chạy tiếp được khi bị ngắt:
+    - users._id: ObjectId → string (UserRepository.create vẫn ghi _id dạng string)
+    - Các field trong ID_SCHEMA được đổi về đúng 1 kiểu, xử lý theo lô BATCH_SIZE, sắp theo _id
+    - Tiến độ từng bước (last_id, converted, done) lưu trong collection migrations sau mỗi lô;
+      chạy lại sẽ bỏ qua bước đã xong và tiếp tục từ last_id của bước đang dở
+    Sau khi chạy xong, repository chỉ cần đúng 1 truy vấn theo kiểu chuẩn.
+    """
+
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+
+    # ----------------------------
+    # Trạng thái
+    # ----------------------------
+    def status(self) -> Dict:
+        return migrations_collection.find_one({"_id": MIGRATION_ID}) or {"_id": MIGRATION_ID, "steps": {}}
+
+    def is_done(self) -> bool:
+        state = self.status()
+        return state.get("version") == VERSION and state.get("completed_at") is not None
+
+    @staticmethod
+    def legacy_users() -> int:
+        """Số user còn _id dạng ObjectId (repository chỉ tìm theo _id chuỗi → các user này không đăng nhập được)."""
+        return users_collection.count_documents({"_id": {"$type": "objectId"}})
+
+    def check(self):
+        """Gọi lúc startup: DB còn dữ liệu cũ mà migration chưa chạy xong thì không cho app chạy."""
+        if self.is_done():
+            return
+        legacy = self.legacy_users()
+        if legacy:
+            raise RuntimeError(
+                f"{legacy} users still have ObjectId _id and {MIGRATION_ID} v{VERSION} has not completed; "
+                "run `python -m seeds_data.update.normalize_ids` before starting the API"
+            )
+        logger.warning(f"[IdMigration] {MIGRATION_ID} v{VERSION} not recorded as completed (no legacy users found)")
+
+    def _step_state(self, step: str) -> Dict:
+        state = self.status()
+        if state.get("version") != VERSION:
+            return {}
+        return state.get("steps", {}).get(step.replace(".", ":"), {})
+
+    def _save_step(self, step: str, **fields):
+        migrations_collection.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {
+                "version": VERSION,
+                "updated_at": datetime.utcnow(),
+                **{f"steps.{step.replace('.', ':')}.{key}": value for key, value in fields.items()},
+            }},
+            upsert=True,
+        )
+
+    # ----------------------------
+    # Chạy
+    # ----------------------------
+    def run(self) -> Dict[str, int]:
+        """Chạy (hoặc chạy tiếp) toàn bộ migration. Trả về {bước: số document đã đổi}."""
+        if self.status().get("version") not in (None, VERSION):
+            # Version cũ → chạy lại từ đầu theo schema mới
+            migrations_collection.delete_one({"_id": MIGRATION_ID})
+
+        results = {USERS_STEP: self._migrate_user_ids()}
+        for collection, fields in ID_SCHEMA.items():
+            for field, target in fields.items():
+                step = f"{collection}.{field}"
+                results[step] = self._migrate_field(collection, field, target)
+
+        migrations_collection.update_one(
+            {"_id": MIGRATION_ID}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True
+        )
+        return results
+
+    def _migrate_user_ids(self) -> int:
+        """
+        users._id ObjectId → string: ghi bản sao với _id mới rồi xoá bản cũ (chạy lại an toàn).
+        Email của bản cũ được tạm đổi (giá trị thật giữ ở PARKED_EMAIL) để bản sao không trùng unique index users.email.
+        Chỉ bỏ qua insert khi bản sao _id chuỗi đã tồn tại; DuplicateKeyError khác (vd. 2 user trùng email) → dừng migration.
+        """
+        state = self._step_state(USERS_STEP)
+        if state.get("done"):
+            return state.get("converted", 0)
+        converted = state.get("converted", 0)
+
+        while True:
+            batch = list(users_collection.find({"_id": {"$type": "objectId"}}).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                break
+            for user in batch:
+                old_id = user["_id"]
+                copy = dict(user, _id=str(old_id))
+                email = copy.pop(PARKED_EMAIL, copy.get("email"))
+                if email is not None:
+                    copy["email"] = email
+
+                # Bản sao đã có → lần trước bị ngắt giữa insert và delete
+                if users_collection.find_one({"_id": copy["_id"]}, {"_id": 1}) is None:
+                    if email is not None:
+                        users_collection.update_one(
+                            {"_id": old_id},
+                            {"$set": {"email": f"migrating:{old_id}", PARKED_EMAIL: email}}
+                        )
+                    try:
+                        users_collection.insert_one(copy)
+                    except DuplicateKeyError as e:
+                        # Trả lại email cho bản cũ để user vẫn đăng nhập được, rồi dừng cho người vận hành xử lý
+                        if email is not None:
+                            users_collection.update_one(
+                                {"_id": old_id}, {"$set": {"email": email}, "$unset": {PARKED_EMAIL: ""}}
+                            )
+                        logger.error(f"[IdMigration] {USERS_STEP}: cannot copy user {old_id}: {e}")
+                        raise
+                users_collection.delete_one({"_id": old_id})
+                converted += 1
+            self._save_step(USERS_STEP, converted=converted, last_id=str(batch[-1]["_id"]))
+
+        self._save_step(USERS_STEP, converted=converted, done=True)
+        logger.info(f"[IdMigration] {USERS_STEP}: {converted} converted")
+        return converted
+
+    def _migrate_field(self, collection_name: str, field: str, target: str) -> int:
+        step = f"{collection_name}.{field}"
+        state = self._step_state(step)
+        if state.get("done"):
+            return state.get("converted", 0)
+        converted = state.get("converted", 0)
+        duplicates = state.get("duplicates", 0)
+        last_id: Optional[ObjectId] = state.get("last_id")
+
+        collection = db[collection_name]
+        wrong_type = "objectId" if target == "str" else "string"
+        while True:
+            query = {field: {"$type": wrong_type}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = list(collection.find(query, {field: 1}).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                break
+
+            ids, ops = [], []
+            for doc in batch:
+                value = _convert(doc.get(field), target)
+                if value is not None:
+                    ids.append(doc["_id"])
+                    ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {field: value}}))
+            if ops:
+                removed = self._bulk_convert(collection, ids, ops)
+                converted += len(ops) - removed
+                duplicates += removed
+            last_id = batch[-1]["_id"]
+            self._save_step(step, converted=converted, duplicates=duplicates, last_id=last_id)
+
+        self._save_step(step, converted=converted, duplicates=duplicates, done=True)
+        logger.info(f"[IdMigration] {step}: {converted} converted, {duplicates} duplicates removed")
+        return converted
+
+    @staticmethod
+    def _bulk_convert(collection, ids: List, ops: List[UpdateOne]) -> int:
+        """
+        Ghi 1 lô; document nào sau khi đổi kiểu trùng unique index với document đã đúng kiểu
+        (vd. follows (user_id, artist_id) lưu 2 lần với 2 kiểu id) là bản trùng → xoá bản đang đổi.
+        Trả về số document đã xoá; lỗi khác vẫn ném ra.
+        """
+        try:
+            collection.bulk_write(ops, ordered=False)
+            return 0
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY for error in errors):
+                raise
+            losers = [ids[error["index"]] for error in errors]
+            collection.delete_many({"_id": {"$in": losers}})
+            logger.warning(f"[IdMigration] {collection.name}: removed {len(losers)} duplicates {losers[:10]}")
+            return len(losers)
+
+
+id_migration = IdMigration()
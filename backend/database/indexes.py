@@ -0,0 +1,173 @@
+# database/indexes.py - khai báo tập trung các index Mongo mà repository / service cần
+import logging
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from database.db import db
+
+logger = logging.getLogger(__name__)
+
+
+def _index(keys, **options) -> IndexModel:
+    if isinstance(keys, str):
+        keys = [(keys, ASCENDING)]
+    options.setdefault("name", "_".join(f"{field}_{direction}" for field, direction in keys))
+    return IndexModel(keys, **options)
+
+
+# collection -> index cần có (tên index cố định để so sánh / tạo lại idempotent)
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        _index("email", unique=True),
+    ],
+    "songs": [
+        _index("artistId"),                                        # find_by_artist_id, delete_by_artist_id
+        _index([("album", ASCENDING), ("artistId", ASCENDING)]),   # find_by_album_id
+        _index("genre"),                                           # top100, genre_service, recommendation
+        _index("title"),                                           # find_by_title, sort theo title
+        _index([("releaseYear", DESCENDING)]),                     # fallback "bài mới nhất"
+        _index("updated_at"),                                      # catalog_cache.poll
+        _index("created_at"),
+    ],
+    "artists": [
+        _index("name"),
+        _index("updated_at"),
+        _index("created_at"),
+    ],
+    "albums": [
+        _index("artist_id"),
+        _index("title"),
+        _index("updated_at"),
+        _index("created_at"),
+    ],
+    "listen_song": [
+        _index([("song_id", ASCENDING), ("type", ASCENDING)]),
+        _index([("user_id", ASCENDING), ("song_id", ASCENDING)]),
+        _index("listened_at"),                                     # trending, thống kê theo ngày
+        _index("ingested_at"),                                     # refresh incremental gợi ý
+    ],
+    "listen_song_stats": [
+        _index([("listen_count", DESCENDING)]),
+        _index([("search_count", DESCENDING)]),
+        _index([("total_count", DESCENDING)]),
+    ],
+    "listen_artist_stats": [
+        _index([("listen_count", DESCENDING)]),
+        _index([("search_count", DESCENDING)]),
+    ],
+    "follows": [
+        _index([("user_id", ASCENDING), ("artist_id", ASCENDING)], unique=True),
+        _index("artist_id"),                                       # đếm follower
+        _index("followed_at"),
+    ],
+    "liked_songs": [
+        _index([("user_id", ASCENDING), ("song_id", ASCENDING)], unique=True),
+        _index("song_id"),                                         # count_likes
+        _index("liked_at"),
+    ],
+    "history": [
+        _index([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),  # phân trang keyset
+        _index([("user_id", ASCENDING), ("song_id", ASCENDING)]),  # kiểm tra trùng khi lưu
+        _index("timestamp"),
+    ],
+    "song_history": [
+        _index([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+        _index("timestamp"),
+    ],
+    "notifications": [
+        _index("user_id"),
+    ],
+    "chat_messages": [
+        _index([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "artist_requests": [
+        _index("user_id"),
+    ],
+}
+
+# Truy vấn đại diện để kiểm tra query plan (collection, filter, sort)
+_SAMPLE_ID = ObjectId()
+PROBES: List[Tuple[str, Dict, Optional[List]]] = [
+    ("users", {"email": "probe@example.com"}, None),
+    ("songs", {"artistId": str(_SAMPLE_ID)}, None),
+    ("songs", {"genre": "Pop"}, None),
+    ("songs", {"title": "probe"}, None),
+    ("listen_song", {"song_id": str(_SAMPLE_ID), "type": "listen"}, None),
+    ("listen_song", {"user_id": str(_SAMPLE_ID), "song_id": str(_SAMPLE_ID)}, None),
+    ("listen_song_stats", {"listen_count": {"$gt": 0}}, [("listen_count", DESCENDING)]),
+    ("follows", {"user_id": _SAMPLE_ID, "artist_id": _SAMPLE_ID}, None),
+    ("follows", {"artist_id": _SAMPLE_ID}, None),
+    ("liked_songs", {"user_id": str(_SAMPLE_ID), "song_id": str(_SAMPLE_ID)}, None),
+    ("history", {"user_id": _SAMPLE_ID}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("notifications", {"user_id": _SAMPLE_ID}, None),
+    ("chat_messages", {"user_id": str(_SAMPLE_ID)}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+]
+
+
+def ensure_indexes(collections: Optional[List[str]] = None) -> Dict[str, List[str]]:
+    """
+    Tạo các index còn thiếu (idempotent: index đã có cùng tên / cùng key thì Mongo bỏ qua).
+    Mỗi index tạo riêng để 1 index lỗi (dữ liệu trùng với unique, trùng key khác option...) không chặn các index khác.
+    Trả về {"created": [...], "failed": [...]}.
+    """
+    report = {"created": [], "failed": []}
+    for name, models in INDEXES.items():
+        if collections and name not in collections:
+            continue
+        existing = _existing_keys(name)
+        for model in models:
+            index_name = model.document["name"]
+            if _key_spec(model) in existing:
+                continue
+            try:
+                db[name].create_indexes([model])
+                report["created"].append(f"{name}.{index_name}")
+            except OperationFailure as e:
+                logger.error(f"[Indexes] {name}.{index_name} failed: {e}")
+                report["failed"].append(f"{name}.{index_name}: {e}")
+    logger.info(f"[Indexes] created {len(report['created'])}, failed {len(report['failed'])}")
+    return report
+
+
+def verify() -> Dict[str, List[str]]:
+    """Báo cáo index còn thiếu và truy vấn đại diện đang COLLSCAN."""
+    missing = []
+    for name, models in INDEXES.items():
+        existing = _existing_keys(name)
+        missing.extend(f"{name}.{m.document['name']}" for m in models if _key_spec(m) not in existing)
+
+    collscans = []
+    for name, query, sort in PROBES:
+        cursor = db[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        except OperationFailure as e:
+            collscans.append(f"{name} {query}: explain failed ({e})")
+            continue
+        if "COLLSCAN" in _stages(plan):
+            collscans.append(f"{name} {query}" + (f" sort={sort}" if sort else ""))
+    return {"missing": missing, "collscans": collscans}
+
+
+def _key_spec(model: IndexModel) -> tuple:
+    return tuple(model.document["key"].items())
+
+
+def _existing_keys(name: str) -> set:
+    try:
+        return {tuple(info["key"]) for info in db[name].index_information().values()}
+    except OperationFailure:
+        return set()  # collection chưa tồn tại
+
+
+def _stages(plan: Dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
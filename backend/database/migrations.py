@@ -0,0 +1,61 @@
+# database/migrations.py - các bản sửa dữ liệu chạy 1 lần, có ghi nhận (không chạy khi import db)
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple
+from database.db import albums_collection, migrations_collection
+
+logger = logging.getLogger(__name__)
+
+RECORD_PREFIX = "data:"  # _id trong collection migrations (tách khỏi state của id_migration)
+
+
+class Migration(NamedTuple):
+    name: str
+    description: str
+    apply: Callable[[], Dict]
+
+
+def _albums_cleanup() -> Dict:
+    """Trước đây chạy mỗi lần import database/db.py."""
+    cover_art = albums_collection.update_many({"cover_art": ""}, {"$set": {"cover_art": None}})
+    # release_year không hợp lệ → 2025
+    release_year = albums_collection.update_many({"release_year": {"$lt": 1900}}, {"$set": {"release_year": 2025}})
+    return {
+        "cover_art": cover_art.modified_count,
+        "release_year": release_year.modified_count,
+        "remaining_empty_cover_art": albums_collection.count_documents({"cover_art": ""}),
+        "remaining_invalid_release_year": albums_collection.count_documents({"release_year": {"$lt": 1900}}),
+    }
+
+
+# Thứ tự chạy; thêm migration mới vào cuối, không đổi tên migration đã chạy
+MIGRATIONS: List[Migration] = [
+    Migration("0001_albums_cover_art_release_year", "cover_art '' → null, release_year < 1900 → 2025", _albums_cleanup),
+]
+
+
+def applied() -> Dict[str, Dict]:
+    return {
+        doc["_id"][len(RECORD_PREFIX):]: doc
+        for doc in migrations_collection.find({"_id": {"$regex": f"^{RECORD_PREFIX}"}})
+    }
+
+
+def pending() -> List[Migration]:
+    done = applied()
+    return [m for m in MIGRATIONS if m.name not in done]
+
+
+def run_pending() -> Dict[str, Dict]:
+    """Chạy các migration chưa chạy theo thứ tự; dừng ở migration lỗi đầu tiên (lần sau chạy lại từ đó)."""
+    results = {}
+    for migration in pending():
+        logger.info(f"[Migrations] applying {migration.name}: {migration.description}")
+        result = migration.apply()
+        migrations_collection.update_one(
+            {"_id": RECORD_PREFIX + migration.name},
+            {"$set": {"description": migration.description, "result": result, "applied_at": datetime.utcnow()}},
+            upsert=True
+        )
+        results[migration.name] = result
+    return results
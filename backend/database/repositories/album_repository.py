@@ -3,6 +3,7 @@ from bson import ObjectId
 from bson.errors import InvalidId
 from typing import List, Optional, Dict
 from datetime import datetime
+from services.catalog_cache import catalog_cache
 
 class AlbumRepository:
     def __init__(self, collection=albums_collection):  # ✅ dùng default param
@@ -51,6 +52,7 @@ class AlbumRepository:
     def insert(album_data: Dict) -> str:
         try:
             result = albums_collection.insert_one(album_data)
+            catalog_cache.upsert("albums", album_data)
             return str(result.inserted_id)
         except Exception as e:
             raise ValueError(f"Failed to insert album: {str(e)}")
@@ -63,6 +65,8 @@ class AlbumRepository:
                 {"_id": AlbumRepository._validate_object_id(album_id)},
                 {"$set": update_data}
             )
+            if result.matched_count > 0:
+                catalog_cache.reload("albums", album_id)
             return result.matched_count > 0
         except Exception as e:
             raise ValueError(f"Failed to update album: {str(e)}")
@@ -71,6 +75,8 @@ class AlbumRepository:
     def delete(album_id: str) -> bool:
         try:
             result = albums_collection.delete_one({"_id": AlbumRepository._validate_object_id(album_id)})
+            if result.deleted_count > 0:
+                catalog_cache.remove("albums", album_id)
             return result.deleted_count > 0
         except Exception as e:
             raise ValueError(f"Failed to delete album: {str(e)}")
@@ -79,6 +85,7 @@ class AlbumRepository:
     def delete_by_artist_id(artist_id: ObjectId) -> bool:
         try:
             result = albums_collection.delete_many({"artist_id": str(artist_id)})
+            catalog_cache.remove_by_owner("albums", artist_id)
             return result.deleted_count > 0
         except Exception as e:
             raise ValueError(f"Failed to delete albums by artist_id: {str(e)}")
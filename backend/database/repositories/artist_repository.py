@@ -1,7 +1,12 @@
 from database.db import artists_collection
 from bson import ObjectId
-from typing import List, Optional
-from difflib import get_close_matches
+from typing import List, Optional, Dict, Iterable
+from services.catalog_cache import catalog_cache
+from services.fuzzy_index import catalog_fuzzy
+from utils.ttl_cache import TTLCache
+
+# Cache artistId -> tên nghệ sĩ (dùng khi map bài hát)
+artist_name_cache = TTLCache(maxsize=4096, ttl=300)
 
 class ArtistRepository:
     def __init__(self):
@@ -19,28 +24,50 @@ class ArtistRepository:
     def find_by_id(self, artist_id: ObjectId) -> Optional[dict]:
         return self.collection.find_one({"_id": artist_id})
 
+    def find_names_by_ids(self, artist_ids: Iterable) -> Dict[str, str]:
+        """Tên nghệ sĩ theo id: lấy từ cache, phần còn thiếu gom vào 1 truy vấn $in."""
+        keys = {str(a) for a in artist_ids if a and ObjectId.is_valid(str(a))}
+        names = artist_name_cache.get_many(keys)
+        missing = [ObjectId(k) for k in keys if k not in names]
+        if missing:
+            for artist in self.collection.find({"_id": {"$in": missing}}, {"name": 1}):
+                name = artist.get("name", "")
+                names[str(artist["_id"])] = name
+                artist_name_cache.set(str(artist["_id"]), name)
+        return names
+
     def insert_one(self, artist_dict: dict):
-        return self.collection.insert_one(artist_dict)
+        result = self.collection.insert_one(artist_dict)
+        catalog_cache.upsert("artists", artist_dict)
+        return result
 
     def update_one(self, artist_id: ObjectId, update_data: dict):
-        return self.collection.update_one({"_id": artist_id}, {"$set": update_data})
+        result = self.collection.update_one({"_id": artist_id}, {"$set": update_data})
+        artist_name_cache.pop(str(artist_id))
+        catalog_cache.reload("artists", artist_id)
+        return result
 
     def update(self, artist_id: str, update_data: dict):
         return self.update_one(ObjectId(artist_id), update_data)
 
     def delete_one(self, artist_id: ObjectId):
-        return self.collection.delete_one({"_id": artist_id})
+        result = self.collection.delete_one({"_id": artist_id})
+        artist_name_cache.pop(str(artist_id))
+        catalog_cache.remove("artists", artist_id)
+        return result
     
     def get_similar_artists(self, query: str, limit=5) -> List[dict]:
-        all_artists = list(self.collection.find({}, {"name": 1}))  # chỉ lấy name và _id
-        artist_names = [a["name"] for a in all_artists]
-        matches = get_close_matches(query, artist_names, n=limit, cutoff=0.6)
-    
-        matched_artists = [a for a in all_artists if a["name"] in matches]
-        return matched_artists
+        # Trigram index trên catalog (chỉ trả về name và _id như trước)
+        return [
+            {"_id": ObjectId(artist["_id"]), "name": artist.get("name", "")}
+            for _, artist in catalog_fuzzy.search("artists", query, limit=limit, cutoff=0.6)
+        ]
 
     def update_by_id(self, artist_id: ObjectId, update_dict: dict):
-        return self.collection.update_one({"_id": artist_id}, {"$set": update_dict})
+        result = self.collection.update_one({"_id": artist_id}, {"$set": update_dict})
+        artist_name_cache.pop(str(artist_id))
+        catalog_cache.reload("artists", artist_id)
+        return result
     
     def get_all_names(self):
         # Trả về danh sách tất cả tên nghệ sĩ (chuẩn hóa)
@@ -0,0 +1,49 @@
+from database.async_db import get_async_collection
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+
+
+class AsyncChatRepository:
+    """Phiên bản async (Motor) của ChatRepository cho các route chat."""
+
+    @staticmethod
+    def _collection():
+        return get_async_collection("chat_messages")
+
+    @staticmethod
+    async def insert_messages(user_id: str, messages: List[Dict]):
+        """Lưu các tin nhắn theo đúng thứ tự (timestamp tăng 1ms cho mỗi tin cùng lượt — BSON date chỉ chính xác tới ms)."""
+        now = datetime.utcnow()
+        docs = [
+            {
+                "user_id": str(user_id),
+                "sender": message["sender"],
+                "text": message["text"],
+                "timestamp": now + timedelta(milliseconds=i),
+            }
+            for i, message in enumerate(messages)
+        ]
+        if docs:
+            await AsyncChatRepository._collection().insert_many(docs)
+
+    @staticmethod
+    async def find_page(user_id: str, limit: int, before: Optional[Tuple[datetime, ObjectId]] = None) -> List[Dict]:
+        """Tối đa `limit` tin nhắn cũ hơn mốc `before` (timestamp, _id), mới nhất trước."""
+        query = {"user_id": str(user_id)}
+        if before:
+            ts, message_id = before
+            query["$or"] = [
+                {"timestamp": {"$lt": ts}},
+                {"timestamp": ts, "_id": {"$lt": message_id}},
+            ]
+        return await AsyncChatRepository._collection().find(query).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(limit).to_list(length=limit)
+
+    @staticmethod
+    async def delete_by_user(user_id: str) -> int:
+        result = await AsyncChatRepository._collection().delete_many({"user_id": str(user_id)})
+        # Xoá luôn document kiểu cũ (nếu chưa migrate)
+        legacy = await get_async_collection("chat_history").delete_one({"user_id": user_id})
+        return result.deleted_count + legacy.deleted_count
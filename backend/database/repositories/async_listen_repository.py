@@ -0,0 +1,19 @@
+from database.async_db import get_async_collection
+
+
+class AsyncListenRepository:
+    """Đọc bộ đếm lượt nghe bằng Motor (ghi đi qua ListenRepository để cập nhật bộ đếm)."""
+
+    def __init__(self):
+        self.song_stats = get_async_collection("listen_song_stats")
+        self.user_song_stats = get_async_collection("listen_user_song_stats")
+
+    async def count_total_listens(self, song_id: str):
+        """Tổng số lượt nghe của 1 bài hát"""
+        doc = await self.song_stats.find_one({"_id": song_id}, {"listen_count": 1})
+        return doc.get("listen_count", 0) if doc else 0
+
+    async def get_repeat_count(self, user_id: str, song_id: str):
+        """Số lần nghe lại của 1 user cho 1 bài hát"""
+        doc = await self.user_song_stats.find_one({"_id": f"{user_id}|{song_id}"}, {"listen_count": 1})
+        return max(0, (doc.get("listen_count", 0) if doc else 0) - 1)
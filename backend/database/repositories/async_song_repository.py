@@ -0,0 +1,19 @@
+from database.async_db import get_async_collection
+from bson import ObjectId
+from typing import List, Optional, Dict
+
+
+class AsyncSongRepository:
+    """Truy vấn songs bằng Motor cho các route async (chỉ những hàm đang được dùng; còn lại xem SongRepository)."""
+
+    @staticmethod
+    def _collection():
+        return get_async_collection("songs")
+
+    @staticmethod
+    async def find_by_ids(song_ids: List[str], projection: Optional[Dict] = None) -> List[Dict]:
+        object_ids = [sid if isinstance(sid, ObjectId) else ObjectId(sid) for sid in song_ids if ObjectId.is_valid(str(sid))]
+        if not object_ids:
+            return []
+        cursor = AsyncSongRepository._collection().find({"_id": {"$in": object_ids}}, projection)
+        return await cursor.to_list(length=None)
@@ -0,0 +1,19 @@
+from typing import Optional, Dict, List
+from database.async_db import get_async_collection
+
+
+class AsyncUserRepository:
+    """Truy vấn users bằng Motor cho auth (mỗi request có xác thực); ghi đi qua UserRepository."""
+
+    @staticmethod
+    def _collection():
+        return get_async_collection("users")
+
+    @staticmethod
+    async def find_by_id(user_id: str) -> Optional[Dict]:
+        # _id luôn là chuỗi (xem database/id_migration.py) → 1 truy vấn
+        return await AsyncUserRepository._collection().find_one({"_id": str(user_id)})
+
+    @staticmethod
+    async def find_banned_ids() -> List[str]:
+        return [str(user_id) for user_id in await AsyncUserRepository._collection().distinct("_id", {"banned": True})]
@@ -0,0 +1,77 @@
+import hashlib
+from database.db import chat_messages_collection, chat_history_collection
+from bson import ObjectId
+from pymongo import DESCENDING
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+RECENT_CONTEXT = 20  # số tin nhắn gần nhất dùng làm ngữ cảnh cho gợi ý
+DUPLICATE_KEY = 11000
+
+
+class ChatRepository:
+    """
+    Lịch sử chat: mỗi tin nhắn là 1 document trong chat_messages {user_id, sender, text, timestamp},
+    đọc theo index (user_id, timestamp, _id) (khai báo trong database/indexes.py),
+    không còn 1 document / user với mảng messages tăng vô hạn.
+    """
+
+    @staticmethod
+    def get_recent_messages(user_id: str, limit: int = RECENT_CONTEXT, sender: Optional[str] = None) -> List[Dict]:
+        """Tối đa `limit` tin nhắn gần nhất (cũ → mới), lọc theo sender nếu có."""
+        query = {"user_id": str(user_id)}
+        if sender:
+            query["sender"] = sender
+        messages = list(
+            chat_messages_collection.find(query, {"sender": 1, "text": 1, "timestamp": 1})
+            .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit)
+        )
+        return messages[::-1]
+
+    @staticmethod
+    def get_latest_user_text(user_id: str) -> str:
+        messages = ChatRepository.get_recent_messages(user_id, 1, sender="user")
+        return messages[0].get("text", "") if messages else ""
+
+    @staticmethod
+    def _legacy_message_id(legacy_id, index: int) -> ObjectId:
+        """_id cố định cho tin nhắn thứ `index` của 1 document cũ → chạy lại migrate không chèn trùng."""
+        return ObjectId(hashlib.md5(f"{legacy_id}:{index}".encode()).digest()[:12])
+
+    @staticmethod
+    def migrate_legacy(user_id: Optional[str] = None) -> int:
+        """
+        Chuyển document cũ trong chat_history (mảng messages) sang chat_messages. Trả về số tin nhắn đã chuyển.
+        Chạy lại được sau khi bị ngắt giữa chừng: _id và timestamp của mỗi tin nhắn cố định theo document cũ,
+        tin đã chèn ở lần trước bị bỏ qua (duplicate key), document cũ chỉ bị xoá sau khi chèn xong.
+        """
+        query = {"user_id": user_id} if user_id else {}
+        moved = 0
+        for doc in chat_history_collection.find(query):
+            messages = [m for m in doc.get("messages", []) if m.get("text") is not None]
+            if messages:
+                # Dữ liệu cũ không có timestamp → giữ thứ tự bằng mốc tăng dần; mốc lưu vào document cũ để lần chạy lại dùng đúng mốc đó
+                base = doc.get("migrated_base")
+                if base is None:
+                    base = datetime.utcnow() - timedelta(milliseconds=len(messages))
+                    chat_history_collection.update_one({"_id": doc["_id"]}, {"$set": {"migrated_base": base}})
+                try:
+                    result = chat_messages_collection.insert_many([
+                        {
+                            "_id": ChatRepository._legacy_message_id(doc["_id"], i),
+                            "user_id": str(doc["user_id"]),
+                            "sender": m.get("sender"),
+                            "text": m["text"],
+                            "timestamp": m.get("timestamp") or base + timedelta(milliseconds=i),
+                        }
+                        for i, m in enumerate(messages)
+                    ], ordered=False)
+                    moved += len(result.inserted_ids)
+                except BulkWriteError as e:
+                    if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                        raise
+                    moved += e.details.get("nInserted", 0)
+            chat_history_collection.delete_one({"_id": doc["_id"]})
+        return moved
@@ -1,31 +1,85 @@
-from database.db import listen_song_collection
+from database.db import listen_song_collection, songs_collection
+from database.repositories.listen_stats_repository import ListenStatsRepository
+from services.trending import trending
+from bson import ObjectId
 from datetime import datetime
+from typing import Iterable, List, Dict
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+EVENT_FIELDS = {"user_id": 1, "song_id": 1, "artist_id": 1, "listened_at": 1, "type": 1}
 
 class ListenRepository:
     def __init__(self):
         self.collection = listen_song_collection
+        self.stats = ListenStatsRepository()
 
-    def record_listen(self, user_id: str, song_id: str, listened_at: datetime, type: str = "listen"):
+    def record_listen(self, user_id: str, song_id: str, listened_at: datetime, type: str = "listen", artist_id: str = None):
         """Ghi nhận lượt nghe (≥30s)"""
-        self.collection.insert_one({
+        self.record_many([{
             "user_id": user_id,
             "song_id": song_id,
+            "artist_id": artist_id,
             "listened_at": listened_at,
             "type": type
-        })
+        }])
+
+    def record_many(self, events: List[Dict]) -> List[ObjectId]:
+        """
+        Ghi 1 batch sự kiện và cộng dồn vào bộ đếm; gọi lại với cùng batch (cùng _id) an toàn:
+        - Sự kiện nên có sẵn _id (ListenIngestor gán khi nhận); _id đã có trong listen_song = đã ghi ở lần trước
+        - Document mới ghi mang counted=False, chỉ chuyển sang True sau khi đã cộng vào bộ đếm
+          → bộ đếm chỉ cộng cho document thực sự nằm trong listen_song và chưa được đếm
+        - ingested_at = thời điểm ghi (server, đóng lại ở mỗi lần thử): listened_at do client gửi và batch có thể
+          tới Mongo muộn (ListenIngestor flush / retry) → job incremental chọn sự kiện mới theo ingested_at
+        - Insert lỗi 1 phần (không phải trùng _id): phần đã ghi vẫn được đếm, rồi ném lỗi cho caller thử lại
+        """
+        if not events:
+            return []
+        docs = [{k: v for k, v in event.items() if v is not None} for event in events]
+        ingested_at = datetime.utcnow()
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            doc["counted"] = False
+            doc["ingested_at"] = ingested_at
+        ids = [doc["_id"] for doc in docs]
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {
+                ids[error["index"]] for error in e.details.get("writeErrors", [])
+                if error.get("code") != DUPLICATE_KEY
+            }
+            if failed:
+                self.apply_uncounted([doc_id for doc_id in ids if doc_id not in failed])
+                raise
+        self.apply_uncounted(ids)
+        return ids
+
+    def apply_uncounted(self, ids: Iterable[ObjectId]) -> int:
+        """
+        Cộng bộ đếm + trending cho các sự kiện (trong ids) đã ghi nhưng chưa đếm. Trả về số sự kiện đã đếm.
+        Lỗi giữa chừng: document giữ counted=False để lần gọi sau đếm lại (nếu lỗi xảy ra sau khi 1 phần
+        bộ đếm đã ghi thì phần đó có thể bị cộng 2 lần — chạy seeds_data/update/rebuild_listen_stats.py để tính lại).
+        """
+        ids = list(ids)
+        if not ids:
+            return 0
+        docs = list(self.collection.find({"_id": {"$in": ids}, "counted": False}, EVENT_FIELDS))
+        if not docs:
+            return 0
+        self.stats.apply_events(docs)
+        self.collection.update_many({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"$set": {"counted": True}})
+        trending.record_events(docs)
+        return len(docs)
 
     def count_total_listens(self, song_id: str):
         """Tổng số lượt nghe của 1 bài hát"""
-        return self.collection.count_documents({"song_id": song_id, "type": "listen"})
+        return self.stats.song_count(song_id, "listen_count")
 
     def get_repeat_count(self, user_id: str, song_id: str):
         """Số lần nghe lại của 1 user cho 1 bài hát"""
-        count = self.collection.count_documents({
-            "user_id": user_id,
-            "song_id": song_id,
-            "type": "listen"
-        })
-        return max(0, count - 1)
+        return max(0, self.stats.user_song_count(user_id, song_id) - 1)
 
     def get_listens_by_song(self, song_id: str):
         """Tất cả lượt nghe của 1 bài hát"""
@@ -37,166 +91,77 @@ class ListenRepository:
 
     def get_total_listens(self):
         """Tổng lượt nghe tất cả bài hát"""
-        return self.collection.count_documents({})
+        return self.stats.total_events()
 
     def get_top_listened_songs(self, limit: int = 10):
         """Top bài hát nghe nhiều nhất"""
-        pipeline = [
-            {"$match": {"type": "listen"}},
-            {"$group": {"_id": "$song_id", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": limit}
+        return [
+            {"_id": doc["_id"], "count": doc["listen_count"]}
+            for doc in self.stats.top_songs("listen_count", limit)
         ]
-        result = list(self.collection.aggregate(pipeline))
-        for doc in result:
-            doc["_id"] = str(doc["_id"])
-        return result
 
     def get_listen_activity_by_date(self):
         """Thống kê lượt nghe theo ngày"""
-        pipeline = [
-            {
-                "$group": {
-                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$listened_at"}},
-                    "count": {"$sum": 1}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
-        return list(self.collection.aggregate(pipeline))  # _id ở đây là string rồi, không cần đổi
+        return self.stats.daily_activity()
 
     def get_top_repeated_songs(self, limit: int = 10):
         """Top bài hát được user nghe lại nhiều nhất"""
-        pipeline = [
-            {"$match": {"type": "listen"}},
-            {"$group": {
-                "_id": {"user_id": "$user_id", "song_id": "$song_id"},
-                "repeat_count": {"$sum": 1}
-            }},
-            {"$match": {"repeat_count": {"$gt": 1}}},
-            {"$group": {
-                "_id": "$_id.song_id",
-                "repeat_total": {"$sum": {"$subtract": ["$repeat_count", 1]}}
-            }},
-            {"$sort": {"repeat_total": -1}},
-            {"$limit": limit}
+        return [
+            {"_id": doc["_id"], "repeat_total": doc["repeat_total"]}
+            for doc in self.stats.top_songs("repeat_total", limit)
         ]
-        result = list(self.collection.aggregate(pipeline))
-        for doc in result:
-            doc["_id"] = str(doc["_id"])
-        return result
 
     def get_top_searched_songs(self, limit: int = 10):
         """Top bài hát bị tìm kiếm nhiều nhất"""
-        pipeline = [
-            {"$match": {"type": "search"}},
-            {"$group": {"_id": "$song_id", "search_count": {"$sum": 1}}},
-            {"$sort": {"search_count": -1}},
-            {"$limit": limit}
+        return [
+            {"_id": doc["_id"], "search_count": doc["search_count"]}
+            for doc in self.stats.top_songs("search_count", limit)
         ]
-        result = list(self.collection.aggregate(pipeline))
-        for doc in result:
-            doc["_id"] = str(doc["_id"])
-        return result
 
     def get_top_artists_by_listens(self, limit: int = 10):
         """Top nghệ sĩ có nhiều lượt nghe nhất"""
-        pipeline = [
-            {
-                "$lookup": {
-                    "from": "songs",
-                    "localField": "song_id",
-                    "foreignField": "_id",
-                    "as": "song_info"
-                }
-            },
-            {"$unwind": "$song_info"},
-            {"$match": {"type": "listen"}},
-            {"$group": {"_id": "$song_info.artistId", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": limit}
+        return [
+            {"_id": doc["_id"], "count": doc["listen_count"]}
+            for doc in self.stats.top_artists("listen_count", limit)
         ]
-        result = list(self.collection.aggregate(pipeline))
-        for doc in result:
-            doc["_id"] = str(doc["_id"])
-        return result
+
+    @staticmethod
+    def _songs_by_id(song_ids: List[str]) -> Dict[str, dict]:
+        object_ids = [ObjectId(sid) for sid in song_ids if ObjectId.is_valid(sid)]
+        if not object_ids:
+            return {}
+        cursor = songs_collection.find(
+            {"_id": {"$in": object_ids}},
+            {"title": 1, "artist": 1, "coverArt": 1, "audioUrl": 1, "duration": 1}
+        )
+        return {str(song["_id"]): song for song in cursor}
 
     def get_top_listened_songs_with_info(self, limit: int = 10):
-        pipeline = [
-            { "$match": { "type": "listen" } },
-            { "$group": { "_id": "$song_id", "count": { "$sum": 1 } } },
-            { "$sort": { "count": -1 } },
-            { "$limit": limit },
-            {
-                "$addFields": {
-                    "song_oid": {
-                        "$cond": {
-                            "if": { "$eq": [ { "$type": "$_id" }, "string" ] },
-                            "then": { "$toObjectId": "$_id" },
-                            "else": "$_id"
-                        }
-                    }
-                }
-            },
+        top = self.stats.top_songs("listen_count", limit)
+        songs = self._songs_by_id([doc["_id"] for doc in top])
+        return [
             {
-                "$lookup": {
-                    "from": "songs",
-                    "localField": "song_oid",
-                    "foreignField": "_id",
-                    "as": "song"
-                }
-            },
-            { "$unwind": { "path": "$song", "preserveNullAndEmptyArrays": False } },
-            {
-                "$project": {
-                    "song_id": { "$toString": "$_id" },
-                    "title": "$song.title",
-                    "artist_name": "$song.artist",
-                    "cover": { "$ifNull": ["$song.coverArt", "/placeholder.svg"] },
-                    "audioUrl": "$song.audioUrl",
-                    "duration": "$song.duration",
-                    "listen_count": "$count"
-                }
+                "song_id": doc["_id"],
+                "title": songs[doc["_id"]].get("title"),
+                "artist_name": songs[doc["_id"]].get("artist"),
+                "cover": songs[doc["_id"]].get("coverArt") or "/placeholder.svg",
+                "audioUrl": songs[doc["_id"]].get("audioUrl"),
+                "duration": songs[doc["_id"]].get("duration"),
+                "listen_count": doc["listen_count"]
             }
+            for doc in top if doc["_id"] in songs
         ]
-        return list(self.collection.aggregate(pipeline))
 
     def get_top_searched_songs_with_info(self, limit: int = 10):
-        pipeline = [
-            { "$match": { "type": "search" } },
-            { "$group": { "_id": "$song_id", "search_count": { "$sum": 1 } } },
-            { "$sort": { "search_count": -1 } },
-            { "$limit": limit },
-            {
-                "$addFields": {
-                    "song_oid": {
-                        "$cond": {
-                            "if": { "$eq": [ { "$type": "$_id" }, "string" ] },
-                            "then": { "$toObjectId": "$_id" },
-                            "else": "$_id"
-                        }
-                    }
-                }
-            },
+        top = self.stats.top_songs("search_count", limit)
+        songs = self._songs_by_id([doc["_id"] for doc in top])
+        return [
             {
-                "$lookup": {
-                    "from": "songs",
-                    "localField": "song_oid",
-                    "foreignField": "_id",
-                    "as": "song"
-                }
-            },
-            { "$unwind": { "path": "$song", "preserveNullAndEmptyArrays": False } },
-            {
-                "$project": {
-                    "song_id": { "$toString": "$_id" },
-                    "title": "$song.title",
-                    "artist_name": "$song.artist",
-                    "cover": { "$ifNull": ["$song.coverArt", "/placeholder.svg"] },
-                    "search_count": 1
-                }
+                "song_id": doc["_id"],
+                "title": songs[doc["_id"]].get("title"),
+                "artist_name": songs[doc["_id"]].get("artist"),
+                "cover": songs[doc["_id"]].get("coverArt") or "/placeholder.svg",
+                "search_count": doc["search_count"]
             }
+            for doc in top if doc["_id"] in songs
         ]
-        return list(self.collection.aggregate(pipeline))
-
-
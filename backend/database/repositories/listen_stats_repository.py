@@ -0,0 +1,152 @@
+from database.db import (
+    listen_song_collection, listen_song_stats_collection, listen_artist_stats_collection,
+    listen_user_song_stats_collection, listen_daily_stats_collection, songs_collection
+)
+from pymongo import UpdateOne, ReturnDocument
+from bson import ObjectId
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Dict, Iterable
+
+
+class ListenStatsRepository:
+    """
+    Bộ đếm cộng dồn (rollup) cho listen_song:
+    - listen_song_stats:      _id = song_id   -> listen_count, search_count, total_count, repeat_total
+    - listen_artist_stats:    _id = artist_id -> listen_count, search_count
+    - listen_user_song_stats: _id = "user|song" -> listen_count
+    - listen_daily_stats:     _id = YYYY-MM-DD -> count, listen_count, search_count
+    Các API top-N chỉ cần sort + limit trên bộ đếm thay vì $group toàn bộ listen_song.
+    """
+
+    def __init__(self):
+        self.songs = listen_song_stats_collection
+        self.artists = listen_artist_stats_collection
+        self.user_songs = listen_user_song_stats_collection
+        self.daily = listen_daily_stats_collection
+
+    # ----------------------------
+    # Ghi
+    # ----------------------------
+    def apply_events(self, events: Iterable[Dict]):
+        """Cộng dồn 1 batch sự kiện (dict có user_id, song_id, artist_id, listened_at, type)."""
+        song_inc = defaultdict(lambda: defaultdict(int))
+        artist_inc = defaultdict(lambda: defaultdict(int))
+        daily_inc = defaultdict(lambda: defaultdict(int))
+        user_song_inc = defaultdict(int)
+        listened_song_ids = set()
+
+        for event in events:
+            kind = event.get("type") or "listen"
+            field = f"{kind}_count"
+            song_id = event.get("song_id")
+            listened_at = event.get("listened_at") or datetime.utcnow()
+            day = listened_at.strftime("%Y-%m-%d") if isinstance(listened_at, datetime) else str(listened_at)[:10]
+
+            daily_inc[day]["count"] += 1
+            daily_inc[day][field] += 1
+            if song_id:
+                song_id = str(song_id)
+                song_inc[song_id][field] += 1
+                song_inc[song_id]["total_count"] += 1
+                if kind == "listen":
+                    listened_song_ids.add(song_id)
+                    if event.get("user_id"):
+                        user_song_inc[(str(event["user_id"]), song_id)] += 1
+            elif event.get("artist_id"):
+                artist_inc[str(event["artist_id"])][field] += 1
+
+        # Lượt nghe được tính cho nghệ sĩ của bài hát (1 truy vấn $in cho cả batch)
+        if listened_song_ids:
+            for song_id, artist_id in self._artist_ids_for(listened_song_ids).items():
+                artist_inc[artist_id]["listen_count"] += song_inc[song_id]["listen_count"]
+
+        # Lượt nghe lại: chỉ tính khi bộ đếm (user, song) vượt quá 1
+        for (user_id, song_id), n in user_song_inc.items():
+            doc = self.user_songs.find_one_and_update(
+                {"_id": f"{user_id}|{song_id}"},
+                {"$inc": {"listen_count": n}, "$setOnInsert": {"user_id": user_id, "song_id": song_id}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            new_count = doc.get("listen_count", n)
+            repeat_delta = max(0, new_count - 1) - max(0, new_count - n - 1)
+            if repeat_delta:
+                song_inc[song_id]["repeat_total"] += repeat_delta
+
+        now = datetime.utcnow()
+        for collection, increments in ((self.songs, song_inc), (self.artists, artist_inc), (self.daily, daily_inc)):
+            ops = [
+                UpdateOne({"_id": key}, {"$inc": dict(inc), "$set": {"updated_at": now}}, upsert=True)
+                for key, inc in increments.items() if inc
+            ]
+            if ops:
+                collection.bulk_write(ops, ordered=False)
+
+    @staticmethod
+    def _artist_ids_for(song_ids: Iterable[str]) -> Dict[str, str]:
+        object_ids = [ObjectId(sid) for sid in song_ids if ObjectId.is_valid(sid)]
+        if not object_ids:
+            return {}
+        return {
+            str(song["_id"]): str(song["artistId"])
+            for song in songs_collection.find({"_id": {"$in": object_ids}}, {"artistId": 1})
+            if song.get("artistId")
+        }
+
+    # ----------------------------
+    # Đọc
+    # ----------------------------
+    def top_songs(self, field: str, limit: int = 10) -> List[Dict]:
+        return list(self.songs.find({field: {"$gt": 0}}).sort(field, -1).limit(limit))
+
+    def top_artists(self, field: str, limit: int = 10) -> List[Dict]:
+        return list(self.artists.find({field: {"$gt": 0}}).sort(field, -1).limit(limit))
+
+    def song_count(self, song_id: str, field: str = "listen_count") -> int:
+        doc = self.songs.find_one({"_id": str(song_id)}, {field: 1})
+        return doc.get(field, 0) if doc else 0
+
+    def user_song_count(self, user_id: str, song_id: str) -> int:
+        doc = self.user_songs.find_one({"_id": f"{user_id}|{song_id}"}, {"listen_count": 1})
+        return doc.get("listen_count", 0) if doc else 0
+
+    def daily_activity(self) -> List[Dict]:
+        return [
+            {"_id": doc["_id"], "count": doc.get("count", 0)}
+            for doc in self.daily.find({}, {"count": 1}).sort("_id", 1)
+        ]
+
+    def total_events(self) -> int:
+        result = list(self.daily.aggregate([{"$group": {"_id": None, "total": {"$sum": "$count"}}}]))
+        return result[0]["total"] if result else 0
+
+    def total_listens(self) -> int:
+        result = list(self.daily.aggregate([{"$group": {"_id": None, "total": {"$sum": "$listen_count"}}}]))
+        return result[0]["total"] if result else 0
+
+    def listen_counts(self) -> Dict[str, int]:
+        """{song_id: listen_count} cho các bài đã có lượt nghe."""
+        return {
+            doc["_id"]: doc["listen_count"]
+            for doc in self.songs.find({"listen_count": {"$gt": 0}}, {"listen_count": 1})
+        }
+
+    # ----------------------------
+    # Backfill
+    # ----------------------------
+    def rebuild_from_events(self):
+        """Tính lại toàn bộ bộ đếm từ listen_song (chạy 1 lần khi triển khai hoặc khi lệch số)."""
+        for collection in (self.songs, self.artists, self.user_songs, self.daily):
+            collection.delete_many({})
+        # Tính lại từ toàn bộ listen_song → sự kiện chưa đếm cũng được tính ở đây, không để ListenRepository đếm lần nữa
+        listen_song_collection.update_many({"counted": False}, {"$set": {"counted": True}})
+
+        batch = []
+        for event in listen_song_collection.find({}, {"user_id": 1, "song_id": 1, "artist_id": 1, "listened_at": 1, "type": 1}):
+            batch.append(event)
+            if len(batch) >= 1000:
+                self.apply_events(batch)
+                batch = []
+        if batch:
+            self.apply_events(batch)
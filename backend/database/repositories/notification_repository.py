@@ -1,10 +1,19 @@
 from bson import ObjectId
-from database.db import notifications_collection
+from database.async_db import get_async_collection
 from datetime import datetime
 
 
+class _AsyncCollection:
+    """Resolve collection Motor lúc truy cập (client được tạo trong event loop)."""
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        return get_async_collection(self.name)
+
+
 class NotificationRepository:
-    collection = notifications_collection
+    collection = _AsyncCollection("notifications")
 
     @staticmethod
     async def create(notif_data):
@@ -15,7 +24,7 @@ class NotificationRepository:
         # ép user_id về ObjectId
         notif["user_id"] = ObjectId(notif["user_id"])
 
-        result = NotificationRepository.collection.insert_one(notif)
+        result = await NotificationRepository.collection.insert_one(notif)
         notif["_id"] = str(result.inserted_id)
         
         notif["user_id"] = str(notif["user_id"])
@@ -27,7 +36,7 @@ class NotificationRepository:
     async def list_all(user_id):
         cursor = NotificationRepository.collection.find({"user_id": ObjectId(user_id)})
         results = []
-        for notif in cursor:  
+        async for notif in cursor:
             notif["id"] = str(notif["_id"])
             del notif["_id"]
             notif["user_id"] = str(notif["user_id"])
@@ -40,7 +49,7 @@ class NotificationRepository:
     
     @staticmethod
     async def delete(notif_id):
-        result = NotificationRepository.collection.delete_one({"_id": ObjectId(notif_id)})
+        result = await NotificationRepository.collection.delete_one({"_id": ObjectId(notif_id)})
         return {"deleted": result.deleted_count}
 
 
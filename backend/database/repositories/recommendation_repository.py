@@ -0,0 +1,60 @@
+from database.db import recommendations_collection, recommendation_jobs_collection
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+
+class RecommendationRepository:
+    """
+    Kết quả gợi ý đã tính sẵn:
+    - recommendations:      _id = user_id -> affinity {genres, artists, tags}, candidates [{song_id, score}], updated_at
+    - recommendation_jobs:  _id = tên job -> last_run (mốc để refresh incremental),
+                            lease_owner / lease_until (chỉ 1 process chạy job tại một thời điểm)
+    """
+
+    def __init__(self):
+        self.collection = recommendations_collection
+        self.jobs = recommendation_jobs_collection
+
+    def find_by_user(self, user_id: str) -> Optional[Dict]:
+        return self.collection.find_one({"_id": str(user_id)})
+
+    def save_many(self, docs: List[Dict]):
+        if not docs:
+            return
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {**doc, "updated_at": now}}, upsert=True)
+            for doc in docs
+        ], ordered=False)
+
+    def get_last_run(self, job: str) -> Optional[datetime]:
+        doc = self.jobs.find_one({"_id": job})
+        return doc.get("last_run") if doc else None
+
+    def set_last_run(self, job: str, last_run: datetime):
+        self.jobs.update_one({"_id": job}, {"$set": {"last_run": last_run}}, upsert=True)
+
+    def reset_last_run(self, job: str):
+        self.jobs.update_one({"_id": job}, {"$unset": {"last_run": ""}})
+
+    def acquire_lease(self, job: str, owner: str, ttl: float) -> bool:
+        """Giữ / gia hạn quyền chạy job trong ttl giây. False nếu process khác đang giữ và lease chưa hết hạn."""
+        now = datetime.utcnow()
+        try:
+            self.jobs.update_one(
+                {"_id": job, "$or": [
+                    {"lease_owner": owner},
+                    {"lease_until": {"$lt": now}},
+                    {"lease_until": {"$exists": False}}
+                ]},
+                {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # doc đã có và đang thuộc process khác → upsert đụng _id
+        return True
+
+    def release_lease(self, job: str, owner: str):
+        self.jobs.update_one({"_id": job, "lease_owner": owner}, {"$unset": {"lease_owner": "", "lease_until": ""}})
@@ -7,6 +7,7 @@ from datetime import datetime
 import logging
 import random
 from services.genre_service import get_region_query
+from services.catalog_cache import catalog_cache
 
 # 🔧 Cấu hình logger
 logger = logging.getLogger(__name__)
@@ -69,14 +70,8 @@ class SongRepository:
     @staticmethod
     def find_by_artist_id(artist_id: ObjectId) -> List[Dict]:
         try:
-            # Thử tìm với cả chuỗi và ObjectId
-            songs = songs_collection.find({
-                "$or": [
-                    {"artistId": str(artist_id)},
-                    {"artistId": artist_id}
-                ]
-            })
-            return list(songs)
+            # artistId luôn là chuỗi (xem database/id_migration.py)
+            return list(songs_collection.find({"artistId": str(artist_id)}))
         except Exception as e:
             logger.error(f"[find_by_artist_id] Error: {str(e)}")
             raise ValueError(f"Failed to query songs by artist_id: {str(e)}")
@@ -84,6 +79,7 @@ class SongRepository:
     @staticmethod
     def insert(song_data: Dict) -> str:
         result = songs_collection.insert_one(song_data)
+        catalog_cache.upsert("songs", song_data)
         return str(result.inserted_id)
 
     @staticmethod
@@ -93,21 +89,21 @@ class SongRepository:
             {"_id": SongRepository._validate_object_id(song_id)},
             {"$set": update_data}
         )
+        if result.matched_count > 0:
+            catalog_cache.reload("songs", song_id)
         return result.matched_count > 0
 
     @staticmethod
     def delete(song_id: str) -> bool:
         result = songs_collection.delete_one({"_id": SongRepository._validate_object_id(song_id)})
+        if result.deleted_count > 0:
+            catalog_cache.remove("songs", song_id)
         return result.deleted_count > 0
 
     @staticmethod
     def delete_by_artist_id(artist_id: ObjectId) -> bool:
-        result = songs_collection.delete_many({
-            "$or": [
-                {"artistId": str(artist_id)},
-                {"artistId": artist_id}
-            ]
-        })
+        result = songs_collection.delete_many({"artistId": str(artist_id)})
+        catalog_cache.remove_by_owner("songs", artist_id)
         return result.deleted_count > 0
     
     @staticmethod
@@ -121,15 +117,11 @@ class SongRepository:
     
     @staticmethod
     def find_by_album_id(album_id: str, artist_id: str) -> List[dict]:
-        """Lấy bài hát theo album + artist (artistId có thể là string hoặc ObjectId)."""
+        """Lấy bài hát theo album + artist."""
         try:
-            return list(songs_collection.find({
-                "album": album_id,
-                "$or": [
-                    {"artistId": artist_id},
-                    {"artistId": ObjectId(artist_id)}
-                ]
-            }, SongRepository.PROJECTION))
+            return list(songs_collection.find(
+                {"album": album_id, "artistId": str(artist_id)}, SongRepository.PROJECTION
+            ))
         except Exception as e:
             logger.error(f"[find_by_album_id] Error: {str(e)}")
             raise
@@ -1,5 +1,4 @@
 from bson import ObjectId
-from bson.errors import InvalidId
 from datetime import datetime
 from typing import Optional, List, Dict
 from database.db import users_collection
@@ -14,22 +13,9 @@ class UserRepository:
 
     @staticmethod
     def find_by_id(user_id: str) -> Optional[Dict]:
-        # Thử tìm theo chuỗi trước
-        user = users_collection.find_one({"_id": user_id})
-        if user:
-            user["_id"] = str(user["_id"])
-            return user
-        # Thử tìm theo ObjectId
-        try:
-            obj_id = ObjectId(user_id)
-            user = users_collection.find_one({"_id": obj_id})
-            if user:
-                user["_id"] = str(user["_id"])
-                return user
-        except (InvalidId, TypeError):
-            return None
-        return None
-    
+        # _id luôn là chuỗi (xem database/id_migration.py) → 1 truy vấn
+        return users_collection.find_one({"_id": str(user_id)})
+
 
     @staticmethod
     def find_all() -> List[Dict]:
@@ -58,32 +44,10 @@ class UserRepository:
     @staticmethod
     def update(user_id: str, update_data: Dict) -> bool:
         update_data["updated_at"] = datetime.utcnow()
-
-        # Try string-based update first
-        result = users_collection.update_one({"_id": user_id}, {"$set": update_data})
-        if result.matched_count > 0:
-            return True
-
-        # Fallback to ObjectId-based update
-        try:
-            obj_id = ObjectId(user_id)
-            result = users_collection.update_one({"_id": obj_id}, {"$set": update_data})
-            return result.matched_count > 0
-        except (InvalidId, TypeError):
-            return False
+        result = users_collection.update_one({"_id": str(user_id)}, {"$set": update_data})
+        return result.matched_count > 0
 
     @staticmethod
     def delete(user_id: str) -> bool:
-    # Try delete by string-based id first
-        result = users_collection.delete_one({"_id": user_id})
-        if result.deleted_count > 0:
-           return True
-
-    # Fallback to ObjectId
-        try:
-           obj_id = ObjectId(user_id)
-           result = users_collection.delete_one({"_id": obj_id})
-           return result.deleted_count > 0
-        except (InvalidId, TypeError):
-           return False
-
+        result = users_collection.delete_one({"_id": str(user_id)})
+        return result.deleted_count > 0
@@ -1,10 +1,12 @@
 # models/chat.py
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 
 class ChatMessage(BaseModel):
     sender: str  # "user" hoặc "bot"
     text: str
+    timestamp: Optional[datetime] = None
 
 class ChatRequest(BaseModel):
     user_id: str
@@ -17,3 +19,4 @@ class ChatResponse(BaseModel):
 class ChatHistory(BaseModel):
     user_id: str
     history: List[ChatMessage]
+    next_cursor: Optional[str] = None  # None khi đã hết tin nhắn cũ hơn
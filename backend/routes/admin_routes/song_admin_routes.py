@@ -6,13 +6,7 @@ from auth import get_current_admin
 from pydantic import BaseModel
 from typing import List, Optional
 from bson import ObjectId
-from cloudinary.uploader import upload
-import os
-from cloudinary import config
-
-config(cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"), 
-       api_key=os.getenv("CLOUDINARY_API_KEY"), 
-       api_secret=os.getenv("CLOUDINARY_API_SECRET"))
+from services.media_upload import media_upload
 
 router = APIRouter(prefix="/admin/songs", tags=["admin_songs"])
 
@@ -69,7 +63,7 @@ async def create_song(
     admin=Depends(get_current_admin)
 ):
     try:
-        song_id = service.create_song(song_data)
+        song_id = await service.create_song(song_data)
         print(f"Song created by admin {admin['email']}: {song_id}")
         return {"id": song_id, "message": "Song created successfully"}
     except ValueError as ve:
@@ -83,24 +77,26 @@ async def create_song(
 async def upload_media(
     cover_art: Optional[UploadFile] = File(None),
     audio: Optional[UploadFile] = File(None),
-    service: AdminSongService = Depends(get_song_service),
+    upload_id: Optional[str] = None,
     admin=Depends(get_current_admin)
 ):
+    # Cover và audio upload song song theo chunk; nội dung đã upload trước đó trả lại URL cũ
     try:
-        result = {}
-        if cover_art:
-            print(f"Uploading cover art for admin {admin['email']}")
-            cover_result = upload(cover_art.file, resource_type="image")
-            result["coverArt"] = cover_result["secure_url"]
-        if audio:
-            print(f"Uploading audio for admin {admin['email']}")
-            audio_result = upload(audio.file, resource_type="raw")  
-            result["audioUrl"] = audio_result["secure_url"]
-        return result
+        print(f"Uploading media for admin {admin['email']}")
+        return await media_upload.upload_song_media(admin["id"], cover_art, audio, upload_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         print(f"Error in upload_media: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.get("/upload/{upload_id}", response_model=dict)
+async def get_upload_progress(upload_id: str, admin=Depends(get_current_admin)):
+    progress = media_upload.progress(admin["id"], upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return progress
+
 @router.put("/{id}", response_model=dict)
 async def update_song(
     id: str,
@@ -109,7 +105,7 @@ async def update_song(
     admin=Depends(get_current_admin)
 ):
     try:
-        if not service.update_song(id, song_data):
+        if not await service.update_song(id, song_data):
             raise HTTPException(status_code=404, detail="Song not found")
         print(f"Song {id} updated by admin {admin['email']}")
         return {"message": "Song updated successfully"}
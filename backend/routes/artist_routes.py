@@ -27,10 +27,17 @@ async def get_artists(limit: int = None, user: dict = Depends(get_optional_user)
                 continue  # bỏ qua nếu không có ID
 
             artist_dict["id"] = artist_id  # thêm id cho frontend
-            artist_dict["isFollowing"] = follow_service.is_following(user["id"], artist_id) if user else False
-            artist_dict["followerCount"] = follow_service.count_followers(artist_id)
             artist_list.append(artist_dict)
 
+        # ✅ Follower count + isFollowing cho cả trang trong 2 truy vấn
+        follow_stats = follow_service.get_follow_stats(
+            [a["id"] for a in artist_list], user["id"] if user else None
+        )
+        for artist_dict in artist_list:
+            stats = follow_stats.get(artist_dict["id"], {})
+            artist_dict["isFollowing"] = stats.get("isFollowing", False)
+            artist_dict["followerCount"] = stats.get("followerCount", 0)
+
         return {"artists": artist_list, "total": len(artist_list)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
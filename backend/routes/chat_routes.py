@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from models.chat import ChatRequest, ChatResponse, ChatMessage, ChatHistory
-from database.db import chat_history_collection
-from utils.question_handler import handle_user_question
+from database.repositories.async_chat_repository import AsyncChatRepository
+from utils.question_handler import handle_user_question, stream_user_question
 
+from bson import ObjectId
 from datetime import datetime
+from typing import Optional
+import asyncio
+import json
 import logging
 from pydantic import ValidationError
 
@@ -12,89 +17,162 @@ logging.basicConfig(level=logging.INFO)
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_with_bot(payload: ChatRequest):
-    user_id = payload.user_id
-    user_message = (payload.message or "").strip()
 
-    logger.info(f"[POST /chat] User ({user_id}) sent: '{user_message}'")
+FALLBACK_REPLY = "Xin lỗi, tôi chưa hiểu bạn hỏi gì. Bạn có thể hỏi lại rõ hơn không?"
+ERROR_REPLY = "Hiện tại tôi không thể xử lý yêu cầu. Vui lòng thử lại sau."
 
+# Giữ tham chiếu tới các task lưu lịch sử đang chạy (tránh bị GC trước khi xong)
+_pending_saves = set()
+
+
+def _validate_message(payload: ChatRequest) -> str:
+    user_message = (payload.message or "").strip()
     if not user_message:
         raise HTTPException(status_code=400, detail="Tin nhắn không được để trống.")
+    return user_message
+
+
+async def _save_messages(user_id: str, messages: list):
+    try:
+        await AsyncChatRepository.insert_messages(user_id, [msg.dict() for msg in messages])
+        logger.info(f"[DB Update] Saved messages for user_id: {user_id}")
+    except Exception as e:
+        logger.error(f"[DB Error] Failed to save chat: {str(e)}")
+
+
+def _save_in_background(user_id: str, messages: list):
+    """Lưu lịch sử sau khi đã trả lời xong, không bắt client chờ ghi DB."""
+    task = asyncio.create_task(_save_messages(user_id, messages))
+    _pending_saves.add(task)
+    task.add_done_callback(_pending_saves.discard)
+
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_with_bot(payload: ChatRequest):
+    """Trả lời đầy đủ 1 lần; history chỉ gồm 2 tin nhắn mới (không đọc lại toàn bộ lịch sử)."""
+    user_id = payload.user_id
+    logger.info(f"[POST /chat] User ({user_id}) sent: '{payload.message}'")
+    user_message = _validate_message(payload)
 
     # Call your AI logic or fallback
     try:
         bot_reply = await handle_user_question(user_message)
         if not bot_reply:
-            bot_reply = "Xin lỗi, tôi chưa hiểu bạn hỏi gì. Bạn có thể hỏi lại rõ hơn không?"
+            bot_reply = FALLBACK_REPLY
     except Exception as e:
         logger.error(f"[AI Handler Error] {str(e)}")
-        bot_reply = "Hiện tại tôi không thể xử lý yêu cầu. Vui lòng thử lại sau."
+        bot_reply = ERROR_REPLY
 
     logger.info(f"[AI Response] Bot replied: '{bot_reply}'")
 
-    now = datetime.utcnow()
-    user_msg = ChatMessage(sender="user", text=user_message, timestamp=now)
-    bot_msg = ChatMessage(sender="bot", text=bot_reply, timestamp=now)
+    delta = [ChatMessage(sender="user", text=user_message), ChatMessage(sender="bot", text=bot_reply)]
+    _save_in_background(user_id, delta)
+    return ChatResponse(response=bot_reply, history=delta)
 
-    try:
-        chat_history_collection.update_one(
-            {"user_id": user_id},
-            {"$push": {"messages": {"$each": [user_msg.dict(), bot_msg.dict()]}}},
-            upsert=True
-        )
-        logger.info(f"[DB Update] Saved messages for user_id: {user_id}")
-    except Exception as e:
-        logger.error(f"[DB Error] Failed to save chat: {str(e)}")
-        raise HTTPException(status_code=500, detail="Lỗi server khi lưu tin nhắn")
 
-    updated_doc = chat_history_collection.find_one({"user_id": user_id})
-    messages_raw = updated_doc.get("messages", []) if updated_doc else []
+@router.post("/chat/stream")
+async def chat_with_bot_stream(payload: ChatRequest):
+    """
+    Server-Sent Events:
+    - data: {"delta": "..."}   mỗi đoạn câu trả lời ngay khi có (Gemini stream theo token)
+    - data: {"done": true, "response": "..."}   kết thúc, kèm câu trả lời đầy đủ
+    Lịch sử được lưu sau khi stream xong (kể cả khi client ngắt giữa chừng, lưu phần đã gửi).
+    """
+    user_id = payload.user_id
+    logger.info(f"[POST /chat/stream] User ({user_id}) sent: '{payload.message}'")
+    user_message = _validate_message(payload)
 
-    history = []
-    for msg in messages_raw:
+    async def events():
+        chunks = []
         try:
-            if msg.get("text") is not None:
-                history.append(ChatMessage(**msg))
-        except ValidationError as ve:
-            logger.warning(f"[Skip] Invalid message skipped: {ve}")
-
-    return ChatResponse(response=bot_reply, history=history)
+            try:
+                async for chunk in stream_user_question(user_message):
+                    chunks.append(chunk)
+                    yield _sse({"delta": chunk})
+                if not chunks:
+                    chunks.append(FALLBACK_REPLY)
+                    yield _sse({"delta": FALLBACK_REPLY})
+            except Exception as e:
+                logger.error(f"[AI Handler Error] {str(e)}")
+                chunks.append(ERROR_REPLY)
+                yield _sse({"delta": ERROR_REPLY})
+            yield _sse({"done": True, "response": "".join(chunks)})
+        finally:
+            if chunks:
+                _save_in_background(user_id, [
+                    ChatMessage(sender="user", text=user_message),
+                    ChatMessage(sender="bot", text="".join(chunks)),
+                ])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _encode_cursor(message: dict) -> str:
+    return f"{message['timestamp'].isoformat()}_{message['_id']}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        ts, message_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(ts), ObjectId(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor không hợp lệ")
 
 
 @router.get("/chat/history/{user_id}", response_model=ChatHistory)
-async def get_chat_history(user_id: str):
+async def get_chat_history(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Lịch sử chat theo trang, phân trang keyset (timestamp, _id):
+    - Trang đầu là `limit` tin nhắn mới nhất; truyền next_cursor để lấy các tin cũ hơn
+    - Trong mỗi trang tin nhắn xếp cũ → mới (đúng thứ tự hiển thị)
+    """
     logger.info(f"[GET /chat/history] Fetching history for user_id: {user_id}")
 
-    doc = chat_history_collection.find_one({"user_id": user_id})
-    if not doc:
-        logger.warning(f"[NOT FOUND] No history for user: {user_id}")
-        return {"user_id": user_id, "history": []}
+    before = _decode_cursor(cursor) if cursor else None
+    records = await AsyncChatRepository.find_page(user_id, limit + 1, before)
+    has_more = len(records) > limit
+    records = records[:limit]
 
-    messages_raw = doc.get("messages", [])
     history = []
-    for msg in messages_raw:
+    for msg in reversed(records):
         try:
-            if msg.get("text") is not None:
-                history.append(ChatMessage(**msg))
+            history.append(ChatMessage(**msg))
         except ValidationError as ve:
             logger.warning(f"[Skip] Invalid message skipped: {ve}")
 
     logger.info(f"[History Found] Retrieved {len(history)} messages for user_id: {user_id}")
-    return {"user_id": user_id, "history": history}
+    return {
+        "user_id": user_id,
+        "history": history,
+        "next_cursor": _encode_cursor(records[-1]) if has_more else None
+    }
 
 
 @router.delete("/chat/history/{user_id}")
 async def delete_chat_history(user_id: str):
     logger.info(f"[DELETE /chat/history] Deleting history for user_id: {user_id}")
     try:
-        result = chat_history_collection.delete_one({"user_id": user_id})
-        if result.deleted_count == 0:
+        deleted = await AsyncChatRepository.delete_by_user(user_id)
+        if deleted == 0:
             logger.warning(f"[Delete Failed] No history to delete for user_id: {user_id}")
             raise HTTPException(status_code=404, detail="Không tìm thấy lịch sử để xoá.")
 
-        logger.info(f"[Delete Success] Deleted chat history for user_id: {user_id}")
+        logger.info(f"[Delete Success] Deleted {deleted} chat messages for user_id: {user_id}")
         return {"message": f"Đã xoá lịch sử chat của user {user_id}"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[Delete Error] {str(e)}")
         raise HTTPException(status_code=500, detail="Lỗi server khi xoá lịch sử")
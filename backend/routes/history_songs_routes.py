@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from models.history import ListenHistoryModel
-from database.db import history_collection, songs_collection
+from database.async_db import get_async_collection
+from database.repositories.async_song_repository import AsyncSongRepository
 from bson import ObjectId
 from datetime import datetime
+from typing import Optional
 
 router = APIRouter()
 
+SONG_INFO_PROJECTION = {"title": 1, "artist": 1, "coverArt": 1, "audioUrl": 1}
+
+
+def _history_collection():
+    return get_async_collection("history")
+
 @router.post("/api/history/listen")
 async def save_listen_history(record: ListenHistoryModel):
     try:
@@ -15,12 +23,12 @@ async def save_listen_history(record: ListenHistoryModel):
         }
 
         # 🔍 Kiểm tra nếu đã tồn tại bản ghi giống nhau thì không lưu lại
-        existing = history_collection.find_one(doc)
+        existing = await _history_collection().find_one(doc)
         if existing:
             return {"message": "🎧 Đã tồn tại trong lịch sử nghe"}
 
         doc["timestamp"] = datetime.utcnow()
-        result = history_collection.insert_one(doc)
+        result = await _history_collection().insert_one(doc)
 
         return {
             "message": "🎧 Đã lưu lịch sử nghe",
@@ -31,36 +39,79 @@ async def save_listen_history(record: ListenHistoryModel):
         raise HTTPException(status_code=500, detail=f"Lỗi khi lưu: {e}")
 
 
+def _encode_cursor(record: dict) -> str:
+    return f"{record['timestamp'].isoformat()}_{record['_id']}"
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """Điều kiện keyset: bản ghi cũ hơn (timestamp, _id) của phần tử cuối trang trước."""
+    try:
+        ts, record_id = cursor.rsplit("_", 1)
+        ts = datetime.fromisoformat(ts)
+        record_id = ObjectId(record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor không hợp lệ")
+    return {"$or": [
+        {"timestamp": {"$lt": ts}},
+        {"timestamp": ts, "_id": {"$lt": record_id}},
+    ]}
+
+
 @router.get("/api/history/user/{user_id}")
-async def get_user_history(user_id: str):
+async def get_user_history(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None
+):
+    """
+    Lịch sử nghe, mới nhất trước, phân trang theo keyset (timestamp, _id):
+    - Mỗi trang đọc tối đa limit + 1 bản ghi qua index (user_id, timestamp)
+    - Thông tin bài hát lấy bằng 1 truy vấn $in cho cả trang
+    - next_cursor = None khi đã hết lịch sử
+    """
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=400, detail="user_id không hợp lệ")
+
+    query = {"user_id": ObjectId(user_id), "timestamp": {"$exists": True}}
+    if cursor:
+        query = {"$and": [query, _decode_cursor(cursor)]}
+
     try:
-        user_obj_id = ObjectId(user_id)
-
-        # Lấy tất cả lịch sử sắp xếp theo thời gian mới nhất trước
-        cursor = history_collection.find({"user_id": user_obj_id}).sort("timestamp", -1)
-
-        unique_songs = {}
-        for record in cursor:
-            if "timestamp" not in record:
-                continue  # 🛑 Bỏ qua nếu thiếu timestamp
-
-            song_id_str = str(record["song_id"])
-            if song_id_str not in unique_songs:
-                song = songs_collection.find_one({"_id": record["song_id"]})
-                unique_songs[song_id_str] = {
-                    "_id": str(record["_id"]),  # thêm key _id để frontend dùng
-                    "song_id": song_id_str,
-                    "user_id": str(record["user_id"]),
-                    "timestamp": record["timestamp"].isoformat(),
-                    "song_info": {
-                        "title": song["title"] if song else "Unknown",
-                        "artist": song["artist"] if song else "Unknown",
-                        "coverArt": song.get("coverArt", "") if song else "",
-                        "audioUrl": song.get("audioUrl", "") if song else "",
-                    }
+        records = await _history_collection().find(query).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(length=limit + 1)
+
+        has_more = len(records) > limit
+        records = records[:limit]
+
+        # Bỏ bản ghi trùng bài hát trong trang (dữ liệu cũ có thể bị lưu trùng)
+        unique_records = {}
+        for record in records:
+            unique_records.setdefault(str(record["song_id"]), record)
+
+        songs = await AsyncSongRepository.find_by_ids(list(unique_records), SONG_INFO_PROJECTION)
+        songs_by_id = {str(song["_id"]): song for song in songs}
+
+        history = []
+        for song_id_str, record in unique_records.items():
+            song = songs_by_id.get(song_id_str)
+            history.append({
+                "_id": str(record["_id"]),  # thêm key _id để frontend dùng
+                "song_id": song_id_str,
+                "user_id": str(record["user_id"]),
+                "timestamp": record["timestamp"].isoformat(),
+                "song_info": {
+                    "title": song["title"] if song else "Unknown",
+                    "artist": song["artist"] if song else "Unknown",
+                    "coverArt": song.get("coverArt", "") if song else "",
+                    "audioUrl": song.get("audioUrl", "") if song else "",
                 }
+            })
 
-        return {"history": list(unique_songs.values())}
+        return {
+            "history": history,
+            "next_cursor": _encode_cursor(records[-1]) if has_more else None
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy lịch sử: {e}")
@@ -2,21 +2,28 @@
 from fastapi import APIRouter
 from models.listen_song import ListenSongRequest
 from services.listen_service import ListenService
+from database.repositories.async_listen_repository import AsyncListenRepository
+from services.listen_ingestor import listen_ingestor
 
 router = APIRouter(prefix="/api/listens", tags=["listens"])
 listen_service = ListenService()
 
 @router.get("/count/{song_id}")
-def count_total_listens(song_id: str):
-    total = listen_service.repo.count_total_listens(song_id)
+async def count_total_listens(song_id: str):
+    total = await AsyncListenRepository().count_total_listens(song_id)
     return {"song_id": song_id, "total": total}
 
 # ✅ Ghi nhận hành vi (nghe hoặc tìm kiếm)
 @router.post("/record")
-def record_listen(data: ListenSongRequest):
-    listen_service.record_listen(data)
+async def record_listen(data: ListenSongRequest):
+    # Đưa vào hàng đợi write-behind, không chờ Mongo
+    await listen_ingestor.submit(data)
     return {"message": "✅ Listen/search recorded successfully"}
 
+@router.get("/ingest-stats")
+def get_ingest_stats():
+    return listen_ingestor.metrics()
+
 @router.get("/top")
 def get_top_listened_songs(limit: int = 10):
     top_songs = listen_service.repo.get_top_listened_songs(limit=limit)
@@ -42,9 +49,8 @@ def get_top_artists_by_listens(limit: int = 10):
     return listen_service.repo.get_top_artists_by_listens(limit=limit)
 
 @router.get("/history/repeat-count")
-def get_repeat_count(user_id: str, song_id: str):
-    service = ListenService()
-    count = service.get_repeat_count(user_id, song_id)
+async def get_repeat_count(user_id: str, song_id: str):
+    count = await AsyncListenRepository().get_repeat_count(user_id, song_id)
     return {"repeat_count": count}
 
 @router.get("/top-with-info")
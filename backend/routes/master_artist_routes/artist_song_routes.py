@@ -4,15 +4,7 @@ from services.master_artist_service.artist_song_service import ArtistSongService
 from auth import get_current_artist
 from typing import List, Optional
 from pydantic import BaseModel
-from cloudinary.uploader import upload
-import os
-from cloudinary import config
-
-config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+from services.media_upload import media_upload
 
 router = APIRouter(prefix="/artist/songs", tags=["artist_songs"])
 
@@ -72,7 +64,7 @@ async def create_song(
     current_artist: dict = Depends(get_current_artist)
 ):
     try:
-        song_id = service.create_song(current_artist["artist_id"], song_data)
+        song_id = await service.create_song(current_artist["artist_id"], song_data)
         return {"id": song_id, "message": "Song created successfully"}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
@@ -87,7 +79,7 @@ async def update_song(
     current_artist: dict = Depends(get_current_artist)
 ):
     try:
-        updated = service.update_song(song_id, song_data, current_artist["artist_id"])
+        updated = await service.update_song(song_id, song_data, current_artist["artist_id"])
         if not updated:
             raise HTTPException(status_code=404, detail="Song not found or permission denied")
         return {"message": "Song updated successfully"}
@@ -114,22 +106,24 @@ async def delete_song(
 async def upload_media(
     cover_art: Optional[UploadFile] = File(None),
     audio: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = None,
     current_artist: dict = Depends(get_current_artist)
 ):
     try:
-        result = {}
-        if cover_art:
-            print(f"Uploading cover art for artist {current_artist['artist_id']}")
-            cover_result = upload(cover_art.file, resource_type="image")
-            result["coverArt"] = cover_result["secure_url"]
-        if audio:
-            print(f"Uploading audio for artist {current_artist['artist_id']}")
-            audio_result = upload(audio.file, resource_type="raw")
-            result["audioUrl"] = audio_result["secure_url"]
-        return result
+        print(f"Uploading media for artist {current_artist['artist_id']}")
+        return await media_upload.upload_song_media(current_artist["id"], cover_art, audio, upload_id)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         print(f"Error in upload_media: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.get("/upload/{upload_id}", response_model=dict)
+async def get_upload_progress(upload_id: str, current_artist: dict = Depends(get_current_artist)):
+    progress = media_upload.progress(current_artist["id"], upload_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return progress
+
 
 
@@ -20,7 +20,7 @@ async def create_notification(
 
 @router.post("/{notif_id}/mark-read")
 async def mark_read(notif_id: str):
-    return await NotificationService.mark_as_read(notif_id)
+    return await NotificationService.mark_read(notif_id)
 
 @router.delete("/{notif_id}")
 async def delete_notification(notif_id: str):
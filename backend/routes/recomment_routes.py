@@ -1,5 +1,11 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+from auth import get_current_admin
+from database.db import songs_collection
 from services.recommendation_service import get_recommendations
+from services.song_similarity import song_similarity
+from services.audio_features import audio_features
 
 router = APIRouter()
 
@@ -12,3 +18,46 @@ def recommend(user_id: str = Query(...), limit: int = 30):
         "artist": song.get("artist"),
         "cover_art": song.get("coverArt"),  # ✅ đảm bảo đây là URL hoặc đường dẫn đúng
     } for song in recs]
+
+
+def _neighbour_songs(neighbours):
+    """[(song_id, score)] → thông tin bài hát (1 truy vấn $in), giữ thứ tự điểm, bỏ bài không còn trong DB."""
+    songs = {
+        str(song["_id"]): song
+        for song in songs_collection.find(
+            {"_id": {"$in": [ObjectId(sid) for sid, _ in neighbours]}},
+            {"title": 1, "artist": 1, "coverArt": 1}
+        )
+    }
+    return [{
+        "id": sid,
+        "title": songs[sid].get("title"),
+        "artist": songs[sid].get("artist"),
+        "cover_art": songs[sid].get("coverArt"),
+        "score": round(score, 4),
+    } for sid, score in neighbours if sid in songs]
+
+
+@router.get("/recommendations/similar/{song_id}")
+def similar_songs(song_id: str, limit: int = Query(20, ge=1, le=50)):
+    """Bài hát hay được nghe cùng phiên với song_id (co-listen)."""
+    return _neighbour_songs(song_similarity.neighbours(song_id, limit))
+
+
+@router.get("/recommendations/audio-similar/{song_id}")
+def audio_similar_songs(song_id: str, limit: int = Query(20, ge=1, le=50)):
+    """Bài hát có đặc trưng âm thanh gần nhất (tempo, loudness, âm sắc — xem services/audio_features.py)."""
+    return _neighbour_songs(audio_features.similar(song_id, limit))
+
+
+@router.post("/recommendations/similar/reload", dependencies=[Depends(get_current_admin)])
+async def reload_similar_songs():
+    """Nạp ngay ma trận co-listen vừa build offline ở worker nhận request (worker khác nạp ở lần kiểm tra định kỳ)."""
+    reloaded = await run_in_threadpool(song_similarity.reload_if_changed)
+    return {"reloaded": reloaded, "songs": len(song_similarity.matrix), "pairs": song_similarity.matrix.nnz}
+
+
+@router.post("/recommendations/similar/rebuild", dependencies=[Depends(get_current_admin)])
+async def rebuild_similar_songs():
+    """Tính lại ma trận co-listen ngay trong process API và thay bản đang dùng (ưu tiên build offline + /reload)."""
+    return await run_in_threadpool(song_similarity.rebuild)
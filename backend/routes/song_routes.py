@@ -39,7 +39,7 @@ GENRE_MAP = {
 
 # ✅ GET all songs (supports filter, sort, pagination)
 @router.get("", response_model=SongsResponse)
-async def get_songs(
+def get_songs(
     genre: Optional[str] = Query(None),
     region: Optional[str] = Query(None),
     sort: Optional[str] = Query(None),
@@ -78,7 +78,7 @@ async def get_songs(
 
 # ✅ GET top 100 songs by genre
 @router.get("/top100/{genre}", response_model=List[SongInDB])
-async def get_top100_by_genre(genre: str, service: SongService = Depends(get_song_service)):
+def get_top100_by_genre(genre: str, service: SongService = Depends(get_song_service)):
     """
     Retrieve top 100 songs for a specific genre.
     """
@@ -91,7 +91,7 @@ async def get_top100_by_genre(genre: str, service: SongService = Depends(get_son
 
 # ✅ GET one song by ID
 @router.get("/{id}", response_model=SongInDB)
-async def get_song(id: str, service: SongService = Depends(get_song_service)):
+def get_song(id: str, service: SongService = Depends(get_song_service)):
     song = service.get_song_by_id(id)
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
@@ -101,7 +101,7 @@ async def get_song(id: str, service: SongService = Depends(get_song_service)):
 @router.post("", dependencies=[Depends(get_current_user)])
 async def create_song(song_data: SongCreate, service: SongService = Depends(get_song_service)):
     try:
-        song_id = service.create_song(song_data)
+        song_id = await service.create_song(song_data)
         return {"id": song_id, "message": "Song created successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -112,7 +112,7 @@ async def create_song(song_data: SongCreate, service: SongService = Depends(get_
 @router.put("/{id}", dependencies=[Depends(get_current_user)])
 async def update_song(id: str, song_data: SongUpdate, service: SongService = Depends(get_song_service)):
     try:
-        if not service.update_song(id, song_data):
+        if not await service.update_song(id, song_data):
             raise HTTPException(status_code=404, detail="Song not found")
         return {"message": "Song updated successfully"}
     except ValueError as e:
@@ -120,14 +120,14 @@ async def update_song(id: str, song_data: SongUpdate, service: SongService = Dep
 
 # ✅ DELETE song
 @router.delete("/{id}", dependencies=[Depends(get_current_user)])
-async def delete_song(id: str, service: SongService = Depends(get_song_service)):
+def delete_song(id: str, service: SongService = Depends(get_song_service)):
     if not service.delete_song(id):
         raise HTTPException(status_code=404, detail="Song not found")
     return {"message": "Song deleted successfully"}
 
 # ✅ GET random song
 @router.get("/random", response_model=SongInDB)
-async def get_random_song(service: SongService = Depends(get_song_service)):
+def get_random_song(service: SongService = Depends(get_song_service)):
     """
     Retrieve a random song from up to 50 songs.
     """
@@ -138,7 +138,7 @@ async def get_random_song(service: SongService = Depends(get_song_service)):
 
 # ✅ GET random list of songs
 @router.get("/random-list", response_model=SongsResponse)
-async def get_random_songs(
+def get_random_songs(
     limit: int = 10,
     region: Optional[str] = None,
     service: SongService = Depends(get_song_service)
@@ -151,7 +151,7 @@ async def get_random_songs(
 
 # ✅ GET newest songs
 @router.get("/reset", response_model=SongsResponse)
-async def get_reset_songs(
+def get_reset_songs(
     limit: int = 12,
     service: SongService = Depends(get_song_service)
 ):
@@ -166,7 +166,7 @@ async def get_reset_songs(
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/{id}/lyrics")
-async def get_song_lyrics(id: str, service: SongService = Depends(get_song_service)):
+def get_song_lyrics(id: str, service: SongService = Depends(get_song_service)):
     song = service.get_song_by_id(id)
     if not song or not song.lyrics_lrc:
         raise HTTPException(status_code=404, detail="Lyrics not found")
@@ -0,0 +1,22 @@
+# routes/stream_routes.py
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import RedirectResponse
+from services.audio_stream import audio_resolver, AudioFileResponse, is_not_modified, cache_headers
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+# ✅ Phát audio theo song_id: hỗ trợ Range (tua), ETag / Last-Modified (nghe lại → 304)
+@router.api_route("/{song_id}", methods=["GET", "HEAD"])
+def stream_song(song_id: str, request: Request):
+    source = audio_resolver.resolve(song_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+
+    # File trên CDN (Cloudinary...): chuyển hướng, CDN tự phục vụ Range / ETag
+    if source.url:
+        return RedirectResponse(source.url, status_code=307, headers={"cache-control": "public, max-age=300"})
+
+    headers = cache_headers(source)
+    if is_not_modified(request.headers, source):
+        return Response(status_code=304, headers=headers)
+    return AudioFileResponse(source.path, headers=headers, stat_result=source.stat)
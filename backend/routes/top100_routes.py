@@ -1,32 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from database.repositories.song_repository import SongRepository
 from bson import ObjectId
 from database.db import songs_collection
+from services.chart_service import chart_service, GENRE_MAP, MEMORY_TTL
+from utils.http_cache import etag_matches
 
 router = APIRouter(prefix="/top100", tags=["Top 100 Songs"])
 
-SUPPORTED_GENRES = [
-    "love", "sad", "happy", "rap", "korean",
-    "edm", "pop", "rock", "instrumental", "lofi", "usuk", "vpop","kpop","edm"
-]
-
-GENRE_MAP = {
-    "love": "Love",
-    "sad": "Sad",
-    "happy": "Happy",
-    "rap": "Rap",
-    "korean": "Korean",
-    "edm": "EDM",
-    "pop": "Pop",
-    "rock": "Rock",
-    "instrumental": "Instrumental",
-    "lofi": "Lo-fi",
-    "usuk": "UK-US",
-    "vpop": "Vietnamese",
-    "kpop": "Korean",
-    "edm": "EDM"
-
-}
+SUPPORTED_GENRES = list(GENRE_MAP)
 
 
 def convert_song(song: dict) -> dict:
@@ -38,21 +19,25 @@ def convert_song(song: dict) -> dict:
         "audioUrl": song.get("audioUrl"),
     }
 
-# ✅ Route chung cho tất cả genre
+# ✅ Route chung cho tất cả genre (chart tính sẵn theo lượt nghe, hỗ trợ ETag / 304)
 @router.get("/{genre}")
-def get_top_songs_by_genre(genre: str):
+def get_top_songs_by_genre(genre: str, request: Request, response: Response):
     genre = genre.lower()
 
     if genre not in SUPPORTED_GENRES:
         raise HTTPException(status_code=400, detail=f"Genre '{genre}' not supported.")
-    
-    db_genre = GENRE_MAP[genre]
-    recs = list(songs_collection.find({ "genre": {"$in": [db_genre]} }).limit(100))
 
+    chart = chart_service.get_chart(genre)
+    etag = f'"{chart["etag"]}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(MEMORY_TTL)}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
     return {
         "genre": genre,
-        "total": len(recs),
-        "songs": [convert_song(song) for song in recs]
+        "total": len(chart["songs"]),
+        "songs": chart["songs"]
     }
 
 # ✅ Route riêng cho USUK
@@ -7,7 +7,7 @@ from services.user_service import UserService
 from services.song_service import SongService
 from database.repositories.song_repository import SongRepository
 from database.repositories.artist_repository import ArtistRepository
-from services.listen_service import ListenService
+from services.listen_ingestor import listen_ingestor
 from models.listen_song import ListenSongRequest
 from fastapi import Request
 from auth import create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
@@ -157,9 +157,8 @@ def get_liked_songs(current_user: dict = Depends(get_current_user)):
     # Fetch song details using SongService
     song_service = SongService(SongRepository(), ArtistRepository())
 
-    # Get full song objects
-    songs = [song_service.get_song_by_id(song_id) for song_id in song_ids]
-    songs = [s for s in songs if s]  # Remove None (deleted songs)
+    # Get full song objects (1 truy vấn cho bài hát + 1 cho nghệ sĩ, bỏ qua bài đã xoá)
+    songs = song_service.get_songs_by_ids(song_ids)
 
     return {"liked": songs}
 
@@ -173,14 +172,13 @@ async def record_full_listen(request: Request):
     if not user_id or not song_id or not listened_at:
         raise HTTPException(status_code=400, detail="Missing data")
 
-    listen_service = ListenService()
     listen_data = ListenSongRequest(
         user_id=user_id,
         song_id=song_id,
         listened_at=listened_at
     )
 
-    listen_service.record_listen(listen_data)
+    await listen_ingestor.submit(listen_data)
 
     return {"message": "Full listen recorded successfully"}
 
@@ -198,8 +196,6 @@ async def record_search(request: Request):
     if not song_id and not artist_id:
         raise HTTPException(status_code=400, detail="Must provide either song_id or artist_id")
 
-    listen_service = ListenService()
-
     listen_data = ListenSongRequest(
         user_id=user_id,
         song_id=song_id,
@@ -210,7 +206,7 @@ async def record_search(request: Request):
 
     print(f"🎯 Received search event: {listen_data}")
 
-    listen_service.record_listen(listen_data)
+    await listen_ingestor.submit(listen_data)
 
     return {"message": "Search recorded successfully"}
 
@@ -233,7 +233,9 @@ songs = [
     
 ]
 
-# Step 4: Seed songs
+# Step 4: Seed songs (artistId lưu dạng chuỗi, xem database/id_migration.py)
+for song in songs:
+    song["artistId"] = str(song["artistId"])
 songs_collection.delete_many({})
 inserted = songs_collection.insert_many(songs)
 song_ids = inserted.inserted_ids
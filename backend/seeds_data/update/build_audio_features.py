@@ -0,0 +1,11 @@
+import sys
+from services.audio_features import audio_features, WORKERS
+
+# ✅ Trích đặc trưng âm thanh (tempo, loudness, spectral centroid, MFCC...) cho các bài có file audio local
+#    --full: tính lại toàn bộ, không dùng lại vector của file chưa đổi
+#    (cần khối __main__: process con được tạo bằng spawn sẽ import lại file này)
+if __name__ == "__main__":
+    if "--full" not in sys.argv:
+        audio_features.load()
+    print(f"🔁 Extracting audio features ({WORKERS} processes)...")
+    print(f"🎉 audio features built: {audio_features.rebuild()} → {audio_features.path}")
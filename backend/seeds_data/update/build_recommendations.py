@@ -0,0 +1,6 @@
+from services.recommendation_engine import recommendation_engine
+
+# ✅ Tính lại toàn bộ ứng viên gợi ý cho mọi user có lịch sử nghe / follow
+print("🔁 Rebuilding precomputed recommendations...")
+count = recommendation_engine.refresh_all()
+print(f"🎉 recommendations rebuilt for {count} users.")
@@ -0,0 +1,5 @@
+from services.song_similarity import song_similarity
+
+# ✅ Tính ma trận co-listen (song × song) từ listen_song + history và ghi ra file; app đang chạy tự nạp lại sau tối đa SONG_SIMILARITY_RELOAD_INTERVAL giây (hoặc gọi POST /api/recommendations/similar/reload)
+print("🔁 Building song similarity matrix...")
+print(f"🎉 song similarity built: {song_similarity.rebuild()} → {song_similarity.path}")
@@ -0,0 +1,19 @@
+import sys
+from database.indexes import ensure_indexes, verify
+
+# ✅ Tạo các index khai báo trong database/indexes.py rồi kiểm tra index thiếu / truy vấn COLLSCAN
+#    --check: chỉ kiểm tra, không tạo
+if "--check" not in sys.argv:
+    print("🔁 Creating missing indexes...")
+    report = ensure_indexes()
+    print(f"🎉 created {len(report['created'])}: {report['created']}")
+    for failure in report["failed"]:
+        print(f"❌ {failure}")
+
+report = verify()
+for name in report["missing"]:
+    print(f"⚠️ missing index: {name}")
+for probe in report["collscans"]:
+    print(f"⚠️ COLLSCAN: {probe}")
+if not report["missing"] and not report["collscans"]:
+    print("✅ All indexes present, no COLLSCAN in sample queries.")
@@ -0,0 +1,7 @@
+from database.repositories.chat_repository import ChatRepository
+from database.indexes import ensure_indexes
+
+# ✅ Chuyển lịch sử chat cũ (1 document / user, mảng messages) sang chat_messages (1 document / tin nhắn)
+print("🔁 Migrating chat_history → chat_messages...")
+ensure_indexes(["chat_messages"])
+print(f"🎉 migrated {ChatRepository.migrate_legacy()} messages.")
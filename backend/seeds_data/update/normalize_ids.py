@@ -0,0 +1,7 @@
+from database.id_migration import id_migration, VERSION
+
+# ✅ Chuẩn hoá kiểu id (users._id, songs.artistId, listen_song / history / follows ...) — chạy lại được nếu bị ngắt
+print(f"🔁 Normalizing id types (version {VERSION})...")
+for step, converted in id_migration.run().items():
+    print(f"   - {step}: {converted} converted")
+print("🎉 id normalization done.")
@@ -0,0 +1,6 @@
+from database.repositories.listen_stats_repository import ListenStatsRepository
+
+# ✅ Tính lại bộ đếm lượt nghe / tìm kiếm từ listen_song
+print("🔁 Rebuilding listen counters from listen_song...")
+ListenStatsRepository().rebuild_from_events()
+print("🎉 listen counters rebuild done.")
@@ -0,0 +1,13 @@
+import sys
+from database.migrations import run_pending, pending
+
+# ✅ Chạy các bản sửa dữ liệu chưa chạy (database/migrations.py) — --list: chỉ liệt kê
+if "--list" in sys.argv:
+    for migration in pending():
+        print(f"⏳ {migration.name}: {migration.description}")
+    sys.exit(0)
+
+print("🔁 Running pending migrations...")
+for name, result in run_pending().items():
+    print(f"   - {name}: {result}")
+print("🎉 Migrations done.")
@@ -1,4 +1,6 @@
 from database.db import listen_song_collection
+from database.repositories.listen_stats_repository import ListenStatsRepository
+from database.repositories.listen_repository import ListenRepository
 from bson import ObjectId
 from typing import List, Dict
 from datetime import datetime
@@ -7,53 +9,30 @@ from datetime import datetime
 class AdminListenService:
     def __init__(self):
         self.collection = listen_song_collection
+        self.stats = ListenStatsRepository()
 
     def count_total_listens(self) -> int:
-        return self.collection.count_documents({})
+        return self.stats.total_events()
 
     def get_top_listened_songs(self, limit: int = 10) -> List[Dict]:
-        pipeline = [
-            {"$group": {"_id": "$song_id", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": limit},
-            {
-                "$addFields": {
-                    "song_oid": {
-                        "$cond": {
-                            "if": {"$eq": [{"$type": "$_id"}, "string"]},
-                            "then": {"$toObjectId": "$_id"},
-                            "else": "$_id"
-                        }
-                    }
-                }
-            },
+        # Tính trên tổng mọi loại sự kiện (nghe + tìm kiếm) như trước đây
+        top = self.stats.top_songs("total_count", limit)
+        songs = ListenRepository._songs_by_id([doc["_id"] for doc in top])
+        return [
             {
-                "$lookup": {
-                    "from": "songs",
-                    "localField": "song_oid",
-                    "foreignField": "_id",
-                    "as": "song"
-                }
-            },
-            {"$unwind": "$song"},
-            {
-                "$project": {
-                    "song_id": {"$toString": "$_id"},
-                    "title": "$song.title",
-                    "artist_name": "$song.artist",
-                    "cover": "$song.coverArt",
-                    "duration": "$song.duration",
-                    "listen_count": "$count",
-                }
+                "song_id": doc["_id"],
+                "title": songs[doc["_id"]].get("title"),
+                "artist_name": songs[doc["_id"]].get("artist"),
+                "cover": songs[doc["_id"]].get("coverArt"),
+                "duration": songs[doc["_id"]].get("duration"),
+                "listen_count": doc["total_count"],
             }
+            for doc in top if doc["_id"] in songs
         ]
 
-        results = list(self.collection.aggregate(pipeline))
-
-        return results
-
     def get_listen_activity_by_date(self, start_date: datetime, end_date: datetime) -> List[Dict]:
-
+        # song_id trong listen_song luôn là chuỗi (xem database/id_migration.py):
+        # gom theo ngày rồi lấy thông tin bài hát bằng 1 truy vấn $in thay vì $toObjectId + $lookup
         pipeline = [
             {"$match": {"listened_at": {"$gte": start_date, "$lte": end_date}}},
             {
@@ -64,13 +43,6 @@ class AdminListenService:
                             "then": "$listened_at",
                             "else": {"$toDate": "$listened_at"}
                         }
-                    },
-                    "song_oid": {
-                        "$cond": {
-                            "if": {"$eq": [{"$type": "$song_id"}, "string"]},
-                            "then": {"$toObjectId": "$song_id"},
-                            "else": "$song_id"
-                        }
                     }
                 }
             },
@@ -83,34 +55,26 @@ class AdminListenService:
                         }
                     },
                     "count": {"$sum": 1},
-                    "song_ids": {"$push": "$song_oid"}
-                }
-            },
-            {"$unwind": "$song_ids"},
-            {
-                "$lookup": {
-                    "from": "songs",
-                    "localField": "song_ids",
-                    "foreignField": "_id",
-                    "as": "song_info"
-                }
-            },
-            {"$unwind": "$song_info"},
-            {
-                "$group": {
-                    "_id": "$_id",
-                    "count": {"$first": "$count"},
-                    "songs": {
-                        "$push": {
-                            "title": "$song_info.title",
-                            "cover": "$song_info.cover",
-                            "artist": "$artist.name"
-                        }
-                    }
+                    "song_ids": {"$push": "$song_id"}
                 }
             },
             {"$sort": {"_id": 1}}
         ]
 
-        result = list(self.collection.aggregate(pipeline))
-        return result
\ No newline at end of file
+        days = list(self.collection.aggregate(pipeline))
+        songs = ListenRepository._songs_by_id(list({str(sid) for day in days for sid in day["song_ids"] if sid}))
+        return [
+            {
+                "_id": day["_id"],
+                "count": day["count"],
+                "songs": [
+                    {
+                        "title": songs[sid].get("title"),
+                        "cover": songs[sid].get("coverArt"),
+                        "artist": songs[sid].get("artist")
+                    }
+                    for sid in map(str, day["song_ids"]) if sid in songs
+                ]
+            }
+            for day in days
+        ]
@@ -4,8 +4,8 @@ from datetime import datetime
 from typing import List, Optional, Tuple
 from models.song import SongCreate, SongUpdate, SongInDB
 from database.repositories.song_repository import SongRepository
-from urllib.request import urlopen
-from urllib.error import HTTPError
+from utils.media_validator import media_validator
+from starlette.concurrency import run_in_threadpool
 
 class AdminSongService:
     def __init__(self, song_repository: SongRepository):
@@ -39,17 +39,6 @@ class AdminSongService:
             print(f"Error mapping song to SongInDB: {str(e)}, song_data={song}")
             raise ValueError(f"Failed to map song data: {str(e)}")
 
-    @staticmethod
-    def _is_url_accessible(url: str) -> bool:
-        if not url:
-            return True
-        try:
-            with urlopen(url, timeout=5) as response:
-                return response.status == 200
-        except HTTPError as e:
-            print(f"URL inaccessible: {url}, error: {str(e)}")
-            return False
-
     def get_all_songs(self, search: Optional[str], sort: Optional[str], skip: Optional[int], limit: Optional[int]) -> Tuple[List[SongInDB], int]:
         try:
             query = {}
@@ -77,21 +66,18 @@ class AdminSongService:
 
             raise ValueError(f"Failed to fetch song: {str(e)}")
 
-    def create_song(self, song_data: SongCreate) -> str:
+    async def create_song(self, song_data: SongCreate) -> str:
         try:
             audioUrl = str(song_data.audioUrl) if song_data.audioUrl else None
             coverArt = str(song_data.coverArt) if song_data.coverArt else None
 
-            # ✅ Validate and get artist name
-            artist_doc = artists_collection.find_one({"_id": ObjectId(song_data.artistId)})
+            # ✅ Validate and get artist name (pymongo đồng bộ → threadpool, không chặn event loop)
+            artist_doc = await run_in_threadpool(artists_collection.find_one, {"_id": ObjectId(song_data.artistId)})
             if not artist_doc:
                 raise ValueError(f"Artist with ID {song_data.artistId} does not exist")
             artist_name = artist_doc.get("name", "")
 
-            if audioUrl and not self._is_url_accessible(audioUrl):
-                raise ValueError("Invalid or inaccessible audio URL")
-            if coverArt and not self._is_url_accessible(coverArt):
-                raise ValueError("Invalid or inaccessible cover art URL")
+            await media_validator.ensure_song_media(audio_url=audioUrl, cover_art=coverArt)
 
             new_song = song_data.dict(exclude_unset=True)
             new_song["created_at"] = datetime.utcnow()
@@ -102,64 +88,45 @@ class AdminSongService:
             if new_song.get("audioUrl"):
                 new_song["audioUrl"] = str(new_song["audioUrl"])
 
-            song_id = self.song_repository.insert(new_song)
-
-            if song_data.album:
-                from database.repositories.album_repository import AlbumRepository
-                album_repo = AlbumRepository()
-                album_doc = album_repo.find_by_title(song_data.album)
-                if not album_doc:
-                    raise ValueError(f"Album with title {song_data.album} not found")
-                album_id = album_doc[0]["_id"]
-                AlbumRepository.add_song_to_album(str(album_id), str(song_id))
-
+            song_id = await run_in_threadpool(self._insert_song, new_song, song_data.album)
             print(f"Created song with ID: {song_id}")
             return str(song_id)
         except Exception as e:
             print(f"Error creating song: {str(e)}")
             raise ValueError(f"Failed to create song: {str(e)}")
 
-    def update_song(self, song_id: str, song_data: SongUpdate) -> bool:
+    def _insert_song(self, new_song: dict, album: Optional[str]):
+        song_id = self.song_repository.insert(new_song)
+
+        if album:
+            from database.repositories.album_repository import AlbumRepository
+            album_repo = AlbumRepository()
+            album_doc = album_repo.find_by_title(album)
+            if not album_doc:
+                raise ValueError(f"Album with title {album} not found")
+            album_id = album_doc[0]["_id"]
+            AlbumRepository.add_song_to_album(str(album_id), str(song_id))
+        return song_id
+
+    async def update_song(self, song_id: str, song_data: SongUpdate) -> bool:
         try:
             update_data = song_data.dict(exclude_unset=True)
 
             # ✅ Validate and set artist name if artistId is updated
             if "artistId" in update_data:
-                artist_doc = artists_collection.find_one({"_id": ObjectId(update_data["artistId"])})
+                artist_doc = await run_in_threadpool(artists_collection.find_one, {"_id": ObjectId(update_data["artistId"])})
                 if not artist_doc:
                     raise ValueError(f"Artist with ID {update_data['artistId']} does not exist")
                 update_data["artist"] = artist_doc.get("name", "")  # ✅ Update artist name
 
             if "coverArt" in update_data and update_data["coverArt"]:
-                if not self._is_url_accessible(str(update_data["coverArt"])):
-                    raise ValueError("Invalid or inaccessible cover art URL")
                 update_data["coverArt"] = str(update_data["coverArt"])
-
             if "audioUrl" in update_data and update_data["audioUrl"]:
-                if not self._is_url_accessible(str(update_data["audioUrl"])):
-                    raise ValueError("Invalid or inaccessible audio URL")
                 update_data["audioUrl"] = str(update_data["audioUrl"])
+            await media_validator.ensure_song_media(audio_url=update_data.get("audioUrl"), cover_art=update_data.get("coverArt"))
 
             update_data["updated_at"] = datetime.utcnow()
-            result = self.song_repository.update(song_id, update_data)
-
-            if "album" in update_data:
-                from database.repositories.album_repository import AlbumRepository
-                album_repo = AlbumRepository()
-
-                old_song = self.song_repository.find_by_id(song_id)
-                if old_song and old_song.get("album"):
-                    old_album_doc = album_repo.find_by_title(old_song["album"])
-                    if old_album_doc:
-                        old_album_id = old_album_doc[0]["_id"]
-                        AlbumRepository.remove_song_from_album(str(old_album_id), song_id)
-
-                new_album_doc = album_repo.find_by_title(update_data["album"])
-                if not new_album_doc:
-                    raise ValueError(f"Album with title {update_data['album']} not found")
-                new_album_id = new_album_doc[0]["_id"]
-                AlbumRepository.add_song_to_album(str(new_album_id), song_id)
-
+            result = await run_in_threadpool(self._apply_update, song_id, update_data)
             print(f"Updated song {song_id}: {result}")
             return result
 
@@ -167,6 +134,27 @@ class AdminSongService:
             print(f"Error updating song {song_id}: {str(e)}")
             raise ValueError(f"Failed to update song: {str(e)}")
 
+    def _apply_update(self, song_id: str, update_data: dict) -> bool:
+        result = self.song_repository.update(song_id, update_data)
+
+        if "album" in update_data:
+            from database.repositories.album_repository import AlbumRepository
+            album_repo = AlbumRepository()
+
+            old_song = self.song_repository.find_by_id(song_id)
+            if old_song and old_song.get("album"):
+                old_album_doc = album_repo.find_by_title(old_song["album"])
+                if old_album_doc:
+                    old_album_id = old_album_doc[0]["_id"]
+                    AlbumRepository.remove_song_from_album(str(old_album_id), song_id)
+
+            new_album_doc = album_repo.find_by_title(update_data["album"])
+            if not new_album_doc:
+                raise ValueError(f"Album with title {update_data['album']} not found")
+            new_album_id = new_album_doc[0]["_id"]
+            AlbumRepository.add_song_to_album(str(new_album_id), song_id)
+        return result
+
 
     def delete_song(self, song_id: str) -> bool:
         try:
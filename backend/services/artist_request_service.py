@@ -3,6 +3,7 @@ from models.artist_request import ArtistRequestCreate, ArtistRequestInDB
 from database.repositories.artist_request_repository import ArtistRequestRepository
 from database.repositories.artist_repository import ArtistRepository
 from database.repositories.user_repository import UserRepository
+from services.user_service import UserService
 from datetime import datetime
 from fastapi import HTTPException
 from typing import List,Optional
@@ -92,6 +93,7 @@ class ArtistRequestService:
             "artist_id": str(artist_id),
             "verified": True
         })
+        UserService.invalidate_principal(request["user_id"])
 
        # Update trạng thái request
         self.repo.update(request_id, {"status": "approved", "updated_at": datetime.utcnow()})
@@ -0,0 +1,310 @@
+# services/audio_features.py
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from database.db import songs_collection
+
+logger = logging.getLogger(__name__)
+
+FEATURES_PATH = os.getenv("AUDIO_FEATURES_PATH", os.path.join("data", "audio_features.npz"))
+WORKERS = int(os.getenv("AUDIO_FEATURES_WORKERS", str(os.cpu_count() or 1)))
+SAMPLE_RATE = 22050
+MAX_SECONDS = float(os.getenv("AUDIO_FEATURES_MAX_SECONDS", "90"))  # chỉ phân tích đoạn đầu
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+N_MELS = 40
+N_MFCC = 13
+TEMPO_RANGE = (60.0, 200.0)
+
+FEATURE_NAMES = (
+    ["tempo", "loudness_db", "dynamic_range_db", "centroid_mean", "centroid_std",
+     "rolloff_mean", "zcr_mean", "flatness_mean"]
+    + [f"mfcc_{i}" for i in range(N_MFCC)]
+)
+
+
+# ----------------------------
+# Decode + trích đặc trưng (chạy trong process con)
+# ----------------------------
+def decode(path: str) -> np.ndarray:
+    """Mono float32 ở SAMPLE_RATE. Dùng ffmpeg nếu có (mp3, m4a...), không thì chỉ đọc được WAV PCM."""
+    if shutil.which("ffmpeg"):
+        result = subprocess.run(
+            ["ffmpeg", "-v", "error", "-nostdin", "-t", str(MAX_SECONDS), "-i", path,
+             "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "f32le", "-"],
+            capture_output=True, check=True
+        )
+        return np.frombuffer(result.stdout, dtype=np.float32)
+    if not path.lower().endswith(".wav"):
+        raise ValueError("cần ffmpeg để giải mã file không phải WAV")
+    with wave.open(path, "rb") as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        raw = wav.readframes(int(MAX_SECONDS * rate))
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    else:
+        raise ValueError(f"WAV {width * 8}-bit không hỗ trợ")
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def _mel_filterbank() -> np.ndarray:
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    bins = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    edges = to_hz(np.linspace(to_mel(0.0), to_mel(SAMPLE_RATE / 2), N_MELS + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, None]
+    dct = np.sqrt(2.0 / N_MELS) * np.cos(np.pi / N_MELS * (n + 0.5) * k)
+    dct[0] /= np.sqrt(2.0)
+    return dct.astype(np.float32)
+
+
+MEL_FILTERS = _mel_filterbank()
+DCT = _dct_matrix()
+
+
+def _tempo(onset: np.ndarray) -> float:
+    """BPM từ tự tương quan của onset envelope, ưu tiên nhẹ quanh 120 BPM."""
+    onset = onset - onset.mean()
+    if not onset.any():
+        return 0.0
+    spectrum = np.fft.rfft(onset, 2 * len(onset))
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum))[:len(onset)]
+    frame_rate = SAMPLE_RATE / HOP_SIZE
+    min_lag = int(frame_rate * 60.0 / TEMPO_RANGE[1])
+    max_lag = min(len(autocorr) - 1, int(frame_rate * 60.0 / TEMPO_RANGE[0]))
+    if max_lag <= min_lag:
+        return 0.0
+    lags = np.arange(min_lag, max_lag + 1)
+    bpm = 60.0 * frame_rate / lags
+    weighted = autocorr[lags] * np.exp(-0.5 * np.log2(bpm / 120.0) ** 2)
+    return float(bpm[np.argmax(weighted)])
+
+
+def extract_features(samples: np.ndarray) -> Optional[np.ndarray]:
+    """Vector float32 theo FEATURE_NAMES, None nếu audio quá ngắn / im lặng."""
+    if len(samples) < FRAME_SIZE or not np.any(samples):
+        return None
+    n_frames = 1 + (len(samples) - FRAME_SIZE) // HOP_SIZE
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE][:n_frames]
+
+    eps = 1e-10
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    rms_db = 20 * np.log10(rms + eps)
+    zcr = np.mean(np.abs(np.diff(np.signbit(frames), axis=1)), axis=1)
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE).astype(np.float32), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1.0 / SAMPLE_RATE)
+    total = power.sum(axis=1) + eps
+    centroid = (power @ freqs) / total
+    rolloff = freqs[np.minimum(np.argmax(np.cumsum(power, axis=1) >= 0.85 * total[:, None], axis=1), len(freqs) - 1)]
+    flatness = np.exp(np.mean(np.log(power + eps), axis=1)) / (np.mean(power, axis=1) + eps)
+
+    log_mel = np.log(power @ MEL_FILTERS.T + eps)
+    mfcc = log_mel @ DCT.T
+    onset = np.maximum(0.0, np.diff(log_mel, axis=0)).sum(axis=1)
+
+    vector = [
+        _tempo(onset),
+        float(20 * np.log10(np.sqrt(np.mean(samples ** 2)) + eps)),
+        float(np.percentile(rms_db, 95) - np.percentile(rms_db, 10)),
+        float(centroid.mean()), float(centroid.std()),
+        float(rolloff.mean()), float(zcr.mean()), float(flatness.mean()),
+    ] + mfcc.mean(axis=0).tolist()
+    return np.asarray(vector, dtype=np.float32)
+
+
+def analyze_file(path: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """(vector, lỗi) — hàm top-level để chạy được trong ProcessPoolExecutor."""
+    try:
+        vector = extract_features(decode(path))
+        return (vector, None) if vector is not None else (None, "audio quá ngắn hoặc im lặng")
+    except Exception as e:
+        return None, str(e)
+
+
+# ----------------------------
+# Lưu trữ + truy vấn
+# ----------------------------
+class AudioFeatureMatrix:
+    """
+    features[i] là vector float32 (FEATURE_NAMES) của song_ids[i]; sizes / mtimes để biết file đã đổi chưa.
+    _unit: đặc trưng chuẩn hoá z-score theo cả catalog rồi chuẩn hoá độ dài → cosine = 1 phép nhân ma trận.
+    """
+
+    def __init__(self, song_ids: np.ndarray, features: np.ndarray, sizes: np.ndarray, mtimes: np.ndarray):
+        self.song_ids = song_ids
+        self.features = features
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self._position = {song_id: i for i, song_id in enumerate(song_ids.tolist())}
+        self._unit = self._normalize(features)
+
+    @classmethod
+    def empty(cls) -> "AudioFeatureMatrix":
+        return cls(np.array([], dtype="<U24"), np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32),
+                   np.array([], dtype=np.int64), np.array([], dtype=np.int64))
+
+    @classmethod
+    def from_rows(cls, rows: Dict[str, Tuple[Tuple[int, int], np.ndarray]]) -> "AudioFeatureMatrix":
+        if not rows:
+            return cls.empty()
+        song_ids = sorted(rows)
+        return cls(
+            np.array(song_ids, dtype="<U24"),
+            np.stack([rows[sid][1] for sid in song_ids]).astype(np.float32),
+            np.array([rows[sid][0][0] for sid in song_ids], dtype=np.int64),
+            np.array([rows[sid][0][1] for sid in song_ids], dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    def rows(self) -> Dict[str, Tuple[Tuple[int, int], np.ndarray]]:
+        return {
+            sid: ((int(self.sizes[i]), int(self.mtimes[i])), self.features[i])
+            for i, sid in enumerate(self.song_ids.tolist())
+        }
+
+    def vector(self, song_id: str) -> Optional[np.ndarray]:
+        i = self._position.get(str(song_id))
+        return None if i is None else self.features[i]
+
+    def similar(self, song_ids: Iterable[str], limit: int = 20,
+                exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Top-K cosine so với trung bình vector của song_ids (bỏ chính các bài đó và exclude)."""
+        positions = [self._position[sid] for sid in map(str, song_ids) if sid in self._position]
+        if not positions or limit <= 0:
+            return []
+        profile = self._unit[positions].mean(axis=0)
+        norm = np.linalg.norm(profile)
+        if not norm:
+            return []
+        scores = self._unit @ (profile / norm)
+        banned = positions + [self._position[sid] for sid in map(str, exclude) if sid in self._position]
+        scores[banned] = -np.inf
+        limit = min(limit, len(scores) - len(set(banned)))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(str(self.song_ids[i]), float(scores[i])) for i in top]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, song_ids=self.song_ids, features=self.features,
+                            sizes=self.sizes, mtimes=self.mtimes, names=np.array(FEATURE_NAMES))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "AudioFeatureMatrix":
+        with np.load(path) as data:
+            if data["names"].tolist() != FEATURE_NAMES:
+                raise ValueError("feature layout changed, rebuild required")
+            return cls(data["song_ids"], data["features"], data["sizes"], data["mtimes"])
+
+    @staticmethod
+    def _normalize(features: np.ndarray) -> np.ndarray:
+        if not len(features):
+            return features
+        std = features.std(axis=0)
+        z = (features - features.mean(axis=0)) / np.where(std > 0, std, 1.0)
+        norms = np.linalg.norm(z, axis=1, keepdims=True)
+        return (z / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+
+class AudioFeatures:
+    """
+    Gợi ý theo nội dung âm thanh:
+    - rebuild() giải mã file audio local của từng bài (ffmpeg / WAV), trích tempo, loudness, spectral centroid,
+      rolloff, ZCR, flatness, trung bình MFCC — song song trên ProcessPoolExecutor (CPU, WORKERS process)
+    - File không đổi (size + mtime) dùng lại vector cũ; bài chỉ có URL remote bị bỏ qua
+    - Lưu ra FEATURES_PATH rồi thay matrix đang dùng mà không cần restart (giống song_similarity)
+    """
+
+    def __init__(self, path: str = FEATURES_PATH):
+        self.path = path
+        self.matrix = AudioFeatureMatrix.empty()
+        self._rebuild_lock = threading.Lock()
+
+    def similar(self, song_id: str, limit: int = 20) -> List[Tuple[str, float]]:
+        return self.matrix.similar([song_id], limit)
+
+    def similar_to_songs(self, song_ids: Iterable[str], limit: int = 20,
+                         exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        return self.matrix.similar(song_ids, limit, exclude)
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        self.matrix = AudioFeatureMatrix.load(self.path)
+        logger.info(f"[AudioFeatures] loaded {len(self.matrix)} songs from {self.path}")
+        return True
+
+    def rebuild(self, save: bool = True, workers: int = WORKERS) -> Dict:
+        from services.audio_stream import local_audio_path
+
+        with self._rebuild_lock:
+            previous = self.matrix.rows()
+            rows, jobs, remote = {}, [], 0
+            for song in songs_collection.find({"audioUrl": {"$nin": [None, ""]}}, {"audioUrl": 1}):
+                song_id, path = str(song["_id"]), local_audio_path(str(song["audioUrl"]))
+                if path is None:
+                    remote += 1
+                    continue
+                stat = os.stat(path)
+                key = (stat.st_size, stat.st_mtime_ns)
+                if song_id in previous and previous[song_id][0] == key:
+                    rows[song_id] = previous[song_id]
+                else:
+                    jobs.append((song_id, path, key))
+
+            failed = 0
+            if jobs:
+                context = multiprocessing.get_context("spawn")  # không fork process đang có thread (catalog, pool...)
+                with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context) as pool:
+                    results = pool.map(analyze_file, [path for _, path, _ in jobs], chunksize=4)
+                    for (song_id, path, key), (vector, error) in zip(jobs, results):
+                        if vector is None:
+                            failed += 1
+                            logger.error(f"[AudioFeatures] {song_id} ({path}): {error}")
+                            continue
+                        rows[song_id] = (key, vector)
+
+            matrix = AudioFeatureMatrix.from_rows(rows)
+            if save:
+                matrix.save(self.path)
+            self.matrix = matrix
+        report = {"songs": len(matrix), "analyzed": len(jobs) - failed, "reused": len(rows) - (len(jobs) - failed),
+                  "failed": failed, "remote_skipped": remote}
+        logger.info(f"[AudioFeatures] rebuilt: {report}")
+        return report
+
+
+audio_features = AudioFeatures()
@@ -0,0 +1,159 @@
+# services/audio_stream.py
+import os
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import NamedTuple, Optional
+from urllib.parse import unquote, urlparse
+from starlette.responses import FileResponse
+from starlette.types import Send
+from services.catalog_cache import catalog_cache
+from services.media_upload import LOCAL_MEDIA_ROOT, LOCAL_MEDIA_BASE_URL
+from utils.http_cache import etag_matches
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = os.getenv("AUDIO_DIR", "audio")
+RESOLVE_TTL = float(os.getenv("STREAM_RESOLVE_TTL", "30"))
+CACHE_MAX_AGE = int(os.getenv("STREAM_CACHE_MAX_AGE", "3600"))
+SENDFILE_MIN_SIZE = int(os.getenv("STREAM_SENDFILE_MIN_SIZE", str(256 * 1024)))
+
+# Tiền tố URL → thư mục local (file nằm ngoài thư mục gốc sẽ bị bỏ qua)
+LOCAL_PREFIXES = (
+    ("/audio/", AUDIO_DIR),
+    (LOCAL_MEDIA_BASE_URL.rstrip("/") + "/", LOCAL_MEDIA_ROOT),
+)
+
+
+class AudioSource(NamedTuple):
+    path: Optional[str]          # file local (phục vụ trực tiếp)
+    url: Optional[str]           # URL remote (redirect, CDN tự xử lý Range / ETag)
+    stat: Optional[os.stat_result]
+    etag: Optional[str]
+
+
+class AudioResolver:
+    """
+    song_id → nguồn audio, lấy audioUrl từ catalog_cache (không truy vấn Mongo mỗi lần tua).
+    Kết quả (kèm os.stat + ETag) được nhớ RESOLVE_TTL giây và xoá ngay khi bài hát đổi trong catalog.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(maxsize=4096, ttl=RESOLVE_TTL)
+        catalog_cache.subscribe(self._on_catalog_change)
+
+    def resolve(self, song_id: str) -> Optional[AudioSource]:
+        source = self._cache.get(song_id)
+        if source is None:
+            source = self._resolve(song_id)
+            if source is not None:
+                self._cache.set(song_id, source)
+        return source
+
+    def _resolve(self, song_id: str) -> Optional[AudioSource]:
+        song = catalog_cache.get("songs", song_id)
+        audio_url = (song or {}).get("audioUrl")
+        if not audio_url:
+            return None
+        path = local_audio_path(str(audio_url))
+        if path is None:
+            return AudioSource(None, str(audio_url), None, None)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            logger.error(f"[AudioResolver] {song_id}: local file missing {path}")
+            return None
+        return AudioSource(path, None, stat, strong_etag(stat))
+
+    def _on_catalog_change(self, kind: str, record_id: Optional[str], record: Optional[dict]):
+        if kind != "songs":
+            return
+        if record_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(record_id)
+
+
+def local_audio_path(audio_url: str) -> Optional[str]:
+    """File local tương ứng với audioUrl (/audio/..., media upload local), None nếu là URL remote."""
+    for prefix, root in LOCAL_PREFIXES:
+        if prefix.startswith("/"):
+            parsed = urlparse(audio_url)
+            if parsed.netloc or not parsed.path.startswith(prefix):
+                continue
+            relative = parsed.path[len(prefix):]
+        elif audio_url.startswith(prefix):
+            relative = urlparse(audio_url[len(prefix):]).path
+        else:
+            continue
+        root = os.path.realpath(root)
+        path = os.path.realpath(os.path.join(root, unquote(relative)))
+        if path.startswith(root + os.sep) and os.path.isfile(path):
+            return path
+    return None
+
+
+def strong_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def is_not_modified(headers, source: AudioSource) -> bool:
+    """Conditional GET: If-None-Match (ưu tiên) hoặc If-Modified-Since."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, source.etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(source.stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def cache_headers(source: AudioSource) -> dict:
+    return {
+        "etag": source.etag,
+        "last-modified": formatdate(source.stat.st_mtime, usegmt=True),
+        "cache-control": f"public, max-age={CACHE_MAX_AGE}",
+    }
+
+
+class AudioFileResponse(FileResponse):
+    """
+    FileResponse (Range, If-Range, multipart ranges của Starlette) + gửi zero-copy qua sendfile
+    khi ASGI server hỗ trợ extension "http.response.zerocopysend" và file đủ lớn;
+    server không hỗ trợ thì đọc theo chunk như FileResponse.
+    """
+    chunk_size = 256 * 1024
+
+    async def __call__(self, scope, receive, send):
+        self._zerocopy = (
+            "http.response.zerocopysend" in scope.get("extensions", {})
+            and self.stat_result is not None
+            and self.stat_result.st_size >= SENDFILE_MIN_SIZE
+        )
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        await self._sendfile(send, 0, self.stat_result.st_size)
+
+    async def _handle_single_range(self, send: Send, start: int, end: int, file_size: int,
+                                   send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_single_range(send, start, end, file_size, send_header_only)
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        await self._sendfile(send, start, end - start)
+
+    async def _sendfile(self, send: Send, offset: int, count: int):
+        with open(self.path, "rb") as file:
+            await send({"type": "http.response.zerocopysend", "file": file,
+                        "offset": offset, "count": count, "more_body": False})
+
+
+audio_resolver = AudioResolver()
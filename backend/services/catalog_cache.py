@@ -0,0 +1,243 @@
+# services/catalog_cache.py
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from bson import ObjectId
+from database.db import db, songs_collection, artists_collection, albums_collection
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "30"))
+FULL_RELOAD_INTERVAL = float(os.getenv("CATALOG_FULL_RELOAD_INTERVAL", "3600"))
+BIO_MAX_LENGTH = 1000
+
+# Chỉ giữ các field mà chatbot / search / fuzzy-match cần (không có lyrics, không có toàn bộ document)
+PROJECTIONS = {
+    "songs": {
+        "_id": 1, "title": 1, "normalizedTitle": 1, "artist": 1, "artistId": 1, "album": 1,
+        "releaseYear": 1, "duration": 1, "genre": 1, "tags": 1, "audioUrl": 1,
+        "coverArt": 1, "cover_art": 1, "cover_image": 1, "cover_url": 1
+    },
+    "artists": {
+        "_id": 1, "name": 1, "normalizedName": 1, "bio": 1, "genres": 1, "followers": 1,
+        "image": 1, "avatar_url": 1
+    },
+    "albums": {
+        "_id": 1, "title": 1, "normalizedTitle": 1, "artist_id": 1, "artist": 1, "release_year": 1,
+        "coverArt": 1, "cover_art": 1, "cover_url": 1, "cover_image": 1
+    },
+}
+OWNER_FIELD = {"songs": "artistId", "albums": "artist_id"}
+
+
+def _compact(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {k: _compact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(v) for v in value]
+    return value
+
+
+class CatalogCache:
+    """
+    Bản sao gọn (chỉ field cần thiết) của songs / artists / albums, dùng chung cho chatbot, search index, fuzzy match.
+    - Nạp lười ở lần dùng đầu tiên (ensure_loaded)
+    - Repository gọi upsert / reload / remove sau mỗi lần ghi
+    - start() theo dõi thay đổi từ nơi khác (script, service khác): change stream nếu Mongo hỗ trợ,
+      nếu không thì poll theo updated_at / created_at và nạp lại toàn bộ sau FULL_RELOAD_INTERVAL
+    - Listener (search index, fuzzy index...) được báo mỗi khi 1 bản ghi thay đổi hoặc catalog nạp lại
+    """
+    KINDS = ("songs", "artists", "albums")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict[str, dict]] = {kind: {} for kind in self.KINDS}
+        self._versions: Dict[str, int] = {kind: 0 for kind in self.KINDS}
+        self._listeners: List[Callable[[str, Optional[str], Optional[dict]], None]] = []
+        self._loaded = False
+        self._watermark: Optional[datetime] = None
+        self._last_full_reload = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ----------------------------
+    # Đọc
+    # ----------------------------
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.reload_all()
+
+    def all(self, kind: str) -> List[dict]:
+        self.ensure_loaded()
+        with self._lock:
+            return list(self._records[kind].values())
+
+    def get(self, kind: str, record_id) -> Optional[dict]:
+        self.ensure_loaded()
+        return self._records[kind].get(str(record_id))
+
+    def count(self, kind: str) -> int:
+        self.ensure_loaded()
+        return len(self._records[kind])
+
+    def version(self, kind: str) -> int:
+        """Tăng mỗi khi kind thay đổi — dùng để biết khi nào dữ liệu dẫn xuất cần tính lại."""
+        self.ensure_loaded()
+        return self._versions[kind]
+
+    def subscribe(self, listener: Callable[[str, Optional[str], Optional[dict]], None]):
+        """
+        listener(kind, record_id, record):
+        - record là dict  → thêm / cập nhật
+        - record là None  → xoá record_id
+        - record_id None  → kind vừa được nạp lại toàn bộ
+        """
+        self._listeners.append(listener)
+
+    # ----------------------------
+    # Ghi (repository gọi sau khi ghi Mongo)
+    # ----------------------------
+    def reload_all(self):
+        with self._lock:
+            for kind in self.KINDS:
+                collection = self._collection(kind)
+                self._records[kind] = {
+                    str(doc["_id"]): self._to_record(kind, doc)
+                    for doc in collection.find({}, PROJECTIONS[kind])
+                }
+                self._versions[kind] += 1
+            self._loaded = True
+            self._watermark = datetime.utcnow()
+            self._last_full_reload = time.monotonic()
+        logger.info(
+            f"[CatalogCache] loaded {len(self._records['songs'])} songs, "
+            f"{len(self._records['artists'])} artists, {len(self._records['albums'])} albums"
+        )
+        for kind in self.KINDS:
+            self._notify(kind, None, None)
+
+    def upsert(self, kind: str, doc: dict):
+        if not self._loaded or not doc or "_id" not in doc:
+            return
+        record = self._to_record(kind, doc)
+        with self._lock:
+            self._records[kind][record["_id"]] = record
+            self._versions[kind] += 1
+        self._notify(kind, record["_id"], record)
+
+    def reload(self, kind: str, doc_id):
+        """Đọc lại 1 document (sau update một phần) rồi cập nhật cache."""
+        if not self._loaded:
+            return
+        try:
+            oid = doc_id if isinstance(doc_id, ObjectId) else ObjectId(str(doc_id))
+            doc = self._collection(kind).find_one({"_id": oid}, PROJECTIONS[kind])
+        except Exception as e:
+            logger.error(f"[CatalogCache] reload {kind} {doc_id} failed: {e}")
+            return
+        if doc:
+            self.upsert(kind, doc)
+        else:
+            self.remove(kind, doc_id)
+
+    def remove(self, kind: str, doc_id):
+        if not self._loaded:
+            return
+        with self._lock:
+            removed = self._records[kind].pop(str(doc_id), None)
+            if removed:
+                self._versions[kind] += 1
+        if removed:
+            self._notify(kind, str(doc_id), None)
+
+    def remove_by_owner(self, kind: str, owner_id):
+        """Xoá các bản ghi thuộc 1 nghệ sĩ (dùng cho delete_by_artist_id)."""
+        if not self._loaded:
+            return
+        owner_id, field = str(owner_id), OWNER_FIELD[kind]
+        with self._lock:
+            doomed = [rid for rid, rec in self._records[kind].items() if str(rec.get(field)) == owner_id]
+        for rid in doomed:
+            self.remove(kind, rid)
+
+    # ----------------------------
+    # Theo dõi thay đổi từ bên ngoài
+    # ----------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._follow_changes, name="catalog-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _follow_changes(self):
+        self.ensure_loaded()
+        try:
+            self._watch()
+        except Exception as e:
+            # Standalone server không có change stream → poll
+            logger.info(f"[CatalogCache] change streams unavailable ({e}), polling every {POLL_INTERVAL}s")
+        while not self._stop.wait(POLL_INTERVAL):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"[CatalogCache] poll failed: {e}")
+
+    def _watch(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.KINDS)}}}]
+        with db.watch(pipeline, full_document="updateLookup", max_await_time_ms=1000) as stream:
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    continue
+                kind, doc_id = change["ns"]["coll"], change["documentKey"]["_id"]
+                if change["operationType"] == "delete":
+                    self.remove(kind, doc_id)
+                elif change.get("fullDocument"):
+                    self.upsert(kind, change["fullDocument"])
+
+    def poll(self):
+        """Nạp các document có updated_at / created_at mới hơn lần poll trước; định kỳ nạp lại toàn bộ để bắt cả xoá."""
+        if time.monotonic() - self._last_full_reload >= FULL_RELOAD_INTERVAL:
+            self.reload_all()
+            return
+        since, now = self._watermark, datetime.utcnow()
+        for kind in self.KINDS:
+            query = {"$or": [{"updated_at": {"$gt": since}}, {"created_at": {"$gt": since}}]}
+            for doc in self._collection(kind).find(query, PROJECTIONS[kind]):
+                self.upsert(kind, doc)
+        self._watermark = now
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    @staticmethod
+    def _collection(kind: str):
+        return {"songs": songs_collection, "artists": artists_collection, "albums": albums_collection}[kind]
+
+    @staticmethod
+    def _to_record(kind: str, doc: dict) -> dict:
+        record = {key: _compact(doc[key]) for key in PROJECTIONS[kind] if key in doc}
+        if kind == "artists" and isinstance(record.get("bio"), str):
+            record["bio"] = record["bio"][:BIO_MAX_LENGTH]
+        return record
+
+    def _notify(self, kind: str, record_id: Optional[str], record: Optional[dict]):
+        for listener in self._listeners:
+            try:
+                listener(kind, record_id, record)
+            except Exception as e:
+                logger.error(f"[CatalogCache] listener {listener} failed on {kind}: {e}")
+
+
+catalog_cache = CatalogCache()
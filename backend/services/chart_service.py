@@ -0,0 +1,168 @@
+# services/chart_service.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from database.db import charts_collection
+from database.repositories.listen_stats_repository import ListenStatsRepository
+from services.catalog_cache import catalog_cache
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CHART_SIZE = 100
+REFRESH_INTERVAL = float(os.getenv("CHART_REFRESH_INTERVAL", "300"))
+MEMORY_TTL = float(os.getenv("CHART_MEMORY_TTL", "60"))            # tầng bộ nhớ; worker khác thấy bản mới sau tối đa MEMORY_TTL
+CHANGE_RATIO = float(os.getenv("CHART_CHANGE_RATIO", "0.01"))      # tính lại khi tổng lượt nghe đổi > 1%...
+MIN_CHANGE = int(os.getenv("CHART_MIN_CHANGE", "50"))              # ...và ít nhất 50 lượt
+STATE_ID = "_state"
+
+# genre trên URL -> genre trong DB
+GENRE_MAP = {
+    "love": "Love",
+    "sad": "Sad",
+    "happy": "Happy",
+    "rap": "Rap",
+    "korean": "Korean",
+    "edm": "EDM",
+    "pop": "Pop",
+    "rock": "Rock",
+    "instrumental": "Instrumental",
+    "lofi": "Lo-fi",
+    "usuk": "UK-US",
+    "vpop": "Vietnamese",
+    "kpop": "Korean",
+}
+
+
+def _chart_song(record: dict, listens: int) -> dict:
+    return {
+        "id": record["_id"],
+        "title": record.get("title"),
+        "artist": record.get("artist"),
+        "cover_art": record.get("coverArt"),  # giữ đồng nhất camelCase
+        "audioUrl": record.get("audioUrl"),
+        "listen_count": listens,
+    }
+
+
+class ChartService:
+    """
+    Top 100 theo thể loại, tính sẵn:
+    - Xếp hạng theo lượt nghe thật (listen_song_stats.listen_count — bộ đếm cộng dồn từ listen_song)
+    - 2 tầng: TTLCache trong process → collection charts (dùng chung giữa các worker) → tính ngay nếu chưa có
+    - Job định kỳ chỉ tính lại khi tổng lượt nghe đổi quá ngưỡng (CHANGE_RATIO / MIN_CHANGE) hoặc catalog bài hát đổi
+    - Mỗi chart có etag (hash danh sách bài + lượt nghe) để route trả 304
+    """
+
+    def __init__(self):
+        self.collection = charts_collection
+        self.stats = ListenStatsRepository()
+        self._memory = TTLCache(maxsize=64, ttl=MEMORY_TTL)
+        self._catalog_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ----------------------------
+    # Đọc
+    # ----------------------------
+    def get_chart(self, genre: str) -> Dict:
+        """genre là key trên URL (xem GENRE_MAP). Trả về {genre, songs, etag, computed_at}."""
+        chart = self._memory.get(genre)
+        if chart is None:
+            chart = self.collection.find_one({"_id": genre})
+            if chart is None:
+                chart = self.compute([genre])[genre]
+            self._memory.set(genre, chart)
+        return chart
+
+    # ----------------------------
+    # Tính
+    # ----------------------------
+    def compute(self, genres: Iterable[str]) -> Dict[str, Dict]:
+        """Tính và lưu chart cho các genre (1 lượt quét catalog + 1 truy vấn bộ đếm cho tất cả)."""
+        genres = [g for g in genres if g in GENRE_MAP]
+        wanted = {GENRE_MAP[g] for g in genres}
+        listens = self.stats.listen_counts()
+
+        by_genre = defaultdict(list)
+        for record in catalog_cache.all("songs"):
+            song_genres = record.get("genre") or []
+            for db_genre in [song_genres] if isinstance(song_genres, str) else song_genres:
+                if db_genre in wanted:
+                    by_genre[db_genre].append(record)
+
+        now = datetime.utcnow()
+        charts = {}
+        for genre in genres:
+            ranked = sorted(
+                by_genre.get(GENRE_MAP[genre], []),
+                key=lambda r: (-listens.get(r["_id"], 0), r.get("title") or "")
+            )[:CHART_SIZE]
+            songs = [_chart_song(r, listens.get(r["_id"], 0)) for r in ranked]
+            # Băm toàn bộ payload: sửa title / cover / audioUrl cũng đổi ETag (không chỉ thứ hạng + lượt nghe)
+            etag = hashlib.sha1(
+                json.dumps(songs, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            ).hexdigest()
+            chart = {"_id": genre, "genre": genre, "songs": songs, "etag": etag, "computed_at": now}
+            self.collection.replace_one({"_id": genre}, chart, upsert=True)
+            self._memory.set(genre, chart)
+            charts[genre] = chart
+        return charts
+
+    def refresh(self, force: bool = False) -> bool:
+        """Tính lại toàn bộ chart nếu lượt nghe / catalog đổi đủ nhiều. Trả về True nếu đã tính lại."""
+        total = self.stats.total_listens()
+        version = catalog_cache.version("songs")
+        state = self.collection.find_one({"_id": STATE_ID}) or {}
+        last_total = state.get("listen_total")
+
+        changed = (
+            force
+            or last_total is None
+            or abs(total - last_total) > max(MIN_CHANGE, CHANGE_RATIO * last_total)
+            or (self._catalog_version is not None and version != self._catalog_version)
+        )
+        self._catalog_version = version
+        if not changed:
+            return False
+
+        self.compute(GENRE_MAP.keys())
+        self.collection.update_one(
+            {"_id": STATE_ID},
+            {"$set": {"listen_total": total, "computed_at": datetime.utcnow()}},
+            upsert=True
+        )
+        logger.info(f"[ChartService] recomputed {len(GENRE_MAP)} charts (listens {last_total} → {total})")
+        return True
+
+    # ----------------------------
+    # Chạy định kỳ trong app
+    # ----------------------------
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"[ChartService] refresh failed: {e}")
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+
+chart_service = ChartService()
@@ -1,6 +1,6 @@
 # services/chat_recommend_service.py
-from database.db import chat_history_collection, songs_collection
-from bson import ObjectId
+from database.db import songs_collection
+from database.repositories.chat_repository import ChatRepository
 import re
 
 def extract_keywords(text):
@@ -9,18 +9,12 @@ def extract_keywords(text):
 def get_recommendations_from_chat(user_id: str, limit: int = 10):
     print("💬 Gợi ý nhạc từ nội dung hội thoại cho user:", user_id)
 
-    doc = chat_history_collection.find_one({"user_id": ObjectId(user_id)})
-    if not doc or "history" not in doc:
-        print("📭 Không có lịch sử chat.")
-        return []
-
-    # 🔁 Lọc tin nhắn gần nhất từ người dùng
-    messages = [msg for msg in reversed(doc["history"]) if msg.get("sender") == "user"]
-    if not messages:
+    # 🔁 Tin nhắn gần nhất từ người dùng
+    latest_msg = ChatRepository.get_latest_user_text(user_id).lower()
+    if not latest_msg:
         print("📭 Không có tin nhắn người dùng.")
         return []
 
-    latest_msg = messages[0].get("text", "").lower()
     keywords = extract_keywords(latest_msg)
     print("🔍 Keywords tìm được:", keywords)
 
@@ -1,6 +1,7 @@
 from database.db import follows_collection, artists_collection
 from datetime import datetime
 from bson import ObjectId
+from services.trending import trending
 
 class FollowService:
 
@@ -17,6 +18,7 @@ class FollowService:
             "artist_id": ObjectId(artist_id),
             "followed_at": datetime.utcnow()
         })
+        trending.record_follow(artist_id)
 
     def unfollow(self, user_id: str, artist_id: str):
         follows_collection.delete_one({
@@ -29,6 +31,31 @@ class FollowService:
             "artist_id": ObjectId(artist_id)
         })
 
+    def get_follow_stats(self, artist_ids: list, user_id: str = None) -> dict:
+        """
+        Số người theo dõi + trạng thái follow của user cho cả danh sách nghệ sĩ:
+        1 aggregation cho follower count, 1 truy vấn $in cho các nghệ sĩ user đang follow.
+        Trả về {artist_id: {"followerCount": int, "isFollowing": bool}}
+        """
+        object_ids = [ObjectId(a) for a in artist_ids if ObjectId.is_valid(str(a))]
+        stats = {str(a): {"followerCount": 0, "isFollowing": False} for a in object_ids}
+        if not object_ids:
+            return stats
+
+        for row in follows_collection.aggregate([
+            {"$match": {"artist_id": {"$in": object_ids}}},
+            {"$group": {"_id": "$artist_id", "count": {"$sum": 1}}}
+        ]):
+            stats[str(row["_id"])]["followerCount"] = row["count"]
+
+        if user_id and ObjectId.is_valid(str(user_id)):
+            for follow in follows_collection.find(
+                {"user_id": ObjectId(user_id), "artist_id": {"$in": object_ids}},
+                {"artist_id": 1}
+            ):
+                stats[str(follow["artist_id"])]["isFollowing"] = True
+        return stats
+
     def get_followed_artist_ids(self, user_id: str) -> list:
         follows = follows_collection.find({"user_id": ObjectId(user_id)})
         return [str(f["artist_id"]) for f in follows]
@@ -0,0 +1,219 @@
+# services/fuzzy_index.py
+import logging
+import os
+import threading
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from services.catalog_cache import catalog_cache
+from utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+GRAM_SIZE = 3
+# Số ứng viên (theo trigram) được chấm lại bằng SequenceMatcher. Đo trên 5.000 tiêu đề / 299 truy vấn có lỗi gõ:
+# pool 10 → ~5% truy vấn có điểm thấp hơn difflib.get_close_matches, 50 → ~1% (~2.7ms / truy vấn, difflib ~80ms)
+RERANK_POOL = int(os.getenv("FUZZY_RERANK_POOL", "50"))
+STOP_GRAM_RATIO = 0.05  # trigram xuất hiện ở > 5% keyword bị bỏ qua khi sinh ứng viên
+MIN_STOP_POSTING = 1000
+
+
+def _grams(text: str) -> set:
+    padded = f" {text} "
+    if len(padded) <= GRAM_SIZE:
+        return {padded}
+    return {padded[i:i + GRAM_SIZE] for i in range(len(padded) - GRAM_SIZE + 1)}
+
+
+class FuzzyIndex:
+    """
+    So khớp gần đúng theo trigram:
+    - Mỗi record có 1 hoặc nhiều keyword (đã chuẩn hoá), mỗi keyword được index theo trigram
+    - Sinh ứng viên bằng cách đếm trigram chung (np.bincount trên postings dạng mảng), xếp theo
+      Dice = 2 * chung / (|trigram keyword| + |trigram query|) (gần với ratio() của SequenceMatcher);
+      chỉ RERANK_POOL ứng viên tốt nhất mới được chấm lại bằng SequenceMatcher (cùng thang điểm với
+      difflib.get_close_matches). Là xấp xỉ: ứng viên ngoài pool có thể bị bỏ sót, xem RERANK_POOL
+    - containment=True: keyword nằm trong query (hoặc ngược lại) được tính 1.0, giống logic chatbot cũ;
+      ứng viên khi đó xếp theo chung / min(|trigram keyword|, |trigram query|) để keyword ngắn nằm trong query không bị loại
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keywords: Dict[int, Tuple[str, str, frozenset]] = {}  # kid -> (record_id, keyword, grams)
+        self._record_keys: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[str, set] = defaultdict(set)
+        self._exact: Dict[str, set] = defaultdict(set)
+        self._arrays: Dict[str, np.ndarray] = {}           # postings dạng mảng, dựng lười khi tìm
+        self._sizes = np.zeros(1024, dtype=np.int32)       # kid -> số trigram của keyword
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._record_keys)
+
+    def clear(self):
+        with self._lock:
+            self._keywords.clear()
+            self._record_keys.clear()
+            self._postings.clear()
+            self._exact.clear()
+            self._arrays.clear()
+
+    def add(self, record_id: str, keywords: List[str]):
+        with self._lock:
+            self.remove(record_id)
+            for keyword in dict.fromkeys(k for k in keywords if k):
+                kid = self._next_id
+                self._next_id += 1
+                grams = frozenset(_grams(keyword))
+                self._keywords[kid] = (record_id, keyword, grams)
+                self._record_keys[record_id].append(kid)
+                self._exact[keyword].add(kid)
+                if kid >= len(self._sizes):
+                    self._sizes = np.concatenate([self._sizes, np.zeros(len(self._sizes), dtype=np.int32)])
+                self._sizes[kid] = len(grams)
+                for gram in grams:
+                    self._postings[gram].add(kid)
+                    self._arrays.pop(gram, None)
+
+    def remove(self, record_id: str):
+        with self._lock:
+            for kid in self._record_keys.pop(record_id, []):
+                _, keyword, grams = self._keywords.pop(kid)
+                self._sizes[kid] = 0
+                self._discard(self._exact, keyword, kid)
+                for gram in grams:
+                    self._discard(self._postings, gram, kid)
+                    self._arrays.pop(gram, None)
+
+    def search(self, query: str, limit: int = 5, cutoff: float = 0.6,
+               containment: bool = False) -> List[Tuple[float, str, str]]:
+        """Trả về [(score, record_id, keyword)] giảm dần theo score, score >= cutoff."""
+        query = normalize_text(query or "")
+        if not query:
+            return []
+        with self._lock:
+            best: Dict[str, Tuple[float, str]] = {}
+            for kid in self._exact.get(query, ()):
+                record_id, keyword, _ = self._keywords[kid]
+                best[record_id] = (1.0, keyword)
+
+            for kid in self._candidates(query, containment):
+                record_id, keyword, _ = self._keywords[kid]
+                score = self._score(query, keyword, cutoff, containment)
+                if score >= cutoff and score > best.get(record_id, (0.0,))[0]:
+                    best[record_id] = (score, keyword)
+
+        ranked = sorted(((score, rid, kw) for rid, (score, kw) in best.items()), key=lambda x: -x[0])
+        return ranked[:limit]
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    @staticmethod
+    def _discard(index: Dict[str, set], key: str, kid: int):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.discard(kid)
+            if not bucket:
+                del index[key]
+
+    def _array(self, gram: str) -> np.ndarray:
+        array = self._arrays.get(gram)
+        if array is None:
+            array = np.fromiter(self._postings[gram], dtype=np.int64)
+            self._arrays[gram] = array
+        return array
+
+    def _candidates(self, query: str, containment: bool = False) -> List[int]:
+        query_grams = _grams(query)
+        sizes = sorted((len(self._postings[g]), g) for g in query_grams if g in self._postings)
+        if not sizes:
+            return []
+        stop_size = max(MIN_STOP_POSTING, int(len(self._keywords) * STOP_GRAM_RATIO))
+        selective = [g for size, g in sizes if size <= stop_size] or [sizes[0][1]]
+
+        shared = np.bincount(np.concatenate([self._array(g) for g in selective]))
+        kids = np.flatnonzero(shared)
+        if containment:
+            overlap = shared[kids] / np.maximum(np.minimum(self._sizes[kids], len(query_grams)), 1)
+        else:
+            overlap = 2 * shared[kids] / np.maximum(self._sizes[kids] + len(query_grams), 1)
+        if kids.size > RERANK_POOL:
+            top = np.argpartition(-overlap, RERANK_POOL - 1)[:RERANK_POOL]
+            kids, overlap = kids[top], overlap[top]
+        return [int(kid) for kid in kids[np.argsort(-overlap, kind="stable")]]
+
+    @staticmethod
+    def _score(query: str, keyword: str, cutoff: float, containment: bool) -> float:
+        if containment and (keyword in query or query in keyword):
+            return 1.0
+        matcher = SequenceMatcher(None, query, keyword)
+        if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+            return 0.0
+        return matcher.ratio()
+
+
+# ----------------------------
+# Index dùng chung cho catalog (songs / artists / albums)
+# ----------------------------
+def _keywords(kind: str, record: dict) -> List[str]:
+    text = normalize_text(record.get("name" if kind == "artists" else "title") or "")
+    return [text, text.replace(" ", "")] if text else []
+
+
+class CatalogFuzzyIndex:
+    """FuzzyIndex cho từng loại trong catalog_cache: dựng lười ở lần tìm đầu, cập nhật theo thay đổi của catalog."""
+
+    def __init__(self):
+        self._indexes: Dict[str, FuzzyIndex] = {}
+        self._lock = threading.Lock()
+        catalog_cache.subscribe(self._on_catalog_change)
+
+    def search(self, kind: str, query: str, limit: int = 5, cutoff: float = 0.6,
+               containment: bool = False) -> List[Tuple[float, dict]]:
+        """[(score, record trong catalog)]"""
+        index = self._index(kind)
+        hits = []
+        for score, record_id, _ in index.search(query, limit, cutoff, containment):
+            record = catalog_cache.get(kind, record_id)
+            if record:
+                hits.append((score, record))
+        return hits
+
+    def best(self, kind: str, query: str, cutoff: float = 0.6, containment: bool = False) -> Optional[dict]:
+        hits = self.search(kind, query, 1, cutoff, containment)
+        return hits[0][1] if hits else None
+
+    def _index(self, kind: str) -> FuzzyIndex:
+        index = self._indexes.get(kind)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(kind)
+                if index is None:
+                    index = self._build(kind)
+                    self._indexes[kind] = index
+        return index
+
+    @staticmethod
+    def _build(kind: str) -> FuzzyIndex:
+        index = FuzzyIndex()
+        for record in catalog_cache.all(kind):
+            index.add(record["_id"], _keywords(kind, record))
+        logger.info(f"[CatalogFuzzyIndex] built {kind}: {len(index)} records")
+        return index
+
+    def _on_catalog_change(self, kind: str, record_id: Optional[str], record: Optional[dict]):
+        if record_id is None:
+            self._indexes.pop(kind, None)  # dựng lại lười ở lần tìm sau
+            return
+        index = self._indexes.get(kind)
+        if index is None:
+            return
+        if record is None:
+            index.remove(record_id)
+        else:
+            index.add(record_id, _keywords(kind, record))
+
+
+catalog_fuzzy = CatalogFuzzyIndex()
@@ -1,5 +1,6 @@
 from database.db import db
 from datetime import datetime
+from services.trending import trending
 
 class LikeService:
     def is_liked(self, user_id: str, song_id: str) -> bool:
@@ -11,6 +12,7 @@ class LikeService:
             "song_id": song_id,
             "liked_at": datetime.utcnow()
         })
+        trending.record_like(song_id)
 
     def unlike(self, user_id: str, song_id: str):
         db["liked_songs"].delete_one({
@@ -0,0 +1,135 @@
+# services/listen_ingestor.py
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo.errors import ConnectionFailure
+from models.listen_song import ListenSongRequest
+from database.repositories.listen_repository import ListenRepository
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.getenv("LISTEN_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.getenv("LISTEN_FLUSH_INTERVAL", "1.0"))
+QUEUE_SIZE = int(os.getenv("LISTEN_QUEUE_SIZE", "10000"))
+ENQUEUE_TIMEOUT = float(os.getenv("LISTEN_ENQUEUE_TIMEOUT", "0.05"))
+FLUSH_RETRIES = int(os.getenv("LISTEN_FLUSH_RETRIES", "5"))
+RETRY_BASE_DELAY = float(os.getenv("LISTEN_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LISTEN_RETRY_MAX_DELAY", "30"))
+
+
+class ListenIngestor:
+    """
+    Write-behind cho sự kiện nghe / tìm kiếm:
+    - Endpoint chỉ đưa sự kiện vào hàng đợi rồi trả về ngay
+    - 1 task nền gom batch và ghi bằng insert_many(ordered=False) khi đủ BATCH_SIZE
+      hoặc sau FLUSH_INTERVAL giây
+    - Hàng đợi có giới hạn: khi đầy, chờ tối đa ENQUEUE_TIMEOUT rồi bỏ sự kiện (đếm vào dropped)
+    - Mỗi sự kiện được gán _id khi nhận → ghi lại cả batch sau lỗi không tạo bản trùng (xem ListenRepository.record_many)
+    - Ghi lỗi → thử lại cả batch với backoff luỹ thừa (RETRY_BASE_DELAY .. RETRY_MAX_DELAY):
+      mất kết nối Mongo thì thử đến khi được, lỗi khác tối đa FLUSH_RETRIES lần rồi mới tính vào failed
+    - Khi shutdown: xả hết hàng đợi trước khi dừng (mỗi batch tối đa FLUSH_RETRIES lần thử)
+    """
+
+    def __init__(self, repo: Optional[ListenRepository] = None, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, queue_size: int = QUEUE_SIZE,
+                 max_retries: int = FLUSH_RETRIES):
+        self.repo = repo or ListenRepository()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.counters = {"enqueued": 0, "flushed": 0, "dropped": 0, "failed": 0, "batches": 0, "retries": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[ListenIngestor] started (batch={self.batch_size}, interval={self.flush_interval}s, queue={self.queue_size})")
+
+    async def stop(self):
+        """Dừng task nền và ghi nốt các sự kiện còn trong hàng đợi."""
+        if not self.running:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        logger.info(f"[ListenIngestor] stopped: {self.metrics()}")
+
+    async def submit(self, data: ListenSongRequest) -> bool:
+        event = data.dict()
+        event["_id"] = ObjectId()
+        if not self.running:
+            # Chưa start (script, test...) → ghi trực tiếp
+            await asyncio.to_thread(self.repo.record_many, [event])
+            self.counters["flushed"] += 1
+            return True
+        try:
+            await asyncio.wait_for(self._queue.put(event), timeout=ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.counters["dropped"] += 1
+            logger.warning("[ListenIngestor] queue full, event dropped")
+            return False
+        self.counters["enqueued"] += 1
+        return True
+
+    def metrics(self) -> Dict:
+        return {
+            **self.counters,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "running": self.running,
+        }
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+
+    async def _collect(self) -> List[Dict]:
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=min(remaining, 0.1)))
+            except asyncio.TimeoutError:
+                if self._stopping:
+                    break
+        return batch
+
+    async def _flush(self, batch: List[Dict]):
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(self.repo.record_many, batch)
+                self.counters["flushed"] += len(batch)
+                self.counters["batches"] += 1
+                return
+            except Exception as e:
+                attempt += 1
+                transient = isinstance(e, ConnectionFailure) and not self._stopping
+                if attempt >= self.max_retries and not transient:
+                    self.counters["failed"] += len(batch)
+                    logger.error(f"[ListenIngestor] flush of {len(batch)} events failed after {attempt} attempts: {e}")
+                    return
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+                self.counters["retries"] += 1
+                logger.warning(f"[ListenIngestor] flush of {len(batch)} events failed ({e}), retry {attempt} in {delay}s")
+                await asyncio.sleep(delay)
+
+
+listen_ingestor = ListenIngestor()
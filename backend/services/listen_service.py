@@ -11,6 +11,7 @@ class ListenService:
             song_id=data.song_id,
             listened_at=data.listened_at,
             type=data.type,
+            artist_id=data.artist_id,
         )
 
     def get_repeat_count(self, user_id: str, song_id: str):
@@ -41,13 +41,7 @@ class ArtistProfileService:
 
         # ✅ Lấy bài hát
         try:
-            query = {
-                "$or": [
-                    {"artistId": ObjectId(artist_id)},
-                    {"artistId": str(artist_id)}
-                ]
-            }
-            songs = self.song_repo.find_all(query=query)
+            songs = self.song_repo.find_all(query={"artistId": str(artist_id)})
         except Exception as e:
             songs = []
 
@@ -5,8 +5,8 @@ from models.song import SongInDB, SongCreate, SongUpdate
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional, Tuple
-from urllib.request import urlopen
-from urllib.error import HTTPError
+from utils.media_validator import media_validator
+from starlette.concurrency import run_in_threadpool
 
 class ArtistSongService:
     def __init__(self):
@@ -41,17 +41,6 @@ class ArtistSongService:
             print(f"Error mapping song to SongInDB: {str(e)}, song_data={song}")
             raise ValueError(f"Failed to map song data: {str(e)}")
 
-    @staticmethod
-    def _is_url_accessible(url: str) -> bool:
-        if not url:
-            return True
-        try:
-            with urlopen(url, timeout=5) as response:
-                return response.status == 200
-        except HTTPError as e:
-            print(f"URL inaccessible: {url}, error: {str(e)}")
-            return False
-
     def get_artist_songs(self, artist_id: str, search: Optional[str] = None, sort: Optional[str] = None, skip: Optional[int] = 0, limit: Optional[int] = 10) -> Tuple[List[SongInDB], int]:
         try:
             query = {"artistId": str(artist_id)}
@@ -80,7 +69,7 @@ class ArtistSongService:
             print(f"Error fetching song {song_id}: {str(e)}")
             raise ValueError(f"Failed to fetch song: {str(e)}")
 
-    def create_song(self, artist_id: str, song_data: SongCreate) -> str:
+    async def create_song(self, artist_id: str, song_data: SongCreate) -> str:
         try:
             song_dict = song_data.dict(exclude_unset=True)
 
@@ -93,40 +82,40 @@ class ArtistSongService:
             song_dict["created_at"] = datetime.utcnow()
             song_dict["updated_at"] = datetime.utcnow()
 
-            # Validate artist
-            artist_doc = artists_collection.find_one({"_id": ObjectId(artist_id)})
+            # Validate artist (pymongo đồng bộ → threadpool, không chặn event loop)
+            artist_doc = await run_in_threadpool(artists_collection.find_one, {"_id": ObjectId(artist_id)})
             if not artist_doc:
                 raise ValueError(f"Artist with ID {artist_id} does not exist")
             song_dict["artist"] = artist_doc.get("name", "")
 
             # Validate URLs
-            if song_dict.get("coverArt") and not self._is_url_accessible(song_dict["coverArt"]):
-                raise ValueError("Invalid or inaccessible cover art URL")
-            if song_dict.get("audioUrl") and not self._is_url_accessible(song_dict["audioUrl"]):
-                raise ValueError("Invalid or inaccessible audio URL")
-
-            # Validate and link album
-            if song_dict.get("albumId"):
-                album = self.album_repo.find_by_id(song_dict["albumId"])
-                if not album or str(album.get("artist_id")) != str(artist_id):
-                    raise ValueError(f"Album with ID {song_dict['albumId']} not found or not owned by artist")
-                song_dict["album"] = album.get("title", "")
-
-            song_id = self.repo.insert(song_dict)
-
-            # Update album.songs
-            if song_dict.get("albumId"):
-                self.album_repo.add_song_to_album(song_dict["albumId"], str(song_id))
+            await media_validator.ensure_song_media(audio_url=song_dict.get("audioUrl"), cover_art=song_dict.get("coverArt"))
 
+            song_id = await run_in_threadpool(self._insert_song, artist_id, song_dict)
             print(f"Created song with ID: {song_id} for artist {artist_id}")
             return str(song_id)
         except Exception as e:
             print(f"Error creating song: {str(e)}")
             raise ValueError(f"Failed to create song: {str(e)}")
 
-    def update_song(self, song_id: str, song_data: SongUpdate, artist_id: str) -> bool:
+    def _insert_song(self, artist_id: str, song_dict: dict):
+        # Validate and link album
+        if song_dict.get("albumId"):
+            album = self.album_repo.find_by_id(song_dict["albumId"])
+            if not album or str(album.get("artist_id")) != str(artist_id):
+                raise ValueError(f"Album with ID {song_dict['albumId']} not found or not owned by artist")
+            song_dict["album"] = album.get("title", "")
+
+        song_id = self.repo.insert(song_dict)
+
+        # Update album.songs
+        if song_dict.get("albumId"):
+            self.album_repo.add_song_to_album(song_dict["albumId"], str(song_id))
+        return song_id
+
+    async def update_song(self, song_id: str, song_data: SongUpdate, artist_id: str) -> bool:
         try:
-            song = self.repo.find_by_id(song_id)
+            song = await run_in_threadpool(self.repo.find_by_id, song_id)
             print(f"Found song {song_id}: {song}")
             if not song or str(song.get("artistId")) != str(artist_id):
                 print(f"Song not found or permission denied: {song_id} for artist {artist_id}")
@@ -139,41 +128,41 @@ class ArtistSongService:
             # Convert HttpUrl to str
             if "coverArt" in update_data and update_data["coverArt"]:
                 update_data["coverArt"] = str(update_data["coverArt"])
-                if not self._is_url_accessible(update_data["coverArt"]):
-                    raise ValueError("Invalid or inaccessible cover art URL")
             if "audioUrl" in update_data and update_data["audioUrl"]:
                 update_data["audioUrl"] = str(update_data["audioUrl"])
-                if not self._is_url_accessible(update_data["audioUrl"]):
-                    raise ValueError("Invalid or inaccessible audio URL")
-
-            # Handle album update
-            if "albumId" in update_data:
-                print(f"Updating album for song {song_id}, new albumId: {update_data['albumId']}")
-                if update_data["albumId"]:
-                    album = self.album_repo.find_by_id(update_data["albumId"])
-                    if not album or str(album.get("artist_id")) != str(artist_id):
-                        raise ValueError(f"Album with ID {update_data['albumId']} not found or not owned by artist")
-                    update_data["album"] = album.get("title", "")
-                else:
-                    update_data["album"] = ""
-
-                # Remove from old album
-                if song.get("albumId"):
-                    print(f"Removing song {song_id} from old album {song['albumId']}")
-                    self.album_repo.remove_song_from_album(song["albumId"], song_id)
-                # Add to new album
-                if update_data.get("albumId"):
-                    print(f"Adding song {song_id} to new album {update_data['albumId']}")
-                    self.album_repo.add_song_to_album(update_data["albumId"], song_id)
-
-            print(f"Update data after conversion: {update_data}")
-            result = self.repo.update(song_id, update_data)
+            await media_validator.ensure_song_media(audio_url=update_data.get("audioUrl"), cover_art=update_data.get("coverArt"))
+
+            result = await run_in_threadpool(self._apply_update, song, song_id, update_data, artist_id)
             print(f"Updated song {song_id}: {result}")
             return result
         except Exception as e:
             print(f"Error updating song {song_id}: {str(e)}")
             raise ValueError(f"Failed to update song: {str(e)}")
 
+    def _apply_update(self, song: dict, song_id: str, update_data: dict, artist_id: str) -> bool:
+        # Handle album update
+        if "albumId" in update_data:
+            print(f"Updating album for song {song_id}, new albumId: {update_data['albumId']}")
+            if update_data["albumId"]:
+                album = self.album_repo.find_by_id(update_data["albumId"])
+                if not album or str(album.get("artist_id")) != str(artist_id):
+                    raise ValueError(f"Album with ID {update_data['albumId']} not found or not owned by artist")
+                update_data["album"] = album.get("title", "")
+            else:
+                update_data["album"] = ""
+
+            # Remove from old album
+            if song.get("albumId"):
+                print(f"Removing song {song_id} from old album {song['albumId']}")
+                self.album_repo.remove_song_from_album(song["albumId"], song_id)
+            # Add to new album
+            if update_data.get("albumId"):
+                print(f"Adding song {song_id} to new album {update_data['albumId']}")
+                self.album_repo.add_song_to_album(update_data["albumId"], song_id)
+
+        print(f"Update data after conversion: {update_data}")
+        return self.repo.update(song_id, update_data)
+
     def delete_song(self, song_id: str, artist_id: str) -> bool:
         try:
             song = self.repo.find_by_id(song_id)
@@ -0,0 +1,245 @@
+# services/media_upload.py
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+from database.db import media_uploads_collection
+from utils.media_validator import media_validator
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "cloudinary")  # cloudinary | local
+LOCAL_MEDIA_ROOT = os.getenv("MEDIA_LOCAL_ROOT", "media")
+LOCAL_MEDIA_BASE_URL = os.getenv("MEDIA_LOCAL_BASE_URL", "http://localhost:8000/media")
+CHUNK_SIZE = int(os.getenv("MEDIA_UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))  # Cloudinary: chunk >= 5MB
+UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", "4"))
+PROGRESS_TTL = 3600
+UPLOAD_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+FOLDERS = {"image": "images", "audio": "audios"}
+RESOURCE_TYPES = {"image": "image", "audio": "raw"}  # audio lưu dạng raw như trước
+
+
+class _ProgressReader:
+    """Bọc file cho storage backend: mỗi chunk đọc ra được cộng vào tiến độ; close() không đóng file gốc."""
+
+    def __init__(self, file: BinaryIO, on_read: Callable[[int], None]):
+        self._file = file
+        self._on_read = on_read
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self._on_read(len(data))
+        return data
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, attr):
+        return getattr(self._file, attr)
+
+
+# ----------------------------
+# Storage backends
+# ----------------------------
+class LocalStorage:
+    """Ghi file theo chunk vào thư mục local (dev / test), phục vụ qua /media."""
+    name = "local"
+
+    def __init__(self, root: str = LOCAL_MEDIA_ROOT, base_url: str = LOCAL_MEDIA_BASE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, file: BinaryIO, key: str, kind: str, filename: Optional[str] = None) -> str:
+        extension = os.path.splitext(filename or "")[1].lower()
+        relative = f"{FOLDERS[kind]}/{key}{extension}"
+        path = os.path.join(self.root, *relative.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.part"
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                out.write(chunk)
+        os.replace(tmp, path)
+        return f"{self.base_url}/{relative}"
+
+
+class CloudinaryStorage:
+    """Upload theo chunk bằng cloudinary.uploader.upload_large (không đọc cả file vào bộ nhớ)."""
+    name = "cloudinary"
+
+    def __init__(self):
+        self._configured = False
+
+    def _configure(self):
+        if not self._configured:
+            import cloudinary
+            cloudinary.config(
+                cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+                api_key=os.getenv("CLOUDINARY_API_KEY"),
+                api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+                secure=True
+            )
+            self._configured = True
+
+    def put(self, file: BinaryIO, key: str, kind: str, filename: Optional[str] = None) -> str:
+        import cloudinary.uploader
+        self._configure()
+        public_id = key
+        if kind == "audio":
+            public_id += os.path.splitext(filename or "")[1].lower()  # raw giữ đuôi file trong URL
+        result = cloudinary.uploader.upload_large(
+            file,
+            resource_type=RESOURCE_TYPES[kind],
+            folder=FOLDERS[kind],
+            public_id=public_id,
+            overwrite=False,
+            filename=filename or key,
+            chunk_size=CHUNK_SIZE
+        )
+        return result["secure_url"]
+
+
+def storage_from_env():
+    return LocalStorage() if MEDIA_STORAGE == "local" else CloudinaryStorage()
+
+
+# ----------------------------
+# Pipeline
+# ----------------------------
+class MediaUploadPipeline:
+    """
+    Upload media (cover / audio) cho bài hát:
+    - Mỗi file đi qua 2 lượt đọc theo chunk: tính sha256 + kích thước, rồi stream sang storage backend
+    - Nội dung đã upload (cùng sha256, cùng backend) → trả lại URL cũ, không upload lại (media_uploads)
+    - Các file của 1 request chạy song song trên worker pool riêng (UPLOAD_WORKERS), không chặn event loop
+    - Tiến độ từng file theo (owner, upload_id): progress(owner, upload_id) — user chỉ đọc / ghi được upload của mình
+    """
+
+    def __init__(self, storage=None, workers: int = UPLOAD_WORKERS):
+        self._storage = storage
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._progress = TTLCache(maxsize=1000, ttl=PROGRESS_TTL)
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            self._storage = storage_from_env()
+        return self._storage
+
+    def progress(self, owner: str, upload_id: str) -> Optional[Dict]:
+        return self._progress.get((owner, upload_id))
+
+    async def upload(self, files: Dict[str, Tuple[BinaryIO, Optional[str], str]], owner: str,
+                     upload_id: Optional[str] = None) -> Tuple[str, Dict[str, Dict]]:
+        """
+        files: {field: (file, filename, kind)} với kind là "image" | "audio".
+        upload_id do client đặt trước (để theo dõi tiến độ trong lúc upload) chỉ có nghĩa trong phạm vi owner.
+        Trả về (upload_id, {field: {url, sha256, size, deduplicated}}).
+        """
+        if upload_id is not None and not UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError("upload_id must be 1-64 characters of A-Z, a-z, 0-9, '_' or '-'")
+        upload_id = upload_id or uuid.uuid4().hex
+        progress = {field: {"status": "pending", "bytes": 0, "total": None} for field in files}
+        self._progress.set((owner, upload_id), progress)
+
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        fields = list(files)
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, self.upload_file, *files[field], progress[field]) for field in fields),
+            return_exceptions=True
+        )
+        for field, result in zip(fields, results):
+            if isinstance(result, Exception):
+                progress[field]["status"] = "failed"
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return upload_id, dict(zip(fields, results))
+
+    async def upload_song_media(self, owner: str, cover_art=None, audio=None,
+                                upload_id: Optional[str] = None) -> Dict:
+        """
+        Handler dùng chung cho /admin/songs/upload và /artist/songs/upload (cover_art / audio là UploadFile).
+        Trả về {coverArt?, audioUrl?, upload_id, deduplicated: [field đã có sẵn]}.
+        """
+        files = {}
+        if cover_art:
+            files["coverArt"] = (cover_art.file, cover_art.filename, "image")
+        if audio:
+            files["audioUrl"] = (audio.file, audio.filename, "audio")
+        upload_id, uploaded = await self.upload(files, owner, upload_id)
+        result = {field: info["url"] for field, info in uploaded.items()}
+        result["upload_id"] = upload_id
+        result["deduplicated"] = [field for field, info in uploaded.items() if info["deduplicated"]]
+        return result
+
+    def upload_file(self, file: BinaryIO, filename: Optional[str], kind: str,
+                    progress: Optional[Dict] = None) -> Dict:
+        """Upload 1 file (đồng bộ — chạy trong worker thread hoặc script)."""
+        progress = progress if progress is not None else {}
+        progress.update(status="hashing", bytes=0)
+        digest, size = self._hash(file)
+        progress["total"] = size
+
+        record_id = f"{self.storage.name}:{digest}"
+        existing = media_uploads_collection.find_one({"_id": record_id}, {"url": 1})
+        if existing:
+            progress.update(status="done", bytes=size)
+            media_validator.mark_verified(existing["url"])
+            return {"url": existing["url"], "sha256": digest, "size": size, "deduplicated": True}
+
+        progress["status"] = "uploading"
+
+        def on_read(n: int):
+            progress["bytes"] += n
+
+        file.seek(0)
+        url = self.storage.put(_ProgressReader(file, on_read), digest, kind, filename)
+        media_uploads_collection.update_one(
+            {"_id": record_id},
+            {"$setOnInsert": {"url": url, "kind": kind, "size": size, "filename": filename,
+                              "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        media_validator.mark_verified(url)
+        progress.update(status="done", bytes=size)
+        return {"url": url, "sha256": digest, "size": size, "deduplicated": False}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="media-upload")
+        return self._executor
+
+    @staticmethod
+    def _hash(file: BinaryIO) -> Tuple[str, int]:
+        file.seek(0)
+        sha, size = hashlib.sha256(), 0
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+            size += len(chunk)
+        return sha.hexdigest(), size
+
+
+media_upload = MediaUploadPipeline()
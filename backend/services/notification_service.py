@@ -24,7 +24,7 @@ class NotificationService:
 
     @staticmethod
     async def mark_read(notif_id):
-        result = NotificationRepository.collection.update_one(
+        result = await NotificationRepository.collection.update_one(
             {"_id": ObjectId(notif_id)},
             {"$set": {"read": True}}
         )
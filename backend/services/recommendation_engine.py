@@ -0,0 +1,293 @@
+# services/recommendation_engine.py
+import asyncio
+import logging
+import math
+import os
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from database.db import (
+    history_collection, song_history_collection, listen_song_collection, songs_collection,
+    follows_collection, artists_collection
+)
+from database.repositories.listen_stats_repository import ListenStatsRepository
+from database.repositories.recommendation_repository import RecommendationRepository
+
+logger = logging.getLogger(__name__)
+
+TOP_K = int(os.getenv("RECOMMEND_TOP_K", "100"))
+REFRESH_INTERVAL = float(os.getenv("RECOMMEND_REFRESH_INTERVAL", "300"))
+# false = app không tự refresh, chỉ chạy qua seeds_data/update/build_recommendations.py (cron)
+REFRESH_IN_APP = os.getenv("RECOMMEND_REFRESH_IN_APP", "true").lower() == "true"
+# Mỗi lần refresh chỉ 1 worker chạy (lease trong recommendation_jobs), worker khác chờ lượt sau
+LEASE_TTL = float(os.getenv("RECOMMEND_LEASE_TTL", str(REFRESH_INTERVAL * 2)))
+# Lùi mốc incremental: bản ghi được đóng mốc ngay trước khi ghi nhưng chỉ thấy được sau lần quét → quét chồng 1 đoạn
+WATERMARK_OVERLAP = float(os.getenv("RECOMMEND_WATERMARK_OVERLAP", "60"))
+HALF_LIFE_DAYS = float(os.getenv("RECOMMEND_HALF_LIFE_DAYS", "30"))
+USER_CHUNK = 200
+AFFINITY_SIZE = {"genres": 10, "artists": 10, "tags": 20}
+EVENT_WEIGHT = {"listen": 1.0, "history": 1.0, "search": 0.5}
+FOLLOW_WEIGHT = 2.0
+JOB_NAME = "user_candidates"
+
+SONG_FEATURES = {"genre": 1, "artist": 1, "artistId": 1, "tags": 1}
+
+
+def _oid(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if ObjectId.is_valid(str(value)) else None
+
+
+def _top_weights(counter: Counter, size: int) -> Dict[str, float]:
+    """Giữ `size` phần tử lớn nhất, chuẩn hoá tổng = 1."""
+    top = counter.most_common(size)
+    total = sum(weight for _, weight in top) or 1.0
+    return {key: round(weight / total, 4) for key, weight in top}
+
+
+class RecommendationEngine:
+    """
+    Sinh gợi ý offline:
+    - Gom sự kiện (history, song_history, listen_song, follows) thành vector affinity genre / artist / tag cho từng user
+      (có giảm dần theo thời gian, nửa chu kỳ HALF_LIFE_DAYS)
+    - Sinh top-K ứng viên theo affinity + độ phổ biến (listen_song_stats) và lưu vào recommendations
+    - refresh_incremental() chỉ tính lại user có sự kiện mới kể từ lần chạy trước
+    - User chưa có sự kiện vẫn được lưu doc rỗng để request sau không phải tính lại
+    Request path chỉ đọc ứng viên đã tính sẵn (xem recommendation_service).
+    Trong app, refresh định kỳ chỉ chạy ở worker đang giữ lease (nhiều worker uvicorn không tính trùng).
+    """
+
+    def __init__(self, repo: Optional[RecommendationRepository] = None):
+        self.repo = repo or RecommendationRepository()
+        self.stats = ListenStatsRepository()
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    # ----------------------------
+    # Batch job
+    # ----------------------------
+    def build_for_user(self, user_id: str) -> Optional[Dict]:
+        docs = self.build_for_users([user_id])
+        return docs[0] if docs else None
+
+    def build_for_users(self, user_ids: Iterable[str]) -> List[Dict]:
+        user_ids = list({str(uid) for uid in user_ids if _oid(uid)})
+        if not user_ids:
+            return []
+        events = self._collect_events(user_ids)
+        followed = self._followed_artists(user_ids)
+        songs = self._song_features({sid for weights in events.values() for sid in weights})
+
+        docs = []
+        for user_id in user_ids:
+            weights = events.get(user_id, Counter())
+            affinity = self._affinity(weights, songs, followed.get(user_id, []))
+            candidates = self._candidates(affinity, heard=set(weights))
+            docs.append({"_id": user_id, "affinity": affinity, "candidates": candidates})
+        self.repo.save_many(docs)
+        return docs
+
+    def refresh_incremental(self) -> int:
+        """Tính lại các user có sự kiện mới từ lần chạy trước. Trả về số user đã cập nhật."""
+        since = self.repo.get_last_run(JOB_NAME)
+        started_at = datetime.utcnow()
+        user_ids = self._active_users(since)
+        for i in range(0, len(user_ids), USER_CHUNK):
+            self.build_for_users(user_ids[i:i + USER_CHUNK])
+        self.repo.set_last_run(JOB_NAME, started_at)
+        logger.info(f"[RecommendationEngine] refreshed {len(user_ids)} users (since={since})")
+        return len(user_ids)
+
+    def refresh_all(self) -> int:
+        self.repo.reset_last_run(JOB_NAME)
+        return self.refresh_incremental()
+
+    def refresh_if_leader(self) -> Optional[int]:
+        """refresh_incremental() nếu process này giữ được lease; None nếu worker khác đang chạy."""
+        if not self.repo.acquire_lease(JOB_NAME, self.owner, LEASE_TTL):
+            return None
+        return self.refresh_incremental()
+
+    # ----------------------------
+    # Chạy định kỳ trong app
+    # ----------------------------
+    async def start(self):
+        if not REFRESH_IN_APP or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await asyncio.to_thread(self.repo.release_lease, JOB_NAME, self.owner)
+            except Exception as e:
+                logger.error(f"[RecommendationEngine] release lease failed: {e}")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh_if_leader)
+            except Exception as e:
+                logger.error(f"[RecommendationEngine] refresh failed: {e}")
+            await asyncio.sleep(REFRESH_INTERVAL)
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    @staticmethod
+    def _active_users(since: Optional[datetime]) -> List[str]:
+        """
+        User có sự kiện ghi sau since (trừ WATERMARK_OVERLAP). listen_song chọn theo ingested_at (mốc server lúc ghi),
+        không theo listened_at: client gửi listened_at và ListenIngestor có thể ghi muộn (flush / retry), sự kiện
+        mang listened_at cũ hơn mốc sẽ bị bỏ sót. Document cũ chưa có ingested_at vẫn chọn theo listened_at.
+        """
+        if since:
+            since = since - timedelta(seconds=WATERMARK_OVERLAP)
+        users = set()
+        for collection, time_field in ((follows_collection, "followed_at"),
+                                       (history_collection, "timestamp"),
+                                       (song_history_collection, "timestamp")):
+            query = {time_field: {"$gt": since}} if since else {}
+            users.update(str(uid) for uid in collection.distinct("user_id", query) if uid)
+        query = {"$or": [
+            {"ingested_at": {"$gt": since}},
+            {"ingested_at": {"$exists": False}, "listened_at": {"$gt": since}},
+        ]} if since else {}
+        users.update(str(uid) for uid in listen_song_collection.distinct("user_id", query) if uid)
+        return sorted(uid for uid in users if _oid(uid))
+
+    @staticmethod
+    def _decay(ts, now: datetime) -> float:
+        if not isinstance(ts, datetime):
+            return 1.0
+        age_days = max(0.0, (now - ts).total_seconds() / 86400)
+        return 0.5 ** (age_days / HALF_LIFE_DAYS)
+
+    def _collect_events(self, user_ids: List[str]) -> Dict[str, Counter]:
+        """
+        {user_id: Counter(song_id -> trọng số)} cho cả nhóm user, mỗi collection 1 truy vấn
+        (history / song_history lưu user_id dạng ObjectId, listen_song dạng chuỗi — xem database/id_migration.py).
+        """
+        now = datetime.utcnow()
+        object_ids = [_oid(uid) for uid in user_ids]
+        events: Dict[str, Counter] = defaultdict(Counter)
+
+        for collection in (history_collection, song_history_collection):
+            for entry in collection.find(
+                {"user_id": {"$in": object_ids}},
+                {"user_id": 1, "song_id": 1, "timestamp": 1}
+            ):
+                if entry.get("song_id"):
+                    events[str(entry["user_id"])][str(entry["song_id"])] += \
+                        EVENT_WEIGHT["history"] * self._decay(entry.get("timestamp"), now)
+
+        for entry in listen_song_collection.find(
+            {"user_id": {"$in": user_ids}, "song_id": {"$exists": True}},
+            {"user_id": 1, "song_id": 1, "listened_at": 1, "type": 1}
+        ):
+            weight = EVENT_WEIGHT.get(entry.get("type") or "listen", 0.0)
+            if weight and entry.get("song_id"):
+                events[str(entry["user_id"])][str(entry["song_id"])] += \
+                    weight * self._decay(entry.get("listened_at"), now)
+        return events
+
+    @staticmethod
+    def _followed_artists(user_ids: List[str]) -> Dict[str, List[str]]:
+        """{user_id: [tên nghệ sĩ đang follow]} — 1 truy vấn follows + 1 truy vấn $in artists."""
+        follows = list(follows_collection.find(
+            {"user_id": {"$in": [_oid(uid) for uid in user_ids]}},
+            {"user_id": 1, "artist_id": 1}
+        ))
+        artist_ids = {oid for oid in (_oid(f.get("artist_id")) for f in follows) if oid}
+        if not artist_ids:
+            return {}
+        names = {
+            str(artist["_id"]): artist.get("name")
+            for artist in artists_collection.find({"_id": {"$in": list(artist_ids)}}, {"name": 1})
+        }
+        followed = defaultdict(list)
+        for follow in follows:
+            name = names.get(str(follow.get("artist_id")))
+            if name:
+                followed[str(follow["user_id"])].append(name)
+        return followed
+
+    @staticmethod
+    def _song_features(song_ids: Iterable[str]) -> Dict[str, Dict]:
+        object_ids = [oid for oid in (_oid(sid) for sid in song_ids) if oid]
+        if not object_ids:
+            return {}
+        return {
+            str(song["_id"]): song
+            for song in songs_collection.find({"_id": {"$in": object_ids}}, SONG_FEATURES)
+        }
+
+    @staticmethod
+    def _affinity(weights: Counter, songs: Dict[str, Dict], followed: List[str]) -> Dict[str, Dict[str, float]]:
+        genres, artists, tags = Counter(), Counter(), Counter()
+        for name in followed:
+            artists[name] += FOLLOW_WEIGHT
+        for song_id, weight in weights.items():
+            song = songs.get(song_id)
+            if not song:
+                continue
+            for genre in song.get("genre") or []:
+                genres[genre] += weight
+            if song.get("artist"):
+                artists[song["artist"]] += weight
+            for tag in song.get("tags") or []:
+                tags[tag] += weight
+        return {
+            "genres": _top_weights(genres, AFFINITY_SIZE["genres"]),
+            "artists": _top_weights(artists, AFFINITY_SIZE["artists"]),
+            "tags": _top_weights(tags, AFFINITY_SIZE["tags"]),
+        }
+
+    def _candidates(self, affinity: Dict[str, Dict[str, float]], heard: set) -> List[Dict]:
+        clauses = []
+        if affinity["genres"]:
+            clauses.append({"genre": {"$in": list(affinity["genres"])}})
+        if affinity["artists"]:
+            clauses.append({"artist": {"$in": list(affinity["artists"])}})
+        if affinity["tags"]:
+            clauses.append({"tags": {"$in": list(affinity["tags"])}})
+        if not clauses:
+            return []
+
+        heard_ids = [oid for oid in (_oid(sid) for sid in heard) if oid]
+        pool = list(songs_collection.find(
+            {"$or": clauses, "_id": {"$nin": heard_ids}}, SONG_FEATURES
+        ).limit(TOP_K * 5))
+        if not pool:
+            return []
+
+        popularity = {
+            doc["_id"]: doc.get("total_count", 0)
+            for doc in self.stats.songs.find(
+                {"_id": {"$in": [str(song["_id"]) for song in pool]}}, {"total_count": 1}
+            )
+        }
+        max_pop = math.log1p(max(popularity.values(), default=0)) or 1.0
+
+        scored = []
+        for song in pool:
+            song_id = str(song["_id"])
+            score = sum(affinity["genres"].get(g, 0) for g in song.get("genre") or [])
+            score += affinity["artists"].get(song.get("artist"), 0)
+            score += 0.5 * sum(affinity["tags"].get(t, 0) for t in song.get("tags") or [])
+            score += 0.1 * math.log1p(popularity.get(song_id, 0)) / max_pop
+            scored.append({"song_id": song_id, "score": round(score, 4)})
+        scored.sort(key=lambda c: c["score"], reverse=True)
+        return scored[:TOP_K]
+
+
+recommendation_engine = RecommendationEngine()
@@ -0,0 +1,251 @@
+# services/search_index.py
+import logging
+import threading
+import unicodedata
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Iterable
+from bson import ObjectId
+from services.catalog_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+GRAM_SIZE = 3
+MAX_PREFIX = GRAM_SIZE - 1
+
+SONG_PROJECTION = {
+    "_id": 1, "title": 1, "normalizedTitle": 1, "artist": 1, "artistId": 1,
+    "coverArt": 1, "cover_art": 1, "cover_image": 1, "cover_url": 1,
+    "duration": 1
+}
+ARTIST_PROJECTION = {"_id": 1, "name": 1, "normalizedName": 1, "image": 1, "avatar_url": 1}
+ALBUM_PROJECTION = {
+    "_id": 1, "title": 1, "normalizedTitle": 1, "artist_id": 1,
+    "coverArt": 1, "cover_art": 1, "cover_url": 1, "cover_image": 1,
+    "artist": 1, "release_year": 1
+}
+
+
+def fold_text(text) -> str:
+    """Bỏ dấu tiếng Việt, chữ thường, gộp khoảng trắng (dùng chung cho index và query)."""
+    if not isinstance(text, str):
+        return ""
+    text = text.lower().replace("đ", "d")
+    text = ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _grams(text: str) -> set:
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _cover(doc: dict):
+    return doc.get("coverArt") or doc.get("cover_art") or doc.get("cover_image") or doc.get("cover_url")
+
+
+def _stringify(doc: dict, projection: dict) -> dict:
+    out = {}
+    for key in projection:
+        if key in doc:
+            value = doc[key]
+            out[key] = str(value) if isinstance(value, ObjectId) else value
+    return out
+
+
+class SearchIndex:
+    """
+    Inverted index trong bộ nhớ cho thanh tìm kiếm (songs / artists / albums).
+    - Trigram cho truy vấn >= 3 ký tự, prefix của từng từ cho truy vấn 1-2 ký tự
+    - Mọi chuỗi đều được bỏ dấu trước khi index
+    - Dữ liệu lấy từ catalog_cache; mọi thay đổi của catalog được đẩy sang qua on_catalog_change
+    """
+    KINDS = ("songs", "artists", "albums")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict[str, dict]] = {kind: {} for kind in self.KINDS}
+        self._grams: Dict[str, Dict[str, set]] = {kind: defaultdict(set) for kind in self.KINDS}
+        self._prefixes: Dict[str, Dict[str, set]] = {kind: defaultdict(set) for kind in self.KINDS}
+        self._built: set = set()
+        self.ready = False
+
+    # ----------------------------
+    # Build
+    # ----------------------------
+    def build(self):
+        """Index toàn bộ catalog từ catalog_cache. Gọi 1 lần lúc startup."""
+        # Lần nạp đầu của catalog_cache đã báo on_catalog_change(kind, None) → kind đó đã được dựng, không dựng lại
+        catalog_cache.ensure_loaded()
+        for kind in self.KINDS:
+            if kind not in self._built:
+                self._rebuild_kind(kind)
+        self.ready = True
+        logger.info(
+            f"[SearchIndex] built: {len(self._records['songs'])} songs, "
+            f"{len(self._records['artists'])} artists, {len(self._records['albums'])} albums"
+        )
+
+    def _rebuild_kind(self, kind: str):
+        records = catalog_cache.all(kind)
+        with self._lock:
+            self._records[kind].clear()
+            self._grams[kind].clear()
+            self._prefixes[kind].clear()
+            for record in records:
+                self._add(kind, record)
+            self._built.add(kind)
+
+    # ----------------------------
+    # Incremental updates (nhận từ catalog_cache)
+    # ----------------------------
+    def on_catalog_change(self, kind: str, record_id: Optional[str], record: Optional[dict]):
+        if record_id is None:
+            self._rebuild_kind(kind)
+        elif record is None:
+            self.remove(kind, record_id)
+        else:
+            self.upsert(kind, record)
+
+    def upsert(self, kind: str, doc: dict):
+        if not doc or "_id" not in doc:
+            return
+        try:
+            with self._lock:
+                self._remove(kind, str(doc["_id"]))
+                self._add(kind, doc)
+        except Exception as e:
+            logger.error(f"[SearchIndex] upsert {kind} failed: {e}")
+
+    def remove(self, kind: str, doc_id):
+        with self._lock:
+            self._remove(kind, str(doc_id))
+
+    # ----------------------------
+    # Query
+    # ----------------------------
+    def search(self, kind: str, query: str, limit: Optional[int] = 50) -> List[dict]:
+        folded = fold_text(query)
+        if not folded:
+            return []
+        with self._lock:
+            ids = self._candidates(kind, folded)
+            records = self._records[kind]
+            scored = []
+            for rid in ids:
+                record = records.get(rid)
+                if not record:
+                    continue
+                score = self._score(folded, record["fields"])
+                if score:
+                    scored.append((-score, len(record["fields"][0]) if record["fields"] else 0, rid, record["payload"]))
+        scored.sort(key=lambda item: item[:3])
+        hits = [dict(payload) for _, _, _, payload in scored]
+        return hits[:limit] if limit else hits
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    @staticmethod
+    def _extract(kind: str, doc: dict):
+        if kind == "songs":
+            fields = [doc.get("title"), doc.get("normalizedTitle"), doc.get("artist")]
+            payload = _stringify(doc, SONG_PROJECTION)
+            payload.pop("normalizedTitle", None)
+            payload.pop("artistId", None)
+            payload["cover_art"] = _cover(doc)
+            owner = doc.get("artistId")
+        elif kind == "artists":
+            fields = [doc.get("name"), doc.get("normalizedName")]
+            payload = _stringify(doc, ARTIST_PROJECTION)
+            payload.pop("normalizedName", None)
+            payload["image"] = doc.get("image") or doc.get("avatar_url")
+            owner = None
+        else:
+            artist = doc.get("artist")
+            artist_name = artist.get("name") if isinstance(artist, dict) else None
+            fields = [doc.get("title"), doc.get("normalizedTitle"), artist_name]
+            payload = _stringify(doc, ALBUM_PROJECTION)
+            payload.pop("normalizedTitle", None)
+            payload.pop("artist_id", None)
+            payload["cover_art"] = _cover(doc)
+            owner = doc.get("artist_id")
+        folded = []
+        for field in fields:
+            value = fold_text(field)
+            if value and value not in folded:
+                folded.append(value)
+        return folded, payload, str(owner) if owner else None
+
+    def _add(self, kind: str, doc: dict):
+        rid = str(doc["_id"])
+        fields, payload, owner = self._extract(kind, doc)
+        self._records[kind][rid] = {"fields": fields, "payload": payload, "owner": owner}
+        for gram in self._keys(fields):
+            self._grams[kind][gram].add(rid)
+        for prefix in self._prefix_keys(fields):
+            self._prefixes[kind][prefix].add(rid)
+
+    def _remove(self, kind: str, rid: str):
+        record = self._records[kind].pop(rid, None)
+        if not record:
+            return
+        for index, keys in ((self._grams[kind], self._keys(record["fields"])),
+                            (self._prefixes[kind], self._prefix_keys(record["fields"]))):
+            for key in keys:
+                bucket = index.get(key)
+                if bucket is not None:
+                    bucket.discard(rid)
+                    if not bucket:
+                        del index[key]
+
+    @staticmethod
+    def _keys(fields: Iterable[str]) -> set:
+        keys = set()
+        for field in fields:
+            keys |= _grams(field)
+        return keys
+
+    @staticmethod
+    def _prefix_keys(fields: Iterable[str]) -> set:
+        keys = set()
+        for field in fields:
+            for token in field.split(" "):
+                for size in range(1, MAX_PREFIX + 1):
+                    if len(token) >= size:
+                        keys.add(token[:size])
+        return keys
+
+    def _candidates(self, kind: str, folded: str) -> Iterable[str]:
+        if len(folded) < GRAM_SIZE:
+            return set(self._prefixes[kind].get(folded, ()))
+        postings = []
+        for gram in _grams(folded):
+            bucket = self._grams[kind].get(gram)
+            if not bucket:
+                return set()
+            postings.append(bucket)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for bucket in postings[1:]:
+            result &= bucket
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _score(folded: str, fields: List[str]) -> int:
+        best = 0
+        for field in fields:
+            if field == folded:
+                return 100
+            if field.startswith(folded):
+                best = max(best, 80)
+            elif f" {folded}" in f" {field}":
+                best = max(best, 60)
+            elif len(folded) >= GRAM_SIZE and folded in field:
+                best = max(best, 40)
+        return best
+
+
+search_index = SearchIndex()
+catalog_cache.subscribe(search_index.on_catalog_change)
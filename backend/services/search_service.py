@@ -4,6 +4,9 @@ from database.db import songs_collection, artists_collection, albums_collection
 import unicodedata
 import traceback
 from bson import ObjectId
+from services.search_index import search_index
+from services.catalog_cache import catalog_cache
+from services.trending import trending
 
 
 class SearchService:
@@ -30,6 +33,25 @@ class SearchService:
 
     @staticmethod
     def search_all(query: str, search_type: str = "all") -> Dict[str, List[dict]]:
+        # ⚡ Dùng index trong bộ nhớ nếu đã build xong, còn lại fallback về regex Mongo
+        if search_index.ready:
+            try:
+                return SearchService._search_index(query, search_type)
+            except Exception as e:
+                print("[❌ SEARCH INDEX ERROR]", e)
+                traceback.print_exc()
+        return SearchService._search_mongo(query, search_type)
+
+    @staticmethod
+    def _search_index(query: str, search_type: str = "all") -> Dict[str, List[dict]]:
+        results = {"songs": [], "artists": [], "albums": []}
+        for kind, key in (("songs", "song"), ("artists", "artist"), ("albums", "album")):
+            if search_type in ("all", key):
+                results[kind] = search_index.search(kind, query)
+        return results
+
+    @staticmethod
+    def _search_mongo(query: str, search_type: str = "all") -> Dict[str, List[dict]]:
         raw_query = query.strip().lower()
         normalized_query = SearchService.strip_vietnamese_accents(raw_query)
 
@@ -121,9 +143,10 @@ class SearchService:
     @staticmethod
     def get_trending(limit: int = 5) -> Dict[str, List[dict]]:
         try:
-            songs = list(songs_collection.find().sort("play_count", -1).limit(limit))
-            artists = list(artists_collection.find().limit(3))
-            albums = list(albums_collection.find().limit(3))
+            # ⚡ Top-K đã xếp sẵn theo điểm giảm dần (nghe / tìm kiếm / like / follow), chi tiết lấy từ catalog_cache
+            songs = SearchService._trending_records("songs", limit)
+            artists = SearchService._trending_records("artists", 3)
+            albums = SearchService._trending_records("albums", 3)
 
             return {
                 "songs": [
@@ -157,3 +180,21 @@ class SearchService:
                 "artists": [],
                 "albums": []
             }
+
+    @staticmethod
+    def _trending_records(kind: str, limit: int) -> List[dict]:
+        records = []
+        for record_id, _ in trending.top(kind, limit * 2):  # dư ra phòng bản ghi đã bị xoá
+            record = catalog_cache.get(kind, record_id)
+            if record:
+                records.append(record)
+                if len(records) >= limit:
+                    return records
+        # Chưa đủ dữ liệu hoạt động (mới deploy) → bù bằng bản ghi bất kỳ trong catalog
+        seen = {r["_id"] for r in records}
+        for record in catalog_cache.all(kind):
+            if len(records) >= limit:
+                break
+            if record["_id"] not in seen:
+                records.append(record)
+        return records
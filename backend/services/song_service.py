@@ -5,14 +5,13 @@ from typing import List, Optional, Dict
 from models.song import SongCreate, SongUpdate, SongInDB
 from database.repositories.song_repository import SongRepository
 from database.repositories.artist_repository import ArtistRepository
-from urllib.request import urlopen
-from urllib.error import HTTPError, URLError
+from utils.media_validator import media_validator
 from random import shuffle
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
 from database.db import albums_collection
 from database.repositories.album_repository import AlbumRepository
-from utils.text_utils import normalize_text
-import difflib
+from services.fuzzy_index import catalog_fuzzy
 
 class SongService:
     def __init__(self, song_repository: SongRepository, artist_repository: ArtistRepository):
@@ -24,33 +23,19 @@ class SongService:
     # Fuzzy Search
     # ----------------------------
     def find_song_by_fuzzy_title(self, query: str):
-        songs = self.song_repository.get_all_songs_simple()
-        query_norm = normalize_text(query)
-        titles = [normalize_text(song["title"]) for song in songs]
-        matches = difflib.get_close_matches(query_norm, titles, n=1, cutoff=0.6)
-        if matches:
-            matched_title = matches[0]
-            for song in songs:
-                if normalize_text(song["title"]) == matched_title:
-                    return song
-        return None
+        # Tìm trên trigram index của catalog thay vì so khớp với toàn bộ bài hát
+        return catalog_fuzzy.best("songs", query, cutoff=0.6)
 
     # ----------------------------
     # Utility Methods
     # ----------------------------
-    def _map_to_song_in_db(self, song: dict) -> SongInDB:
-        # Lấy tên nghệ sĩ từ artistId
-        artist_name = ""
+    def _map_to_song_in_db(self, song: dict, artist_names: Optional[Dict[str, str]] = None) -> SongInDB:
+        # Lấy tên nghệ sĩ từ artistId (ưu tiên map đã hydrate sẵn cho cả trang)
         artist_id = song.get("artistId")
-        if artist_id:
-            try:
-                obj_id = ObjectId(artist_id)
-                artist = self.artist_repository.find_by_id(obj_id)
-                if artist:
-                    artist_name = artist.get("name", "")
-            except Exception:
-                artist_name = ""
-        
+        if artist_names is None:
+            artist_names = self.artist_repository.find_names_by_ids([artist_id])
+        artist_name = artist_names.get(str(artist_id), "") if artist_id else ""
+
         return SongInDB(
             id=str(song.get("_id", "")),
             title=song.get("title", ""),
@@ -67,13 +52,10 @@ class SongService:
             updated_at=song.get("updated_at", None)
         )
 
-    @staticmethod
-    def _is_url_accessible(url: str) -> bool:
-        try:
-            with urlopen(url, timeout=5) as response:
-                return response.status == 200
-        except (HTTPError, URLError):
-            return False
+    def _map_many(self, songs: List[dict]) -> List[SongInDB]:
+        """Map cả trang kết quả: 1 truy vấn $in cho toàn bộ artistId thay vì 1 truy vấn / bài."""
+        artist_names = self.artist_repository.find_names_by_ids(song.get("artistId") for song in songs)
+        return [self._map_to_song_in_db(song, artist_names) for song in songs]
 
     # ----------------------------
     # CRUD / Queries
@@ -86,7 +68,7 @@ class SongService:
         query: Optional[Dict] = None
     ) -> List[SongInDB]:
         songs = self.song_repository.find_all(sort, limit, skip, query)
-        return [self._map_to_song_in_db(song) for song in songs]
+        return self._map_many(songs)
 
     def get_song_by_id(self, song_id: str) -> Optional[SongInDB]:
         song = self.song_repository.find_by_id(song_id)
@@ -94,37 +76,38 @@ class SongService:
             return None
         return self._map_to_song_in_db(song)
 
-    def create_song(self, song_data: SongCreate) -> str:
+    def get_songs_by_ids(self, song_ids: List[str]) -> List[SongInDB]:
+        """Lấy nhiều bài theo id (giữ thứ tự đầu vào, bỏ qua id không tồn tại)."""
+        valid_ids = [sid for sid in song_ids if ObjectId.is_valid(str(sid))]
+        if not valid_ids:
+            return []
+        by_id = {str(song["_id"]): song for song in self.song_repository.find_by_ids(valid_ids)}
+        return self._map_many([by_id[str(sid)] for sid in valid_ids if str(sid) in by_id])
+
+    async def create_song(self, song_data: SongCreate) -> str:
+        # Truy vấn Mongo (pymongo, đồng bộ) chạy trong threadpool để không chặn event loop
         # Kiểm tra artistId tồn tại
-        if not self.artist_repository.find_by_id(ObjectId(song_data.artistId)):
+        if not await run_in_threadpool(self.artist_repository.find_by_id, ObjectId(song_data.artistId)):
             raise ValueError(f"Artist with ID {song_data.artistId} does not exist")
 
         # Kiểm tra URL media
-        if song_data.audioUrl and not self._is_url_accessible(song_data.audioUrl):
-            raise ValueError("Invalid or inaccessible audio URL")
-        if song_data.coverArt and not self._is_url_accessible(song_data.coverArt):
-            raise ValueError("Invalid or inaccessible cover art URL")
+        await media_validator.ensure_song_media(audio_url=song_data.audioUrl, cover_art=song_data.coverArt)
 
         new_song = song_data.dict(exclude_unset=True)
         new_song["artistId"] = str(new_song["artistId"])  # Đảm bảo artistId là chuỗi
         new_song["created_at"] = datetime.utcnow()
         new_song["updated_at"] = None
-        return str(self.song_repository.insert(new_song))
+        return str(await run_in_threadpool(self.song_repository.insert, new_song))
 
-    def update_song(self, song_id: str, song_data: SongUpdate) -> bool:
+    async def update_song(self, song_id: str, song_data: SongUpdate) -> bool:
         update_data = song_data.dict(exclude_unset=True)
         if "artistId" in update_data:
-            if not self.artist_repository.find_by_id(ObjectId(update_data["artistId"])):
+            if not await run_in_threadpool(self.artist_repository.find_by_id, ObjectId(update_data["artistId"])):
                 raise ValueError(f"Artist with ID {update_data['artistId']} does not exist")
             update_data["artistId"] = str(update_data["artistId"])  # Đảm bảo artistId là chuỗi
-        if "audioUrl" in update_data and update_data["audioUrl"]:
-            if not self._is_url_accessible(update_data["audioUrl"]):
-                raise ValueError("Invalid or inaccessible audio URL")
-        if "coverArt" in update_data and update_data["coverArt"]:
-            if not self._is_url_accessible(update_data["coverArt"]):
-                raise ValueError("Invalid or inaccessible cover art URL")
+        await media_validator.ensure_song_media(audio_url=update_data.get("audioUrl"), cover_art=update_data.get("coverArt"))
         update_data["updated_at"] = datetime.utcnow()
-        return self.song_repository.update(song_id, update_data)
+        return await run_in_threadpool(self.song_repository.update, song_id, update_data)
 
     def delete_song(self, song_id: str) -> bool:
         return self.song_repository.delete(song_id)
@@ -155,7 +138,7 @@ class SongService:
         if not genre:
             raise ValueError("Genre is required")
         songs = self.song_repository.find_by_genre(genre, page, limit)
-        return [self._map_to_song_in_db(song) for song in songs]
+        return self._map_many(songs)
 
     # ----------------------------
     # Random & Region
@@ -177,7 +160,7 @@ class SongService:
             ]
 
         shuffle(raw_songs)
-        return [self._map_to_song_in_db(song) for song in raw_songs[:limit]]
+        return self._map_many(raw_songs[:limit])
 
     def get_songs_by_region(
         self,
@@ -186,8 +169,8 @@ class SongService:
         refresh: bool = False
     ) -> List[SongInDB]:
         raw_songs = self.song_repository.get_random_songs_by_region(region, limit=limit)
-        return [self._map_to_song_in_db(song) for song in raw_songs]
+        return self._map_many(raw_songs)
 
     def get_random_songs_by_region(self, region: Optional[str], limit: int = 12) -> List[SongInDB]:
         raw_songs = self.song_repository.get_random_songs_by_region(region=region, limit=limit)
-        return [self._map_to_song_in_db(song) for song in raw_songs]
\ No newline at end of file
+        return self._map_many(raw_songs)
\ No newline at end of file
@@ -0,0 +1,222 @@
+# services/song_similarity.py
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from database.db import history_collection, listen_song_collection, songs_collection
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_PATH = os.getenv("SONG_SIMILARITY_PATH", os.path.join("data", "song_similarity.npz"))
+TOP_N = int(os.getenv("SONG_SIMILARITY_TOP_N", "50"))
+SESSION_GAP = float(os.getenv("SONG_SIMILARITY_SESSION_GAP", "1800"))  # giây giữa 2 lượt nghe để tách phiên
+WINDOW = int(os.getenv("SONG_SIMILARITY_WINDOW", "10"))  # chỉ ghép cặp các bài cách nhau <= WINDOW trong phiên
+RELOAD_INTERVAL = float(os.getenv("SONG_SIMILARITY_RELOAD_INTERVAL", "60"))  # giây giữa 2 lần kiểm tra file build offline
+
+
+class SimilarityMatrix:
+    """
+    Top-N bài tương tự cho mỗi bài, lưu dạng CSR:
+    neighbours của song_ids[i] là indices[indptr[i]:indptr[i+1]] với điểm scores[...] (giảm dần).
+    """
+
+    def __init__(self, song_ids: np.ndarray, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray):
+        self.song_ids = song_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self._position = {song_id: i for i, song_id in enumerate(song_ids.tolist())}
+
+    @classmethod
+    def empty(cls) -> "SimilarityMatrix":
+        return cls(np.array([], dtype="<U24"), np.zeros(1, dtype=np.int64),
+                   np.array([], dtype=np.int32), np.array([], dtype=np.float32))
+
+    def __len__(self):
+        return len(self.song_ids)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indices.size)
+
+    def neighbours(self, song_id: str, limit: int = 20) -> List[Tuple[str, float]]:
+        i = self._position.get(str(song_id))
+        if i is None:
+            return []
+        start, end = self.indptr[i], min(self.indptr[i + 1], self.indptr[i] + limit)
+        return [(str(self.song_ids[j]), float(score))
+                for j, score in zip(self.indices[start:end], self.scores[start:end])]
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, song_ids=self.song_ids, indptr=self.indptr,
+                            indices=self.indices, scores=self.scores)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityMatrix":
+        with np.load(path) as data:
+            return cls(data["song_ids"], data["indptr"], data["indices"], data["scores"])
+
+
+class SongSimilarity:
+    """
+    "More like this" dựa trên đồng xuất hiện (co-listen):
+    - Sự kiện nghe (listen_song + history) được chia thành phiên theo user, ngắt khi cách nhau > SESSION_GAP
+    - 2 bài cùng phiên (cách nhau <= WINDOW) tính 1 lần đồng xuất hiện / phiên
+    - Điểm = cosine: co(i, j) / sqrt(n(i) * n(j)), n = số phiên có bài đó
+    - Giữ TOP_N láng giềng / bài, build offline (seeds_data/update/build_song_similarity.py) ra file .npz
+    - App nạp file lúc startup; start() kiểm tra mtime mỗi RELOAD_INTERVAL giây và thay matrix khi file đổi
+      (mỗi worker tự nạp, không tính lại trong process API); rebuild() vẫn dùng được khi chưa có file
+    """
+
+    def __init__(self, path: str = SIMILARITY_PATH):
+        self.path = path
+        self.matrix = SimilarityMatrix.empty()
+        self._mtime: Optional[int] = None  # mtime_ns của file đang nạp
+        self._rebuild_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def neighbours(self, song_id: str, limit: int = 20) -> List[Tuple[str, float]]:
+        return self.matrix.neighbours(song_id, limit)
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self) -> bool:
+        """Nạp matrix đã build sẵn (nếu có file)."""
+        mtime = self._file_mtime()
+        if mtime is None:
+            return False
+        self.matrix = SimilarityMatrix.load(self.path)  # hot-swap: request đang chạy vẫn dùng matrix cũ
+        self._mtime = mtime
+        logger.info(f"[SongSimilarity] loaded {len(self.matrix)} songs, {self.matrix.nnz} pairs from {self.path}")
+        return True
+
+    def reload_if_changed(self) -> bool:
+        """Nạp lại nếu file đã được build lại (mtime đổi) kể từ lần nạp trước. True nếu đã thay matrix."""
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        return self.load()
+
+    def rebuild(self, save: bool = True) -> Dict:
+        with self._rebuild_lock:
+            matrix = self.build_matrix()
+            if save:
+                matrix.save(self.path)
+                self._mtime = self._file_mtime()  # file vừa ghi chính là matrix đang dùng → không nạp lại
+            self.matrix = matrix  # hot-swap: request đang chạy vẫn dùng matrix cũ
+        logger.info(f"[SongSimilarity] rebuilt: {len(matrix)} songs, {matrix.nnz} pairs")
+        return {"songs": len(matrix), "pairs": matrix.nnz}
+
+    # ----------------------------
+    # Theo dõi file build offline
+    # ----------------------------
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception as e:
+                logger.error(f"[SongSimilarity] reload failed: {e}")
+
+    # ----------------------------
+    # Build
+    # ----------------------------
+    @staticmethod
+    def _load_events():
+        """Trả về (users, timestamps, song_idx, song_ids) dạng mảng numpy."""
+        song_ids = np.array(sorted(str(s["_id"]) for s in songs_collection.find({}, {"_id": 1})), dtype="<U24")
+        position = {song_id: i for i, song_id in enumerate(song_ids.tolist())}
+        user_codes: Dict[str, int] = {}
+        users, stamps, songs = [], [], []
+
+        sources = (
+            (listen_song_collection.find({"type": {"$in": ["listen", None]}, "song_id": {"$exists": True}},
+                                         {"user_id": 1, "song_id": 1, "listened_at": 1}), "listened_at"),
+            (history_collection.find({}, {"user_id": 1, "song_id": 1, "timestamp": 1}), "timestamp"),
+        )
+        for cursor, time_field in sources:
+            for event in cursor:
+                song = position.get(str(event.get("song_id")))
+                ts = event.get(time_field)
+                if song is None or not event.get("user_id") or not hasattr(ts, "timestamp"):
+                    continue
+                users.append(user_codes.setdefault(str(event["user_id"]), len(user_codes)))
+                stamps.append(ts.timestamp())
+                songs.append(song)
+
+        return (np.array(users, dtype=np.int64), np.array(stamps, dtype=np.float64),
+                np.array(songs, dtype=np.int64), song_ids)
+
+    def build_matrix(self) -> SimilarityMatrix:
+        users, stamps, songs, song_ids = self._load_events()
+        n_songs = len(song_ids)
+        if songs.size < 2:
+            return SimilarityMatrix(song_ids, np.zeros(n_songs + 1, dtype=np.int64),
+                                    np.array([], dtype=np.int32), np.array([], dtype=np.float32))
+
+        # Sắp theo (user, thời gian) rồi đánh số phiên
+        order = np.lexsort((stamps, users))
+        users, stamps, songs = users[order], stamps[order], songs[order]
+        new_session = np.ones(songs.size, dtype=bool)
+        new_session[1:] = (users[1:] != users[:-1]) | (np.diff(stamps) > SESSION_GAP)
+        sessions = np.cumsum(new_session) - 1
+
+        # n(i): số phiên có bài i
+        session_songs = np.unique(np.stack([sessions, songs], axis=1), axis=0)
+        item_counts = np.bincount(session_songs[:, 1], minlength=n_songs).astype(np.float64)
+
+        # Cặp (a, b) trong cùng phiên, cách nhau <= WINDOW, tính cả 2 chiều
+        pairs = []
+        for k in range(1, min(WINDOW, songs.size - 1) + 1):
+            same = (sessions[k:] == sessions[:-k]) & (songs[k:] != songs[:-k])
+            if not same.any():
+                continue
+            s, a, b = sessions[k:][same], songs[:-k][same], songs[k:][same]
+            pairs.append(np.stack([s, a, b], axis=1))
+            pairs.append(np.stack([s, b, a], axis=1))
+        if not pairs:
+            return SimilarityMatrix(song_ids, np.zeros(n_songs + 1, dtype=np.int64),
+                                    np.array([], dtype=np.int32), np.array([], dtype=np.float32))
+
+        # Mỗi phiên chỉ tính 1 lần cho 1 cặp
+        session_pairs = np.unique(np.concatenate(pairs), axis=0)[:, 1:]
+        keys, co_counts = np.unique(session_pairs[:, 0] * n_songs + session_pairs[:, 1], return_counts=True)
+        rows, cols = keys // n_songs, keys % n_songs
+        scores = co_counts / np.sqrt(item_counts[rows] * item_counts[cols])
+
+        # Giữ TOP_N láng giềng điểm cao nhất cho mỗi hàng
+        order = np.lexsort((-scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        row_start = np.searchsorted(rows, rows, side="left")
+        keep = (np.arange(rows.size) - row_start) < TOP_N
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+        indptr = np.zeros(n_songs + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=n_songs))
+        return SimilarityMatrix(song_ids, indptr, cols.astype(np.int32), scores.astype(np.float32))
+
+
+song_similarity = SongSimilarity()
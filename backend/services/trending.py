@@ -0,0 +1,251 @@
+# services/trending.py
+import asyncio
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from database.db import listen_song_collection, liked_songs_collection, follows_collection
+from services.catalog_cache import catalog_cache
+from utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "48")) * 3600
+WINDOW_DAYS = float(os.getenv("TRENDING_WINDOW_DAYS", "14"))       # sự kiện cũ hơn gần như không còn trọng số
+REBUILD_INTERVAL = float(os.getenv("TRENDING_REBUILD_INTERVAL", "900"))
+CAPACITY = 100
+RESCALE_EXPONENT = 50.0  # exp(50) ~ 5e21: đổi mốc t0 trước khi float tràn
+EVENT_WEIGHT = {"listen": 1.0, "search": 0.3, "like": 2.0, "follow": 3.0}
+
+
+def _timestamp(value) -> Optional[float]:
+    # Mốc thời gian trong DB là datetime.utcnow() (naive, UTC); .timestamp() trên datetime naive hiểu theo giờ máy
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DecayedTopK:
+    """
+    Bộ đếm giảm dần theo hàm mũ (forward decay) cho 1 loại:
+    - Điểm lưu dạng w * exp(rate * (t - t0)) → mọi key cùng giảm theo 1 hệ số, không cần cập nhật key khác
+      khi thời gian trôi; thứ tự giữa các key không đổi nên top-K chỉ đổi khi có sự kiện mới
+    - Điểm chỉ tăng → giữ sẵn top-K dạng list đã sắp (bisect), top(limit) là O(K)
+    """
+
+    def __init__(self, capacity: int = CAPACITY, half_life: float = HALF_LIFE):
+        self.capacity = capacity
+        self.rate = math.log(2) / half_life
+        self._t0 = time.time()
+        self._scores: Dict[str, float] = {}
+        self._top: List[Tuple[float, str]] = []  # (-score, key) tăng dần
+        self._top_keys = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def add(self, key: str, weight: float, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            exponent = self.rate * (ts - self._t0)
+            if exponent > RESCALE_EXPONENT:
+                self._rescale(ts)
+                exponent = 0.0
+            score = self._scores.get(key, 0.0) + weight * math.exp(exponent)
+            self._scores[key] = score
+            self._promote(key, score)
+
+    def top(self, limit: int) -> List[Tuple[str, float]]:
+        """[(key, điểm hiện tại)] giảm dần."""
+        decay = math.exp(min(RESCALE_EXPONENT, -self.rate * (time.time() - self._t0)))
+        with self._lock:
+            return [(key, -neg * decay) for neg, key in self._top[:limit]]
+
+    def _promote(self, key: str, score: float):
+        top = self._top
+        if key in self._top_keys:
+            del top[next(i for i, (_, k) in enumerate(top) if k == key)]
+        elif len(top) >= self.capacity and score <= -top[-1][0]:
+            return
+        bisect.insort(top, (-score, key))
+        self._top_keys.add(key)
+        if len(top) > self.capacity:
+            _, dropped = top.pop()
+            self._top_keys.discard(dropped)
+
+    def _rescale(self, ts: float):
+        factor = math.exp(-self.rate * (ts - self._t0))
+        self._scores = {key: score * factor for key, score in self._scores.items()}
+        self._top = [(neg * factor, key) for neg, key in self._top]
+        self._t0 = ts
+
+
+class AlbumTitleIndex:
+    """
+    (artistId, tiêu đề album đã chuẩn hoá) → album _id: field "album" của bài hát lưu tiêu đề album
+    (artist_song_service / admin_song_service), không phải _id. Dựng lười từ catalog_cache, cập nhật theo thay đổi của catalog.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids: Optional[Dict[Tuple[str, str], str]] = None
+        self._keys: Dict[str, Tuple[str, str]] = {}  # album _id -> key, để xoá key cũ khi album đổi tên
+
+    @staticmethod
+    def _key(artist_id, title) -> Tuple[str, str]:
+        return str(artist_id or ""), normalize_text(title or "")
+
+    def resolve(self, artist_id, album) -> Optional[str]:
+        if not album:
+            return None
+        if catalog_cache.get("albums", album):  # dữ liệu cũ lưu thẳng _id album
+            return str(album)
+        return self._index().get(self._key(artist_id, album))
+
+    def _index(self) -> Dict[Tuple[str, str], str]:
+        ids = self._ids
+        if ids is None:
+            albums = catalog_cache.all("albums")  # ngoài lock: lần nạp đầu của catalog sẽ gọi on_catalog_change
+            with self._lock:
+                if self._ids is None:
+                    self._ids, self._keys = {}, {}
+                    for album in albums:
+                        self._set(album["_id"], album)
+                ids = self._ids
+        return ids
+
+    def _set(self, album_id: str, album: Optional[dict]):
+        old = self._keys.pop(album_id, None)
+        if old and self._ids.get(old) == album_id:
+            del self._ids[old]
+        if album and album.get("title"):
+            key = self._key(album.get("artist_id"), album["title"])
+            self._keys[album_id] = key
+            self._ids[key] = album_id
+
+    def on_catalog_change(self, kind: str, record_id: Optional[str], record: Optional[dict]):
+        if kind != "albums":
+            return
+        with self._lock:
+            if record_id is None:
+                self._ids = None  # dựng lại lười ở lần tra sau
+            elif self._ids is not None:
+                self._set(record_id, record)
+
+
+album_titles = AlbumTitleIndex()
+catalog_cache.subscribe(album_titles.on_catalog_change)
+
+
+class TrendingEngine:
+    """
+    Trending cho songs / artists / albums từ lượt nghe, tìm kiếm, like, follow:
+    - Repository / service gọi record_* ngay khi ghi sự kiện → trending phản ánh hoạt động gần nhất
+    - Lượt nghe 1 bài được tính cả cho nghệ sĩ và album của bài (tra qua catalog_cache)
+    - rebuild() định kỳ dựng lại từ DB (WINDOW_DAYS gần nhất) để gom sự kiện từ worker / script khác
+    """
+    KINDS = ("songs", "artists", "albums")
+
+    def __init__(self):
+        self._counters = self._empty()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _empty() -> Dict[str, DecayedTopK]:
+        return {kind: DecayedTopK() for kind in TrendingEngine.KINDS}
+
+    # ----------------------------
+    # Ghi
+    # ----------------------------
+    def record_events(self, events: Iterable[Dict]):
+        """Sự kiện listen_song (listen / search)."""
+        self._apply_events(self._counters, events)
+
+    def record_like(self, song_id: str):
+        self._add_song(self._counters, str(song_id), EVENT_WEIGHT["like"], None)
+
+    def record_follow(self, artist_id: str):
+        self._counters["artists"].add(str(artist_id), EVENT_WEIGHT["follow"])
+
+    # ----------------------------
+    # Đọc
+    # ----------------------------
+    def top(self, kind: str, limit: int = 10) -> List[Tuple[str, float]]:
+        return self._counters[kind].top(limit)
+
+    # ----------------------------
+    # Dựng lại từ DB
+    # ----------------------------
+    def rebuild(self):
+        since = datetime.utcnow() - timedelta(days=WINDOW_DAYS)
+        counters = self._empty()
+        self._apply_events(counters, listen_song_collection.find(
+            {"listened_at": {"$gte": since}}, {"song_id": 1, "artist_id": 1, "listened_at": 1, "type": 1}
+        ))
+        for like in liked_songs_collection.find({"liked_at": {"$gte": since}}, {"song_id": 1, "liked_at": 1}):
+            self._add_song(counters, str(like["song_id"]), EVENT_WEIGHT["like"], _timestamp(like.get("liked_at")))
+        for follow in follows_collection.find({"followed_at": {"$gte": since}}, {"artist_id": 1, "followed_at": 1}):
+            counters["artists"].add(str(follow["artist_id"]), EVENT_WEIGHT["follow"], _timestamp(follow.get("followed_at")))
+        self._counters = counters  # hot-swap
+        logger.info(
+            f"[TrendingEngine] rebuilt: {len(counters['songs'])} songs, "
+            f"{len(counters['artists'])} artists, {len(counters['albums'])} albums"
+        )
+
+    async def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.rebuild)
+            except Exception as e:
+                logger.error(f"[TrendingEngine] rebuild failed: {e}")
+            await asyncio.sleep(REBUILD_INTERVAL)
+
+    # ----------------------------
+    # Internals
+    # ----------------------------
+    def _apply_events(self, counters: Dict[str, DecayedTopK], events: Iterable[Dict]):
+        for event in events:
+            weight = EVENT_WEIGHT.get(event.get("type") or "listen")
+            if not weight:
+                continue
+            ts = _timestamp(event.get("listened_at"))
+            if event.get("song_id"):
+                self._add_song(counters, str(event["song_id"]), weight, ts)
+            elif event.get("artist_id"):
+                counters["artists"].add(str(event["artist_id"]), weight, ts)
+
+    @staticmethod
+    def _add_song(counters: Dict[str, DecayedTopK], song_id: str, weight: float, ts: Optional[float]):
+        counters["songs"].add(song_id, weight, ts)
+        song = catalog_cache.get("songs", song_id)
+        if not song:
+            return
+        if song.get("artistId"):
+            counters["artists"].add(str(song["artistId"]), weight, ts)
+        album_id = album_titles.resolve(song.get("artistId"), song.get("album"))
+        if album_id:
+            counters["albums"].add(album_id, weight, ts)
+
+
+trending = TrendingEngine()
@@ -1,14 +1,56 @@
 # services/user_service.py
+import os
+import time
+import asyncio
 from bson import ObjectId
 from datetime import datetime
 from typing import Optional, List
 from passlib.context import CryptContext
 from models.user import UserCreate, UserInDB, UserUpdate
 from database.repositories.user_repository import UserRepository
+from database.repositories.async_user_repository import AsyncUserRepository
 from fastapi import HTTPException
+from utils.ttl_cache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Cache user_id -> principal của auth.get_current_user (xoá khi ban / đổi role / sửa hồ sơ)
+user_principal_cache = TTLCache(maxsize=10000, ttl=float(os.getenv("AUTH_PRINCIPAL_TTL", "30")))
+
+
+class BanList:
+    """
+    Tập user_id đang bị ban cho chế độ AUTH_TOKEN_CLAIMS_ONLY (không đọc user mỗi request):
+    nạp lại từ DB (1 truy vấn distinct) sau mỗi ttl giây; ban / unban trong process này có hiệu lực ngay,
+    worker khác thấy sau tối đa ttl giây.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._ids = frozenset()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    async def contains(self, user_id: str) -> bool:
+        if self._stale():
+            async with self._lock:
+                if self._stale():
+                    self._ids = frozenset(await AsyncUserRepository.find_banned_ids())
+                    self._loaded_at = time.monotonic()
+        return str(user_id) in self._ids
+
+    def add(self, user_id: str):
+        self._ids = self._ids | {str(user_id)}
+
+    def discard(self, user_id: str):
+        self._ids = self._ids - {str(user_id)}
+
+
+banned_users = BanList(ttl=float(os.getenv("AUTH_BAN_LIST_TTL", "30")))
+
 class UserService:
     @staticmethod
     def get_user_by_email(email: str) -> Optional[UserInDB]:
@@ -21,11 +63,14 @@ class UserService:
     def get_user_by_id(user_id: str) -> Optional[UserInDB]:
         user = UserRepository.find_by_id(user_id)
         if user:
-            print(f"✅ Found user in get_user_by_id: {user}")
             return UserService._convert_to_user_in_db(user)
         print(f"❌ No user found with ID: {user_id} in DB")
         return None
 
+    @staticmethod
+    def invalidate_principal(user_id: str):
+        user_principal_cache.pop(str(user_id))
+
     @staticmethod
     def authenticate_user(email: str, password: str) -> Optional[UserInDB]:
         user = UserRepository.find_by_email(email)
@@ -58,6 +103,7 @@ class UserService:
             del update_data["password"]
         if not UserRepository.update(user_id, update_data):
             raise HTTPException(status_code=404, detail="User not found")
+        UserService.invalidate_principal(user_id)
         updated_user = UserService.get_user_by_id(user_id)
         if not updated_user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -67,6 +113,7 @@ class UserService:
     def delete_user(user_id: str) -> bool:
         if not UserRepository.delete(user_id):
             raise HTTPException(status_code=404, detail="User not found")
+        UserService.invalidate_principal(user_id)
         return True
 
     @staticmethod
@@ -82,6 +129,7 @@ class UserService:
         if user["role"] == "admin":
             raise HTTPException(status_code=400, detail="User is already an admin")
         UserRepository.update(user_id, {"role": "admin"})
+        UserService.invalidate_principal(user_id)
 
     @staticmethod
     def demote_from_admin(user_id: str, current_user_id: str) -> None:
@@ -98,6 +146,7 @@ class UserService:
         updated = UserRepository.update(user_id, {"role": "user"})
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to demote user")
+        UserService.invalidate_principal(user_id)
 
     @staticmethod
     def ban_user(user_id: str, current_user_id: str) -> None:
@@ -109,6 +158,8 @@ class UserService:
         if user_id == current_user_id:
             raise HTTPException(status_code=400, detail="Cannot ban yourself")
         UserRepository.update(user_id, {"banned": True})
+        UserService.invalidate_principal(user_id)
+        banned_users.add(user_id)
 
     @staticmethod
     def unban_user(user_id: str) -> None:
@@ -122,6 +173,8 @@ class UserService:
         updated = UserRepository.update(user_id, {"banned": False})
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to unban user")
+        UserService.invalidate_principal(user_id)
+        banned_users.discard(user_id)
 
     @staticmethod
     def search_users(query: str) -> List[UserInDB]:
@@ -152,6 +205,7 @@ class UserService:
         updated = UserRepository.update(user_id, {"role": "user"})
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to demote artist")
+        UserService.invalidate_principal(user_id)
         
     @staticmethod
     def toggle_like_song(user_id: str, song_id: str) -> list[str]:
@@ -189,6 +243,7 @@ class UserService:
         success = UserRepository.update(user_id, update_data)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to update user")
+        UserService.invalidate_principal(user_id)
         return success
 # ...existing code...
 
@@ -205,6 +260,7 @@ class UserService:
 
         if not success:
             raise HTTPException(status_code=404, detail="User not found")
+        UserService.invalidate_principal(user_id)
 
         updated_user = UserService.get_user_by_id(user_id)
         if not updated_user:
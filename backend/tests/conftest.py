@@ -0,0 +1,98 @@
+# tests/conftest.py - fixture dùng chung: server HTTP giả lập trên 127.0.0.1 và Mongo giả (mongomock)
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+import mongomock
+import pytest
+
+# Module đọc env lúc import (utils/gemini_api.py bắt buộc có key)
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+from database import db  # noqa: E402
+
+
+class StubServer:
+    """
+    Server HTTP thật (thread riêng) cho client httpx gọi tới.
+    routes: (method, path không có query) -> handler(request) trả về (status, headers, body);
+    body là bytes hoặc list các (bytes, giây chờ trước khi gửi) để giả lập stream.
+    """
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], Callable] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("content-length") or 0)
+                self.body = self.rfile.read(length) if length else b""
+                path = self.path.split("?", 1)[0]
+                server.requests.append((self.command, path, dict(self.headers)))
+                handler = server.routes.get((self.command, path))
+                status, headers, body = handler(self) if handler else (404, {}, b"not found")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if isinstance(body, bytes):
+                    self.send_header("content-length", str(len(body)))
+                    self.end_headers()
+                    if self.command != "HEAD":
+                        self.wfile.write(body)
+                    return
+                # Stream: chunked transfer encoding, mỗi đoạn gửi ngay
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                for chunk, delay in body:
+                    time.sleep(delay)
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            do_GET = do_POST = do_HEAD = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def route(self, method: str, path: str, handler: Callable):
+        self.routes[(method, path)] = handler
+
+    def count(self, method: str, path: str) -> int:
+        return sum(1 for m, p, _ in self.requests if (m, p) == (method, path))
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def mongo():
+    """Các *_collection trong database.db trỏ sang mongomock trong suốt 1 test."""
+    client = mongomock.MongoClient()
+    db.set_client(client, "test")
+    yield client[db.db_name()]
+    db.set_client(None)
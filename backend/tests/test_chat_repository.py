@@ -0,0 +1,50 @@
+# tests/test_chat_repository.py - ChatRepository.migrate_legacy trên mongomock (chạy lại sau khi bị ngắt không nhân đôi tin nhắn)
+import pytest
+
+from database.repositories import chat_repository
+from database.repositories.chat_repository import ChatRepository
+
+LEGACY = {
+    "user_id": "user-1",
+    "messages": [
+        {"sender": "user", "text": "xin chào"},
+        {"sender": "bot", "text": "chào bạn"},
+        {"sender": "user", "text": None},
+    ],
+}
+
+
+class CrashOnDelete:
+    """chat_history giả: process chết ngay trước khi xoá document cũ."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, attr):
+        return getattr(self._collection, attr)
+
+    def delete_one(self, *args, **kwargs):
+        raise KeyboardInterrupt
+
+
+def test_migrate_moves_messages_in_order(mongo):
+    mongo.chat_history.insert_one(dict(LEGACY))
+
+    assert ChatRepository.migrate_legacy() == 2
+
+    assert mongo.chat_history.count_documents({}) == 0
+    assert [m["text"] for m in ChatRepository.get_recent_messages("user-1")] == ["xin chào", "chào bạn"]
+
+
+def test_rerun_after_crash_does_not_duplicate(mongo, monkeypatch):
+    mongo.chat_history.insert_one(dict(LEGACY))
+    monkeypatch.setattr(chat_repository, "chat_history_collection", CrashOnDelete(mongo.chat_history))
+    with pytest.raises(KeyboardInterrupt):
+        ChatRepository.migrate_legacy()
+    first = list(mongo.chat_messages.find({}, {"_id": 1, "timestamp": 1}).sort("_id", 1))
+    monkeypatch.undo()
+
+    assert ChatRepository.migrate_legacy() == 0
+
+    assert list(mongo.chat_messages.find({}, {"_id": 1, "timestamp": 1}).sort("_id", 1)) == first
+    assert mongo.chat_history.count_documents({}) == 0
@@ -0,0 +1,56 @@
+# tests/test_fuzzy_index.py - FuzzyIndex so với difflib và fuzzy_match_artist_name (index dựng 1 lần cho cùng danh sách)
+import difflib
+import random
+import string
+
+from services.fuzzy_index import FuzzyIndex
+from utils import text_matcher
+from utils.text_matcher import fuzzy_match_artist_name
+from utils.text_utils import normalize_text
+
+SYLLABLES = ["anh", "em", "yeu", "mua", "nang", "tim", "dem", "ngay", "duong", "xa", "nho", "thuong",
+             "gio", "hoa", "bien", "troi", "xuan", "thu", "love", "night", "star", "dream", "heart", "rain"]
+
+
+def _typo(rng, text):
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        op = rng.random()
+        if op < 0.33 and len(chars) > 1:
+            del chars[i]
+        elif op < 0.66:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        else:
+            chars[i] = rng.choice(string.ascii_lowercase)
+    return "".join(chars)
+
+
+def test_top_hit_close_to_difflib():
+    rng = random.Random(7)
+    titles = sorted({" ".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))) for _ in range(1500)})
+    index = FuzzyIndex()
+    for i, title in enumerate(titles):
+        index.add(str(i), [title])
+
+    worse = 0
+    queries = [_typo(rng, rng.choice(titles)) for _ in range(100)]
+    for query in queries:
+        hits = index.search(query, limit=1, cutoff=0.6)
+        expected = difflib.get_close_matches(normalize_text(query), titles, n=1, cutoff=0.6)
+        best = difflib.SequenceMatcher(None, normalize_text(query), expected[0]).ratio() if expected else 0.0
+        if (hits[0][0] if hits else 0.0) + 1e-9 < best:
+            worse += 1
+    assert worse <= 3
+
+
+def test_match_from_list_reuses_index():
+    text_matcher._names_index.cache_clear()
+    names = ["Sơn Tùng M-TP", "Đen Vâu", "Hoàng Thùy Linh"]
+
+    assert fuzzy_match_artist_name("son tung mtp", names) == "Sơn Tùng M-TP"
+    assert fuzzy_match_artist_name("den vau", list(names)) == "Đen Vâu"
+    assert fuzzy_match_artist_name("xyz", names) is None
+
+    info = text_matcher._names_index.cache_info()
+    assert (info.misses, info.hits) == (1, 2)
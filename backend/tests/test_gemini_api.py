@@ -0,0 +1,126 @@
+# tests/test_gemini_api.py - cache, single-flight và stream SSE của utils/gemini_api.py (Gemini giả lập bằng StubServer)
+import asyncio
+import json
+import time
+
+import pytest
+
+from utils import gemini_api
+from utils.ttl_cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+GENERATE = "/generate"
+STREAM = "/stream"
+
+
+def _reply(text: str, delay: float = 0.0):
+    def handler(request):
+        time.sleep(delay)
+        body = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        return 200, {"content-type": "application/json"}, json.dumps(body).encode()
+    return handler
+
+
+def _sse(*texts: str, delay: float = 0.05):
+    def handler(request):
+        events = [
+            (f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': t}]}}]})}\r\n\r\n".encode(), delay)
+            for t in texts
+        ]
+        return 200, {"content-type": "text/event-stream"}, events
+    return handler
+
+
+@pytest.fixture
+async def gemini(stub_server, monkeypatch):
+    monkeypatch.setattr(gemini_api, "GEMINI_API_URL", stub_server.url + GENERATE)
+    monkeypatch.setattr(gemini_api, "GEMINI_STREAM_URL", stub_server.url + STREAM)
+    monkeypatch.setattr(gemini_api, "CACHE_DIR", None)
+    monkeypatch.setattr(gemini_api, "_response_cache", TTLCache(maxsize=16, ttl=60))
+    gemini_api._inflight.clear()
+    yield stub_server
+    await gemini_api.close_gemini_client()
+
+
+async def test_same_prompt_is_served_from_cache(gemini):
+    gemini.route("POST", GENERATE, _reply("Xin chào"))
+
+    assert await gemini_api.ask_gemini("hello") == "Xin chào"
+    assert await gemini_api.ask_gemini("hello") == "Xin chào"
+    assert gemini.count("POST", GENERATE) == 1
+
+    await gemini_api.ask_gemini("another prompt")
+    assert gemini.count("POST", GENERATE) == 2
+
+
+async def test_error_replies_are_not_cached(gemini):
+    gemini.route("POST", GENERATE, lambda request: (500, {}, b"boom"))
+
+    assert (await gemini_api.ask_gemini("hello")).startswith("⚠️ Lỗi HTTP 500")
+    await gemini_api.ask_gemini("hello")
+    assert gemini.count("POST", GENERATE) == 2
+
+
+async def test_concurrent_callers_share_one_request(gemini):
+    gemini.route("POST", GENERATE, _reply("một lần thôi", delay=0.3))
+
+    replies = await asyncio.gather(*(gemini_api.ask_gemini("same") for _ in range(5)))
+
+    assert replies == ["một lần thôi"] * 5
+    assert gemini.count("POST", GENERATE) == 1
+    assert not gemini_api._inflight
+
+
+async def test_cached_reply_expires_after_ttl(gemini, monkeypatch):
+    monkeypatch.setattr(gemini_api, "_response_cache", TTLCache(maxsize=16, ttl=0.2))
+    gemini.route("POST", GENERATE, _reply("cũ"))
+
+    await gemini_api.ask_gemini("hello")
+    await gemini_api.ask_gemini("hello")
+    assert gemini.count("POST", GENERATE) == 1
+
+    await asyncio.sleep(0.3)
+    await gemini_api.ask_gemini("hello")
+    assert gemini.count("POST", GENERATE) == 2
+
+
+async def test_cancelled_leader_fails_followers_with_regular_error(gemini):
+    gemini.route("POST", GENERATE, _reply("chậm", delay=1.0))
+
+    leader = asyncio.create_task(gemini_api.ask_gemini("slow"))
+    await asyncio.sleep(0.1)
+    follower = asyncio.create_task(gemini_api.ask_gemini("slow"))
+    await asyncio.sleep(0.1)
+    leader.cancel()
+
+    with pytest.raises(RuntimeError):
+        await follower
+    assert leader.cancelled()
+    assert not gemini_api._inflight
+
+
+async def test_stream_yields_chunks_then_caches_full_reply(gemini):
+    gemini.route("POST", STREAM, _sse("Xin ", "chào ", "bạn"))
+
+    chunks = [chunk async for chunk in gemini_api.stream_gemini("hello")]
+
+    assert chunks == ["Xin ", "chào ", "bạn"]
+    # Câu trả lời đầy đủ được cache: ask_gemini / stream_gemini sau đó không gọi lại Gemini
+    assert await gemini_api.ask_gemini("hello") == "Xin chào bạn"
+    assert [chunk async for chunk in gemini_api.stream_gemini("hello")] == ["Xin chào bạn"]
+    assert gemini.count("POST", STREAM) == 1
+    assert gemini.count("POST", GENERATE) == 0
+
+
+async def test_stream_follower_waits_for_leader(gemini):
+    gemini.route("POST", STREAM, _sse("a", "b", "c", delay=0.1))
+
+    async def collect():
+        return [chunk async for chunk in gemini_api.stream_gemini("shared")]
+
+    leader, follower = await asyncio.gather(collect(), collect())
+
+    assert leader == ["a", "b", "c"]
+    assert follower == ["abc"]
+    assert gemini.count("POST", STREAM) == 1
@@ -0,0 +1,176 @@
+# tests/test_media_upload.py - services/media_upload.py với LocalStorage (thư mục tạm) và media_uploads trên mongomock
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+
+from services import media_upload as media_upload_module
+from services.media_upload import LocalStorage, MediaUploadPipeline
+
+pytestmark = pytest.mark.anyio
+
+OWNER = "user-1"
+
+
+class RecordingStorage(LocalStorage):
+    """LocalStorage ghi lại số lần put và tiến độ nhìn thấy trong lúc đang upload."""
+
+    def __init__(self, root, barrier=None, fail_kind=None):
+        super().__init__(str(root), "http://media.test")
+        self.puts = []
+        self.barrier = barrier
+        self.fail_kind = fail_kind
+
+    def put(self, file, key, kind, filename=None):
+        if self.barrier is not None:
+            self.barrier.wait()  # cover và audio phải cùng lúc nằm trong put
+        if kind == self.fail_kind:
+            raise OSError("disk full")
+        self.puts.append((key, kind))
+        return super().put(file, key, kind, filename)
+
+
+class ReadLog(io.BytesIO):
+    """File nguồn ghi lại kích thước mỗi lần read()."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(media_upload_module, "CHUNK_SIZE", 1024)
+
+
+@pytest.fixture
+def pipeline_factory(mongo, tmp_path):
+    pipelines = []
+
+    def make(**storage_options):
+        pipeline = MediaUploadPipeline(RecordingStorage(tmp_path / "media", **storage_options), workers=2)
+        pipelines.append(pipeline)
+        return pipeline
+
+    yield make
+    for pipeline in pipelines:
+        pipeline.shutdown()
+
+
+def _local_path(storage, url):
+    return os.path.join(storage.root, *url[len(storage.base_url) + 1:].split("/"))
+
+
+def test_local_storage_writes_in_chunks(pipeline_factory, small_chunks):
+    pipeline = pipeline_factory()
+    data = os.urandom(10 * 1024 + 17)
+    source = ReadLog(data)
+
+    result = pipeline.upload_file(source, "song.MP3", "audio")
+
+    assert result["sha256"] == hashlib.sha256(data).hexdigest()
+    assert result["size"] == len(data)
+    assert result["url"] == f"http://media.test/audios/{result['sha256']}.mp3"
+    path = _local_path(pipeline.storage, result["url"])
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert not os.path.exists(f"{path}.part")
+    assert source.reads and all(0 < size <= 1024 for size in source.reads)
+
+
+def test_same_content_is_uploaded_once(pipeline_factory, mongo):
+    pipeline = pipeline_factory()
+    data = b"cover bytes" * 100
+
+    first = pipeline.upload_file(io.BytesIO(data), "a.jpg", "image")
+    second = pipeline.upload_file(io.BytesIO(data), "b.jpg", "image")
+
+    assert not first["deduplicated"] and second["deduplicated"]
+    assert second["url"] == first["url"]
+    assert len(pipeline.storage.puts) == 1
+    assert mongo.media_uploads.count_documents({}) == 1
+    assert mongo.media_uploads.find_one()["_id"] == f"local:{first['sha256']}"
+
+
+async def test_cover_and_audio_upload_concurrently(pipeline_factory):
+    pipeline = pipeline_factory(barrier=threading.Barrier(2, timeout=5))
+    files = {
+        "coverArt": (io.BytesIO(b"jpg" * 500), "cover.jpg", "image"),
+        "audioUrl": (io.BytesIO(b"mp3" * 5000), "song.mp3", "audio"),
+    }
+
+    upload_id, results = await pipeline.upload(files, OWNER)
+
+    assert set(results) == {"coverArt", "audioUrl"}
+    assert "/images/" in results["coverArt"]["url"] and "/audios/" in results["audioUrl"]["url"]
+    assert {kind for _, kind in pipeline.storage.puts} == {"image", "audio"}
+    assert upload_id
+
+
+async def test_progress_states(pipeline_factory, small_chunks):
+    pipeline = pipeline_factory()
+    seen = []
+    original_put = pipeline.storage.put
+
+    def put(file, key, kind, filename=None):
+        seen.append(dict(pipeline.progress(OWNER, "job-1")["audioUrl"]))
+        return original_put(file, key, kind, filename)
+
+    pipeline.storage.put = put
+    data = os.urandom(5000)
+
+    await pipeline.upload({"audioUrl": (io.BytesIO(data), "song.mp3", "audio")}, OWNER, "job-1")
+
+    assert seen == [{"status": "uploading", "bytes": 0, "total": 5000}]
+    assert pipeline.progress(OWNER, "job-1") == {"audioUrl": {"status": "done", "bytes": 5000, "total": 5000}}
+    # Upload lại cùng nội dung: dedup, vẫn báo done
+    await pipeline.upload({"audioUrl": (io.BytesIO(data), "song.mp3", "audio")}, OWNER, "job-2")
+    assert pipeline.progress(OWNER, "job-2")["audioUrl"]["status"] == "done"
+
+
+async def test_failed_file_is_reported(pipeline_factory):
+    pipeline = pipeline_factory(fail_kind="audio")
+    files = {
+        "coverArt": (io.BytesIO(b"jpg"), "cover.jpg", "image"),
+        "audioUrl": (io.BytesIO(b"mp3"), "song.mp3", "audio"),
+    }
+
+    with pytest.raises(OSError):
+        await pipeline.upload(files, OWNER, "job-1")
+
+    progress = pipeline.progress(OWNER, "job-1")
+    assert progress["coverArt"]["status"] == "done"
+    assert progress["audioUrl"]["status"] == "failed"
+
+
+async def test_progress_is_scoped_to_owner(pipeline_factory):
+    pipeline = pipeline_factory()
+    await pipeline.upload({"coverArt": (io.BytesIO(b"a"), "a.jpg", "image")}, OWNER, "shared-id")
+    await pipeline.upload({"coverArt": (io.BytesIO(b"b"), "b.jpg", "image")}, "user-2", "shared-id")
+
+    assert pipeline.progress(OWNER, "shared-id")["coverArt"]["total"] == 1
+    assert pipeline.progress("user-3", "shared-id") is None
+    with pytest.raises(ValueError):
+        await pipeline.upload({}, OWNER, "../other")
+
+
+async def test_upload_song_media_response(pipeline_factory):
+    pipeline = pipeline_factory()
+
+    class Upload:
+        def __init__(self, data, filename):
+            self.file, self.filename = io.BytesIO(data), filename
+
+    first = await pipeline.upload_song_media(OWNER, cover_art=Upload(b"img", "c.png"), audio=None)
+    second = await pipeline.upload_song_media(OWNER, Upload(b"img", "c.png"), Upload(b"snd", "s.mp3"))
+
+    assert set(first) == {"coverArt", "upload_id", "deduplicated"} and first["deduplicated"] == []
+    assert second["coverArt"] == first["coverArt"]
+    assert second["deduplicated"] == ["coverArt"]
+    assert second["audioUrl"].endswith(".mp3")
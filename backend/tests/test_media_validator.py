@@ -0,0 +1,84 @@
+# tests/test_media_validator.py - utils/media_validator.py với server media giả lập (StubServer)
+import time
+
+import pytest
+
+from utils import media_validator as media_validator_module
+from utils.media_validator import MediaValidator
+
+pytestmark = pytest.mark.anyio
+
+
+def _ok(request):
+    return 200, {"content-type": "audio/mpeg"}, b"" if request.command == "HEAD" else b"x"
+
+
+@pytest.fixture
+async def validator():
+    validator = MediaValidator()
+    yield validator
+    await validator.close()
+
+
+async def test_head_ok_is_accessible(stub_server, validator):
+    stub_server.route("HEAD", "/song.mp3", _ok)
+
+    assert await validator.is_accessible(stub_server.url + "/song.mp3")
+    assert stub_server.count("HEAD", "/song.mp3") == 1
+    assert stub_server.count("GET", "/song.mp3") == 0
+
+
+async def test_missing_file_is_inaccessible(stub_server, validator):
+    assert not await validator.is_accessible(stub_server.url + "/missing.mp3")
+
+
+async def test_head_405_falls_back_to_ranged_get(stub_server, validator):
+    stub_server.route("HEAD", "/signed.mp3", lambda request: (405, {}, b""))
+    stub_server.route("GET", "/signed.mp3", lambda request: (206, {"content-range": "bytes 0-0/100"}, b"x"))
+
+    assert await validator.is_accessible(stub_server.url + "/signed.mp3")
+    method, path, headers = stub_server.requests[-1]
+    assert (method, path) == ("GET", "/signed.mp3")
+    assert {k.lower(): v for k, v in headers.items()}["range"] == "bytes=0-0"
+
+
+async def test_timeout_is_inaccessible(stub_server, monkeypatch):
+    monkeypatch.setattr(media_validator_module, "MEDIA_URL_TIMEOUT", 0.2)
+    stub_server.route("HEAD", "/slow.mp3", lambda request: (time.sleep(1), _ok(request))[1])
+    validator = MediaValidator()
+    try:
+        started = time.monotonic()
+        assert not await validator.is_accessible(stub_server.url + "/slow.mp3")
+        assert time.monotonic() - started < 0.9
+    finally:
+        await validator.close()
+
+
+async def test_verified_urls_are_cached_and_failures_are_not(stub_server, validator):
+    stub_server.route("HEAD", "/song.mp3", _ok)
+    ok_url, bad_url = stub_server.url + "/song.mp3", stub_server.url + "/missing.jpg"
+
+    assert await validator.inaccessible(ok_url, bad_url) == [bad_url]
+    assert await validator.inaccessible(ok_url, bad_url) == [bad_url]
+
+    assert stub_server.count("HEAD", "/song.mp3") == 1
+    assert stub_server.count("HEAD", "/missing.jpg") == 2
+
+
+async def test_mark_verified_skips_probe(stub_server, validator):
+    url = stub_server.url + "/uploaded.mp3"
+    validator.mark_verified(url)
+
+    assert await validator.is_accessible(url)
+    assert stub_server.requests == []
+
+
+async def test_ensure_song_media_raises_value_error(stub_server, validator):
+    stub_server.route("HEAD", "/song.mp3", _ok)
+    audio, cover = stub_server.url + "/song.mp3", stub_server.url + "/cover.jpg"
+
+    await validator.ensure_song_media(audio_url=audio, cover_art=None)
+    with pytest.raises(ValueError, match="cover art"):
+        await validator.ensure_song_media(audio_url=audio, cover_art=cover)
+    with pytest.raises(ValueError, match="audio"):
+        await validator.ensure_song_media(audio_url=stub_server.url + "/gone.mp3", cover_art=cover)
@@ -0,0 +1,107 @@
+# tests/test_recommendation_engine.py - services/recommendation_engine.py trên mongomock: doc rỗng cho user mới, lease giữa các worker
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from services import recommendation_engine as engine_module
+from services.recommendation_engine import JOB_NAME, RecommendationEngine
+
+
+@pytest.fixture
+def engine(mongo, monkeypatch):
+    """mongomock chưa nhận UpdateOne(sort=...) của pymongo mới trong bulk_write → save_many ghi từng doc."""
+    engine = RecommendationEngine()
+
+    def save_many(docs):
+        for doc in docs:
+            engine.repo.collection.update_one({"_id": doc["_id"]}, {"$set": {**doc, "updated_at": datetime.utcnow()}}, upsert=True)
+
+    monkeypatch.setattr(engine.repo, "save_many", save_many)
+    return engine
+
+
+def test_user_without_events_gets_empty_doc(engine):
+    user_id = str(ObjectId())
+
+    doc = engine.build_for_user(user_id)
+
+    assert doc["candidates"] == []
+    assert engine.repo.find_by_user(user_id)["candidates"] == []  # request sau đọc doc, không build lại
+
+
+def test_user_with_events_gets_candidates(engine, mongo):
+    user_id = ObjectId()
+    heard, other = ObjectId(), ObjectId()
+    mongo.songs.insert_many([
+        {"_id": heard, "title": "a", "artist": "X", "genre": ["pop"], "tags": []},
+        {"_id": other, "title": "b", "artist": "X", "genre": ["pop"], "tags": []},
+    ])
+    mongo.history.insert_one({"user_id": user_id, "song_id": heard, "timestamp": datetime.utcnow()})
+
+    doc = engine.build_for_user(str(user_id))
+
+    assert [c["song_id"] for c in doc["candidates"]] == [str(other)]
+
+
+def test_only_one_worker_refreshes(mongo, monkeypatch):
+    monkeypatch.setattr(engine_module, "LEASE_TTL", 60)
+    leader, follower = RecommendationEngine(), RecommendationEngine()
+
+    assert leader.refresh_if_leader() == 0
+    assert follower.refresh_if_leader() is None
+    assert leader.refresh_if_leader() == 0  # leader gia hạn lease của chính mình
+
+
+def test_expired_or_released_lease_is_taken_over(mongo, monkeypatch):
+    monkeypatch.setattr(engine_module, "LEASE_TTL", 60)
+    leader, follower = RecommendationEngine(), RecommendationEngine()
+    assert leader.repo.acquire_lease(JOB_NAME, leader.owner, 60)
+
+    mongo.recommendation_jobs.update_one(
+        {"_id": JOB_NAME}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert follower.repo.acquire_lease(JOB_NAME, follower.owner, 60)
+    assert not leader.repo.acquire_lease(JOB_NAME, leader.owner, 60)
+
+    follower.repo.release_lease(JOB_NAME, follower.owner)
+    assert leader.repo.acquire_lease(JOB_NAME, leader.owner, 60)
+
+
+def test_refresh_all_keeps_lease(mongo):
+    engine = RecommendationEngine()
+    assert engine.repo.acquire_lease(JOB_NAME, engine.owner, 60)
+    engine.repo.set_last_run(JOB_NAME, datetime.utcnow())
+
+    engine.refresh_all()
+
+    job = mongo.recommendation_jobs.find_one({"_id": JOB_NAME})
+    assert job["lease_owner"] == engine.owner
+
+
+def test_late_flushed_listen_is_picked_up(mongo):
+    """Sự kiện có listened_at trước mốc lần chạy trước nhưng được ghi sau đó vẫn được refresh."""
+    engine = RecommendationEngine()
+    last_run = datetime.utcnow() - timedelta(minutes=10)
+    engine.repo.set_last_run(JOB_NAME, last_run)
+    late, old, legacy = (str(ObjectId()) for _ in range(3))
+    mongo.listen_song.insert_many([
+        {"user_id": late, "listened_at": last_run - timedelta(minutes=5), "ingested_at": datetime.utcnow()},
+        {"user_id": old, "listened_at": last_run - timedelta(hours=2), "ingested_at": last_run - timedelta(hours=1)},
+        {"user_id": legacy, "listened_at": datetime.utcnow()},
+    ])
+
+    assert engine._active_users(engine.repo.get_last_run(JOB_NAME)) == sorted([late, legacy])
+
+
+def test_record_many_stamps_ingested_at(mongo, monkeypatch):
+    from database.repositories.listen_repository import ListenRepository
+
+    repo = ListenRepository()
+    monkeypatch.setattr(repo, "apply_uncounted", lambda ids: 0)  # bộ đếm dùng bulk_write (mongomock chưa hỗ trợ)
+    before = datetime.utcnow() - timedelta(milliseconds=1)  # BSON date chỉ chính xác tới ms
+    [event_id] = repo.record_many([{
+        "user_id": "u", "song_id": str(ObjectId()), "listened_at": before - timedelta(days=1), "type": "listen"
+    }])
+
+    assert mongo.listen_song.find_one({"_id": event_id})["ingested_at"] >= before
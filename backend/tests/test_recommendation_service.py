@@ -0,0 +1,38 @@
+# tests/test_recommendation_service.py - services/recommendation_service.py trên mongomock: bước gợi ý theo âm thanh trước fallback
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from services import recommendation_service
+from services.recommendation_service import get_recommendations
+
+
+def test_audio_similar_step_before_latest_fallback(mongo, monkeypatch):
+    user_id = ObjectId()
+    heard, candidate, similar, latest = (ObjectId() for _ in range(4))
+    mongo.songs.insert_many([
+        {"_id": heard, "title": "heard", "releaseYear": 2020},
+        {"_id": candidate, "title": "candidate", "releaseYear": 2019},
+        {"_id": similar, "title": "similar", "releaseYear": 2018},
+        {"_id": latest, "title": "latest", "releaseYear": 2024},
+    ])
+    updated_at = datetime.utcnow() - timedelta(hours=1)
+    mongo.recommendations.insert_one({
+        "_id": str(user_id), "updated_at": updated_at,
+        "candidates": [{"song_id": str(candidate), "score": 1.0}],
+    })
+    mongo.history.insert_one({"user_id": user_id, "song_id": heard, "timestamp": datetime.utcnow()})
+    calls = []
+
+    def similar_to_songs(song_ids, limit, exclude=()):
+        calls.append((set(song_ids), limit, set(exclude)))
+        return [(sid, score) for sid, score in ((str(heard), 0.99), (str(similar), 0.9)) if sid not in exclude][:limit]
+
+    monkeypatch.setattr(recommendation_service.audio_features, "similar_to_songs", similar_to_songs)
+
+    songs = get_recommendations(str(user_id), limit=3)
+
+    assert [song["title"] for song in songs] == ["candidate", "similar", "latest"]
+    seeds, limit, exclude = calls[0]
+    assert seeds == {str(heard)} and limit == 2
+    assert exclude == {str(heard), str(candidate)}
@@ -0,0 +1,23 @@
+# tests/test_search_index.py - SearchIndex.build lúc startup trên mongomock: mỗi kind chỉ dựng 1 lần
+from bson import ObjectId
+
+from services import search_index as search_index_module
+from services.catalog_cache import CatalogCache
+from services.search_index import SearchIndex
+
+
+def test_build_indexes_each_kind_once(mongo, monkeypatch):
+    mongo.songs.insert_one({"_id": ObjectId(), "title": "Nơi này có anh", "artist": "Sơn Tùng M-TP"})
+    mongo.artists.insert_one({"_id": ObjectId(), "name": "Sơn Tùng M-TP"})
+    cache, index = CatalogCache(), SearchIndex()
+    monkeypatch.setattr(search_index_module, "catalog_cache", cache)
+    cache.subscribe(index.on_catalog_change)
+    rebuilt = []
+    original = index._rebuild_kind
+    monkeypatch.setattr(index, "_rebuild_kind", lambda kind: (rebuilt.append(kind), original(kind)))
+
+    index.build()
+
+    assert sorted(rebuilt) == sorted(SearchIndex.KINDS)
+    assert index.ready
+    assert len(index._records["songs"]) == 1 and len(index._records["artists"]) == 1
@@ -0,0 +1,39 @@
+# tests/test_song_similarity.py - SongSimilarity nạp lại file .npz build offline khi mtime đổi (không restart, không tính lại)
+import os
+
+import numpy as np
+
+from services.song_similarity import SimilarityMatrix, SongSimilarity
+
+
+def _matrix(pairs):
+    """pairs: {song_id: [(neighbour, score)]} → SimilarityMatrix."""
+    song_ids = sorted({sid for sid in pairs} | {n for row in pairs.values() for n, _ in row})
+    position = {sid: i for i, sid in enumerate(song_ids)}
+    indptr, indices, scores = [0], [], []
+    for sid in song_ids:
+        for neighbour, score in pairs.get(sid, []):
+            indices.append(position[neighbour])
+            scores.append(score)
+        indptr.append(len(indices))
+    return SimilarityMatrix(np.array(song_ids, dtype="<U24"), np.array(indptr, dtype=np.int64),
+                            np.array(indices, dtype=np.int32), np.array(scores, dtype=np.float32))
+
+
+def test_reload_picks_up_offline_build(tmp_path):
+    path = str(tmp_path / "song_similarity.npz")
+    similarity = SongSimilarity(path)
+    assert not similarity.reload_if_changed()  # chưa có file
+
+    _matrix({"a": [("b", 0.5)]}).save(path)
+    assert similarity.load()
+    assert similarity.neighbours("a") == [("b", 0.5)]
+    assert not similarity.reload_if_changed()  # file không đổi → giữ matrix đang dùng
+
+    # Script offline ghi file mới (os.replace) → lần kiểm tra sau thay matrix
+    _matrix({"a": [("c", 0.75)]}).save(path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert similarity.reload_if_changed()
+    assert similarity.neighbours("a") == [("c", 0.75)]
+    assert not similarity.reload_if_changed()
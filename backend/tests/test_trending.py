@@ -0,0 +1,50 @@
+# tests/test_trending.py - services/trending.py: mốc thời gian naive (utcnow) là UTC, trending album theo tiêu đề album của bài hát
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from services import trending as trending_module
+from services.catalog_cache import CatalogCache
+from services.trending import AlbumTitleIndex, TrendingEngine, _timestamp
+
+
+def test_naive_datetime_is_utc(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Ho_Chi_Minh")
+    time.tzset()
+    try:
+        assert _timestamp(datetime(1970, 1, 1, 0, 0, 10)) == 10.0
+        assert abs(_timestamp(datetime.utcnow()) - time.time()) < 5
+        assert _timestamp(datetime(1970, 1, 1, 0, 0, 10, tzinfo=timezone.utc)) == 10.0
+        assert _timestamp(None) is None
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_album_trending_resolves_album_title(mongo, monkeypatch):
+    artist_id, other_artist = ObjectId(), ObjectId()
+    album_id = ObjectId()
+    mongo.albums.insert_many([
+        {"_id": album_id, "title": "Chúng Ta Của Hiện Tại", "artist_id": str(artist_id)},
+        {"_id": ObjectId(), "title": "Single", "artist_id": str(other_artist)},
+    ])
+    song_id, single_id = ObjectId(), ObjectId()
+    mongo.songs.insert_many([
+        {"_id": song_id, "title": "a", "artistId": str(artist_id), "album": "Chúng ta của hiện tại"},
+        {"_id": single_id, "title": "b", "artistId": str(artist_id), "album": "Single"},  # "Single" của nghệ sĩ khác
+    ])
+    cache, albums = CatalogCache(), AlbumTitleIndex()
+    cache.subscribe(albums.on_catalog_change)
+    monkeypatch.setattr(trending_module, "catalog_cache", cache)
+    monkeypatch.setattr(trending_module, "album_titles", albums)
+    engine = TrendingEngine()
+
+    engine.record_events([{"song_id": str(song_id)}, {"song_id": str(single_id)}])
+
+    assert [album for album, _ in engine.top("albums")] == [str(album_id)]
+
+    # Đổi tên album → tra theo tên mới
+    cache.upsert("albums", {"_id": album_id, "title": "Tên mới", "artist_id": str(artist_id)})
+    assert albums.resolve(str(artist_id), "Chúng ta của hiện tại") is None
+    assert albums.resolve(str(artist_id), "tên mới") == str(album_id)
@@ -1,7 +1,12 @@
 import os
+import json
+import time
+import hashlib
 import httpx
 import asyncio
+from typing import AsyncIterator, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from utils.ttl_cache import TTLCache
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -10,16 +15,205 @@ GEMINI_API_KEY = os.getenv("GOOGLE_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("⚠️ GOOGLE_API_KEY không được tìm thấy trong biến môi trường (.env)")
 
-# URL gọi Gemini 2.5 Flash
-GEMINI_API_URL = (
-    f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
-)
+# URL gọi Gemini 2.0 Flash (GEMINI_API_BASE cho phép trỏ sang server giả lập khi test)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_API_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:generateContent?key={GEMINI_API_KEY}"
+GEMINI_STREAM_URL = f"{GEMINI_API_BASE}/models/{GEMINI_MODEL}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
 
+# Cache câu trả lời theo nội dung prompt (bộ nhớ + tuỳ chọn ghi đĩa)
+CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "86400"))
+CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "2048"))
+CACHE_DIR = os.getenv("GEMINI_CACHE_DIR")  # để trống = không dùng tầng đĩa
 
+_response_cache = TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+_inflight: Dict[str, asyncio.Future] = {}
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """1 AsyncClient dùng chung cho cả app (giữ kết nối keep-alive tới Gemini)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=15.0,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _client
+
+
+async def close_gemini_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _cache_key(prompt: str) -> str:
+    return hashlib.sha256(f"{GEMINI_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _read_disk(key: str) -> Optional[str]:
+    try:
+        with open(_disk_path(key), encoding="utf-8") as f:
+            item = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if item.get("expires_at", 0) < time.time():
+        return None
+    return item.get("reply")
+
+
+def _write_disk(key: str, reply: str):
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"reply": reply, "expires_at": time.time() + CACHE_TTL}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"❌ [ask_gemini] Không ghi được cache đĩa: {e}")
+
+
+async def _cached_reply(key: str) -> Optional[str]:
+    reply = _response_cache.get(key)
+    if reply is None and CACHE_DIR:
+        reply = await asyncio.to_thread(_read_disk, key)
+        if reply is not None:
+            _response_cache.set(key, reply)
+    return reply
+
+
+async def _store_reply(key: str, reply: str):
+    _response_cache.set(key, reply)
+    if CACHE_DIR:
+        await asyncio.to_thread(_write_disk, key, reply)
+
+
+def _fail_inflight(future: asyncio.Future, error: BaseException):
+    """
+    Báo lỗi cho các request đang chờ cùng prompt. Request dẫn bị huỷ (CancelledError / GeneratorExit)
+    → request chờ nhận lỗi thường thay vì bị huỷ theo.
+    """
+    future.set_exception(error if isinstance(error, Exception) else RuntimeError("Yêu cầu Gemini bị huỷ"))
+    future.exception()  # tránh cảnh báo "exception was never retrieved" khi không ai chờ
 
 
 # ======= Hàm chính hỏi Gemini =======
 async def ask_gemini(prompt: str) -> str:
+    """
+    Hỏi Gemini có cache:
+    - Prompt giống nhau (cùng model) → trả lời từ cache (TTL + LRU, tuỳ chọn ghi đĩa qua GEMINI_CACHE_DIR)
+    - Nhiều request cùng prompt đến cùng lúc → chỉ 1 request thật tới Gemini, các request khác chờ kết quả
+    - Câu trả lời lỗi (⚠️ ...) không được cache
+    """
+    key = _cache_key(prompt)
+    cached = await _cached_reply(key)
+    if cached is not None:
+        print("⚡ [ask_gemini] Cache hit")
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        reply, ok = await _request_gemini(prompt)
+        if ok:
+            await _store_reply(key, reply)
+        future.set_result(reply)
+        return reply
+    except BaseException as e:
+        _fail_inflight(future, e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def stream_gemini(prompt: str) -> AsyncIterator[str]:
+    """
+    Giống ask_gemini nhưng trả từng đoạn text ngay khi Gemini sinh ra (streamGenerateContent, SSE):
+    - Cache hit → trả nguyên câu trả lời trong 1 đoạn
+    - Prompt đang được hỏi bởi request khác → chờ kết quả đó rồi trả 1 đoạn
+    - Stream xong và không lỗi → câu trả lời đầy đủ được cache như ask_gemini
+    """
+    key = _cache_key(prompt)
+    cached = await _cached_reply(key)
+    if cached is not None:
+        print("⚡ [stream_gemini] Cache hit")
+        yield cached
+        return
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        yield await asyncio.shield(pending)
+        return
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        reply, ok = "", True
+        async for text, chunk_ok in _stream_request_gemini(prompt):
+            ok = ok and chunk_ok
+            reply += text
+            yield text
+        reply = reply.strip()
+        if ok and reply:
+            await _store_reply(key, reply)
+        future.set_result(reply)
+    except BaseException as e:
+        # Client ngắt stream giữa chừng → request đang chờ nhận lỗi thay vì treo
+        _fail_inflight(future, e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+async def _stream_request_gemini(prompt: str) -> AsyncIterator[Tuple[str, bool]]:
+    """Gọi Gemini dạng stream. Yield (text, ok) — ok=False khi text là thông báo lỗi."""
+    headers = {"Content-Type": "application/json"}
+    body = {"contents": [{"parts": [{"text": prompt}]}]}
+
+    print("🔹 [stream_gemini] Đang stream từ:", GEMINI_STREAM_URL)
+    received = False
+    try:
+        async with _get_client().stream("POST", GEMINI_STREAM_URL, headers=headers, json=body) as response:
+            if response.status_code >= 400:
+                detail = (await response.aread()).decode("utf-8", "replace")
+                print(f"❌ [stream_gemini] HTTP error: {response.status_code} - {detail}")
+                yield f"⚠️ Lỗi HTTP {response.status_code}: {detail}", False
+                return
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    data = json.loads(line[5:])
+                except ValueError:
+                    continue
+                candidates = data.get("candidates") or [{}]
+                for part in candidates[0].get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        received = True
+                        yield part["text"], True
+
+        if not received:
+            yield "⚠️ Gemini không có nội dung phản hồi.", False
+
+    except httpx.RequestError as e:
+        print(f"❌ [stream_gemini] Request error (mất kết nối?): {e}")
+        yield f"⚠️ Không thể kết nối đến Gemini API: {e}", False
+
+
+async def _request_gemini(prompt: str):
+    """Gọi Gemini thật. Trả về (reply, ok) — ok=False khi reply là thông báo lỗi."""
     headers = {"Content-Type": "application/json"}
     body = {
         "contents": [
@@ -34,36 +228,35 @@ async def ask_gemini(prompt: str) -> str:
     print("🔹 [ask_gemini] Đang gửi yêu cầu đến:", GEMINI_API_URL)
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(GEMINI_API_URL, headers=headers, json=body)
+        response = await _get_client().post(GEMINI_API_URL, headers=headers, json=body)
 
-            print(f"✅ [ask_gemini] Status code: {response.status_code}")
-            response.raise_for_status()
+        print(f"✅ [ask_gemini] Status code: {response.status_code}")
+        response.raise_for_status()
 
-            data = response.json()
-            print("✅ [ask_gemini] Phản hồi nhận được:")
-            print(data)
+        data = response.json()
+        print("✅ [ask_gemini] Phản hồi nhận được:")
+        print(data)
 
-            # Lấy phần phản hồi từ candidates
-            candidates = data.get("candidates", [])
-            if not candidates:
-                return "⚠️ Gemini không trả lời được. Vui lòng thử lại."
+        # Lấy phần phản hồi từ candidates
+        candidates = data.get("candidates", [])
+        if not candidates:
+            return "⚠️ Gemini không trả lời được. Vui lòng thử lại.", False
 
-            parts = candidates[0].get("content", {}).get("parts", [])
-            if not parts or "text" not in parts[0]:
-                return "⚠️ Gemini không có nội dung phản hồi."
+        parts = candidates[0].get("content", {}).get("parts", [])
+        if not parts or "text" not in parts[0]:
+            return "⚠️ Gemini không có nội dung phản hồi.", False
 
-            reply = parts[0]["text"]
-            return reply.strip()
+        reply = parts[0]["text"]
+        return reply.strip(), True
 
     except httpx.HTTPStatusError as e:
         print(f"❌ [ask_gemini] HTTP error: {e.response.status_code} - {e.response.text}")
-        return f"⚠️ Lỗi HTTP {e.response.status_code}: {e.response.text}"
+        return f"⚠️ Lỗi HTTP {e.response.status_code}: {e.response.text}", False
 
     except httpx.RequestError as e:
         print(f"❌ [ask_gemini] Request error (mất kết nối?): {e}")
-        return f"⚠️ Không thể kết nối đến Gemini API: {e}"
+        return f"⚠️ Không thể kết nối đến Gemini API: {e}", False
 
     except Exception as e:
         print(f"❌ [ask_gemini] Exception khác: {str(e)}")
-        return f"⚠️ Lỗi nội bộ khi gửi yêu cầu Gemini: {str(e)}"
\ No newline at end of file
+        return f"⚠️ Lỗi nội bộ khi gửi yêu cầu Gemini: {str(e)}", False
\ No newline at end of file
@@ -0,0 +1,10 @@
+# utils/http_cache.py - so khớp header conditional GET
+from typing import Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match: danh sách ETag cách nhau bởi dấu phẩy hoặc "*"; so sánh yếu (bỏ tiền tố W/)."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
@@ -0,0 +1,84 @@
+# utils/media_validator.py - kiểm tra URL media (audio / cover) không chặn event loop
+import os
+import asyncio
+import httpx
+from typing import List, Optional
+from utils.ttl_cache import TTLCache
+
+MEDIA_URL_TIMEOUT = float(os.getenv("MEDIA_URL_TIMEOUT", "5"))
+VERIFIED_TTL = float(os.getenv("MEDIA_URL_CACHE_TTL", "3600"))
+VERIFIED_SIZE = int(os.getenv("MEDIA_URL_CACHE_SIZE", "4096"))
+
+# Server không hỗ trợ HEAD (hoặc ký URL riêng cho GET) → thử lại bằng GET lấy 1 byte
+HEAD_FALLBACK_STATUS = {403, 405, 501}
+
+
+class MediaValidator:
+    """
+    URL hợp lệ khi trả về 2xx cho HEAD (hoặc GET Range: bytes=0-0 nếu HEAD bị từ chối) — không tải cả file.
+    - Dùng chung 1 httpx.AsyncClient (pool keep-alive), nhiều URL được kiểm tra song song
+    - URL đã kiểm tra OK được nhớ VERIFIED_TTL giây: lưu lại bài hát không phải kiểm tra lại
+      (URL lỗi không được nhớ để người dùng sửa xong là kiểm tra lại ngay)
+    """
+
+    def __init__(self):
+        self._verified = TTLCache(maxsize=VERIFIED_SIZE, ttl=VERIFIED_TTL)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=MEDIA_URL_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def is_accessible(self, url: str) -> bool:
+        if not url:
+            return True
+        if self._verified.get(url):
+            return True
+        ok = await self._probe(url)
+        if ok:
+            self._verified.set(url, True)
+        return ok
+
+    def mark_verified(self, url: str):
+        """URL vừa được chính app upload lên → không cần kiểm tra lại khi lưu bài hát."""
+        if url:
+            self._verified.set(url, True)
+
+    async def inaccessible(self, *urls: Optional[str]) -> List[str]:
+        """Các URL (khác rỗng) không truy cập được, giữ thứ tự đầu vào."""
+        urls = [url for url in dict.fromkeys(urls) if url]
+        results = await asyncio.gather(*(self.is_accessible(url) for url in urls))
+        return [url for url, ok in zip(urls, results) if not ok]
+
+    async def ensure_song_media(self, *, audio_url: Optional[str] = None, cover_art: Optional[str] = None):
+        """Kiểm tra song song audio + cover của bài hát; URL không truy cập được → ValueError."""
+        inaccessible = await self.inaccessible(audio_url, cover_art)
+        if audio_url and audio_url in inaccessible:
+            raise ValueError("Invalid or inaccessible audio URL")
+        if cover_art and cover_art in inaccessible:
+            raise ValueError("Invalid or inaccessible cover art URL")
+
+    async def _probe(self, url: str) -> bool:
+        client = self._get_client()
+        try:
+            response = await client.head(url)
+            if response.status_code in HEAD_FALLBACK_STATUS:
+                async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                    pass  # chỉ cần status, không đọc body
+            return 200 <= response.status_code < 300
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"URL inaccessible: {url}, error: {str(e)}")
+            return False
+
+
+media_validator = MediaValidator()
@@ -1,13 +1,14 @@
 import re
 import unicodedata
 import difflib
-from utils.gemini_api import ask_gemini
+from services.fuzzy_index import catalog_fuzzy
+from utils.gemini_api import ask_gemini, stream_gemini
 from services.artist_service import ArtistService
 from services.song_service import SongService
 from database.repositories.artist_repository import ArtistRepository
 from database.repositories.song_repository import SongRepository
 from services.album_service import AlbumService
-from database.db import songs_collection, artists_collection, albums_collection
+from services.catalog_cache import catalog_cache
 from database.repositories.album_repository import AlbumRepository
 from services.song_service import SongService
 from utils.text_utils import normalize_text
@@ -61,7 +62,7 @@ def handle_user_input(user_input: str):
         return {
             "type": "song",
             "title": song["title"],
-            "artist": song["artist"],
+            "artist": song.get("artist", ""),
             "coverArt": song.get("coverArt", ""),
             "releaseYear": song.get("releaseYear", ""),
             "link": f"/songs/{song['_id']}"
@@ -78,42 +79,27 @@ def handle_user_input(user_input: str):
 def get_all_artists_simple():
     return artist_service.get_all_artists_simple()
 
-# ======== Lấy dữ liệu từ MongoDB ==========
-try:
-    ARTISTS_DATA = artist_service.get_all_artists_simple()
-except Exception:
-    ARTISTS_DATA = []
-
-try:
-    SONGS_DATA = song_service.get_all_songs_simple()
-except Exception:
-    SONGS_DATA = []
-
-# ======== Tạo danh sách tìm kiếm mềm ==========
-ARTISTS_DATA = list(artists_collection.find({}))
-ARTIST_ENTRIES = [
-    {
-        "artist_id": str(artist["_id"]),
+# ======== Danh sách tìm kiếm mềm (dẫn xuất từ catalog_cache) ==========
+def _artist_entry(artist: dict) -> dict:
+    return {
+        "artist_id": artist["_id"],
         "name": artist.get("name", ""),
         "bio": artist.get("bio", ""),
         "genres": artist.get("genres", []),
         "followers": artist.get("followers", 0),
-        "normalizedName": artist.get("normalizedName", normalize_text(artist["name"])),
+        "normalizedName": artist.get("normalizedName", normalize_text(artist.get("name", ""))),
         "url": f"http://localhost:3000/artist/{artist['_id']}",
         "image": artist.get("image", ""),
         "keywords": (
-            [normalize_text(artist["name"])] +
-            [normalize_text(artist["name"]).replace(" ", "")]
+            [normalize_text(artist.get("name", ""))] +
+            [normalize_text(artist.get("name", "")).replace(" ", "")]
         ),
     }
-    for artist in ARTISTS_DATA
-]
-
-SONGS_DATA = list(songs_collection.find({}))
-SONG_ENTRIES = [
-    {
-        "type": "song", 
-        "song_id": str(song["_id"]),
+
+def _song_entry(song: dict) -> dict:
+    return {
+        "type": "song",
+        "song_id": song["_id"],
         "title": song.get("title", ""),
         "artist": song.get("artist", ""),
         "artistId": str(song.get("artistId", "")),
@@ -121,26 +107,55 @@ SONG_ENTRIES = [
         "releaseYear": song.get("releaseYear", ""),
         "duration": song.get("duration", ""),
         "genres": song.get("genre", []),
-        "lyrics": song.get("lyrics_lrc", ""),
         "audioUrl": song.get("audioUrl", ""),
         "image": song.get("coverArt", ""),
         "url": f"http://localhost:3000/song/{song['_id']}",
         "keywords": (
-            [normalize_text(song["title"])] +
-            [normalize_text(song["title"]).replace(" ", "")]
+            [normalize_text(song.get("title", ""))] +
+            [normalize_text(song.get("title", "")).replace(" ", "")]
         ),
     }
-    for song in SONGS_DATA
-]
 
-# ======== Quản lý thể loại ==========
-ALL_GENRES = set()
-for song in SONG_ENTRIES:
-    for genre in song["genres"]:
-        ALL_GENRES.add(normalize_text(genre))  # chuẩn hóa chữ thường, không dấu
+def _album_entry(album: dict) -> dict:
+    return {
+        "title": album.get("title", ""),
+        "album_id": album["_id"],
+        "artist_id": str(album.get("artist_id", "")),
+        "release_year": album.get("release_year", ""),
+        "cover_image": album.get("cover_image", ""),
+        "url": f"http://localhost:3000/album/{album['_id']}",
+        "keywords": [normalize_text(album.get("title", ""))],
+        "image": album.get("cover_image", ""),
+    }
 
+_ENTRY_BUILDERS = {"artists": _artist_entry, "songs": _song_entry, "albums": _album_entry}
+_entries_cache = {}  # kind -> (catalog version, entries)
+
+def get_entries(kind: str) -> list:
+    """Entry cho chatbot, chỉ dựng lại khi catalog của kind đó thay đổi."""
+    version = catalog_cache.version(kind)
+    cached = _entries_cache.get(kind)
+    if cached and cached[0] == version:
+        return cached[1]
+    entries = [_ENTRY_BUILDERS[kind](doc) for doc in catalog_cache.all(kind)]
+    _entries_cache[kind] = (version, entries)
+    return entries
+
+def get_entry(kind: str, record_id: str) -> dict:
+    record = catalog_cache.get(kind, record_id)
+    return _ENTRY_BUILDERS[kind](record) if record else None
+
+def find_artist(artist_id: str = "", name: str = "") -> dict:
+    artist = catalog_cache.get("artists", artist_id) if artist_id else None
+    if artist or not name:
+        return artist
+    name = name.lower()
+    return next((a for a in catalog_cache.all("artists") if a.get("name", "").lower() == name), None)
+
+# ======== Quản lý thể loại ==========
 def count_all_genres():
-    return len(ALL_GENRES), list(ALL_GENRES)
+    all_genres = {normalize_text(genre) for song in get_entries("songs") for genre in song["genres"]}
+    return len(all_genres), list(all_genres)
 
 GENRE_NORMALIZATION_MAP = {
     "sôi động": ["dance", "dance-pop", "pop", "remix", "electronic", "EDM"],
@@ -156,25 +171,10 @@ def get_songs_by_genre(query_genre: str):
     normalized_query = normalize_text(query_genre)
     mapped_keywords = GENRE_NORMALIZATION_MAP.get(normalized_query, [normalized_query])
     return [
-        song for song in SONG_ENTRIES
+        song for song in get_entries("songs")
         if any(normalize_text(genre) in mapped_keywords for genre in song["genres"])
     ]
 
-albums = list(albums_collection.find({}))
-ALBUM_ENTRIES = [
-    {
-        "title": album.get("title", ""),
-        "album_id": str(album.get("_id", "")),
-        "artist_id": str(album.get("artist_id", "")),
-        "release_year": album.get("release_year", ""),
-        "cover_image": album.get("cover_image", ""),
-        "url": f"http://localhost:3000/album/{str(album['_id'])}",
-        "keywords": [normalize_text(album.get("title", ""))],
-        "image": album.get("cover_image", ""),
-    }
-    for album in albums
-]
-
 # ======== Câu hỏi định nghĩa sẵn ==========
 CUSTOM_RESPONSES = {
     "creator": {
@@ -215,8 +215,32 @@ CUSTOM_RESPONSES = {
     },
 }
 
+async def _stream_gemini_or(prompt: str, fallback: str):
+    """Stream câu trả lời Gemini; lỗi trước khi có đoạn nào → trả fallback."""
+    sent = False
+    try:
+        async for chunk in stream_gemini(prompt):
+            sent = True
+            yield chunk
+    except Exception as e:
+        print("Gemini error:", e)
+        if not sent:
+            yield fallback
+
+
 # ========== HÀM XỬ LÝ CHÍNH ==========
-async def handle_user_question(prompt: str) -> str:
+async def handle_user_question(prompt: str):
+    """Câu trả lời đầy đủ (None nếu không hiểu câu hỏi)."""
+    reply = "".join([chunk async for chunk in stream_user_question(prompt)])
+    return reply or None
+
+
+async def stream_user_question(prompt: str):
+    """
+    Trả lời theo từng đoạn để route stream ngay cho client:
+    phần có sẵn (ảnh, danh sách) được gửi trước, phần Gemini gửi theo từng token, link / gợi ý gửi sau cùng.
+    Không yield gì nếu không hiểu câu hỏi.
+    """
     norm_prompt = normalize_text(prompt)
     language = detect_language(prompt)
 
@@ -224,11 +248,13 @@ async def handle_user_question(prompt: str) -> str:
     for group in CUSTOM_RESPONSES.values():
         for question in group["questions"]:
             if normalize_text(question) in norm_prompt:
-                return group["answer_vi"] if language == "vi" else group["answer_en"]
+                yield group["answer_vi"] if language == "vi" else group["answer_en"]
+                return
 
     # 2. Trả lời câu hỏi đếm số bài hát
     if any(kw in prompt.lower() for kw in ["bao nhiêu bài", "tổng số bài", "có bao nhiêu nhạc", "số lượng bài hát"]):
-        return f"🎧 Hệ thống hiện có tổng cộng {len(SONG_ENTRIES)} bài hát."
+        yield f"🎧 Hệ thống hiện có tổng cộng {catalog_cache.count('songs')} bài hát."
+        return
 
     # 3. Nhận diện câu hỏi về thể loại/tâm trạng
     GENRE_MAPPINGS = {
@@ -247,7 +273,8 @@ async def handle_user_question(prompt: str) -> str:
             genre_matched = True
             matched_songs = get_songs_by_genre(genre_key)
             if not matched_songs:
-                return f"😥 Hiện không tìm thấy bài hát thuộc thể loại **{genre_key}**."
+                yield f"😥 Hiện không tìm thấy bài hát thuộc thể loại **{genre_key}**."
+                return
             reply = "\n\n🎵 " + (
                 f"Một số bài hát thuộc thể loại **{genre_key}** bạn có thể thích:" if language == "vi"
                 else f"Some songs in the **{genre_key}** genre you might enjoy:"
@@ -264,7 +291,8 @@ async def handle_user_question(prompt: str) -> str:
                         break
                 if count >= 10:
                     break
-            return reply
+            yield reply
+            return
 
     # 4. Enrich prompt nếu quá ngắn
     MUSIC_KEYWORDS = [normalize_text(w) for w in ["bài hát", "ca sĩ", "nhạc", "nghệ sĩ", "album", "song", "artist", "music"]]
@@ -277,24 +305,18 @@ async def handle_user_question(prompt: str) -> str:
 
     # 5. Xác định loại câu hỏi: bài hát / nghệ sĩ / album
     if any(key in norm_prompt for key in ["album", "list", "những", "nhiều bài", "nhiều", "tên album"]):
-        search_entries = ALBUM_ENTRIES
+        search_kinds = ["albums"]
     else:
-        search_entries = ARTIST_ENTRIES + SONG_ENTRIES
-
-    # 6. So khớp gần đúng
-    def get_similarity(a, b):
-        if b in a or a in b:
-            return 1.0
-        return difflib.SequenceMatcher(None, a, b).ratio()
+        search_kinds = ["artists", "songs"]
 
+    # 6. So khớp gần đúng (trigram index, keyword nằm trong câu hỏi được tính 1.0)
     best_entry = None
     best_score = 0.0
-    for entry in search_entries:
-        for keyword in entry["keywords"]:
-            score = get_similarity(norm_prompt, keyword)
-            if score > best_score:
-                best_score = score
-                best_entry = entry
+    for kind in search_kinds:
+        hits = catalog_fuzzy.search(kind, norm_prompt, limit=1, cutoff=0.6, containment=True)
+        if hits and hits[0][0] > best_score:
+            best_score = hits[0][0]
+            best_entry = get_entry(kind, hits[0][1]["_id"])
 
     # 7. Nếu khớp dữ liệu nghệ sĩ, bài hát, hoặc album
     if best_entry and best_score >= 0.6:
@@ -313,9 +335,13 @@ async def handle_user_question(prompt: str) -> str:
             song_keywords = ["danh sách", "những bài", "list", "nhiều bài", "playlist", "các bài", "nghe nhạc"]
             is_asking_for_songs = any(kw in prompt.lower() for kw in song_keywords)
 
+            # Ảnh gửi trước khi chờ Gemini
+            if artist_image:
+                yield f"![Ảnh nghệ sĩ]({artist_image})\n\n"
+
             # Nếu người dùng hỏi về danh sách bài hát → không cần hỏi Gemini
             if is_asking_for_songs:
-                reply_text = (
+                yield (
                     f"Dưới đây là danh sách một số bài hát nổi bật của nghệ sĩ {artist_name}:"
                     if language == "vi" else
                     f"Here are some featured songs by artist {artist_name}:"
@@ -331,16 +357,11 @@ async def handle_user_question(prompt: str) -> str:
                     if artist_bio else
                     f"Introduce the artist {artist_name}."
                 )
-                try:
-                    reply_text = await ask_gemini(extra_info)
-                except Exception:
-                    reply_text = extra_info  # fallback nếu lỗi Gemini
+                async for chunk in _stream_gemini_or(extra_info, extra_info):  # fallback nếu lỗi Gemini
+                    yield chunk
 
-            # Bắt đầu khởi tạo phần trả lời
+            # Phần link + danh sách bài hát
             reply = ""
-            if artist_image:
-                reply += f"![Ảnh nghệ sĩ]({artist_image})\n\n"
-            reply += reply_text
             if artist_url:
                 reply += (
                     f"\n\n👉 Bạn có thể xem thêm về nghệ sĩ: [{artist_name}]({artist_url})"
@@ -350,14 +371,16 @@ async def handle_user_question(prompt: str) -> str:
 
             # Luôn tìm danh sách bài hát dù câu hỏi là gì
             songs_by_artist = [
-                s for s in SONG_ENTRIES
+                s for s in get_entries("songs")
                 if s["artist"].lower() == artist_name.lower() or s.get("artistId", "") == artist_id
             ]
             if songs_by_artist:
                 reply += "\n\n🎵 " + ("Một số bài hát nổi bật:" if language == "vi" else "Some featured songs:") + "\n"
                 for s in songs_by_artist[:5]:  # giới hạn 5 bài
                     reply += f"- [{s['title']}]({s['url']})\n"
-            return reply
+            if reply:
+                yield reply
+            return
 
         elif best_entry.get("type") == "song":  # Song
             song_title = best_entry.get("title", "bài hát không rõ")
@@ -367,10 +390,9 @@ async def handle_user_question(prompt: str) -> str:
             artist_bio = ""
 
             # Tìm tiểu sử nghệ sĩ nếu có
-            for a in ARTISTS_DATA:
-                if a["name"].lower() == artist_name.lower() or str(a["_id"]) == best_entry.get("artistId", ""):
-                    artist_bio = a.get("bio", "").strip()
-                    break
+            artist = find_artist(best_entry.get("artistId", ""), artist_name)
+            if artist:
+                artist_bio = (artist.get("bio") or "").strip()
 
             # Cắt tiểu sử nếu quá dài
             if artist_bio:
@@ -399,24 +421,18 @@ async def handle_user_question(prompt: str) -> str:
                     f"Describe the song '{song_title}'."
                 )
 
-            # Gọi Gemini
-            try:
-                reply = await ask_gemini(extra_info)
-            except Exception:
-                reply = extra_info
-
-            # Trả về phần markdown
-            response = ""
+            # Trả về phần markdown: ảnh → Gemini → link nghe
             if best_entry.get("image"):
-                response += f"![Ảnh bài hát]({best_entry['image']})\n\n"
-            response += reply
+                yield f"![Ảnh bài hát]({best_entry['image']})\n\n"
+            async for chunk in _stream_gemini_or(extra_info, extra_info):
+                yield chunk
             if song_id:
-                response += (
+                yield (
                     f"\n\n👉 Nghe bài hát: [{song_title}](http://localhost:3000/song/{song_id})"
                     if language == "vi" else
                     f"\n\n👉 Listen to the song: [{song_title}](http://localhost:3000/song/{song_id})"
                 )
-            return response
+            return
 
         elif "album_id" in best_entry:  # Album
             album_title = best_entry.get("title", "album không rõ")
@@ -424,11 +440,8 @@ async def handle_user_question(prompt: str) -> str:
             artist_id = best_entry.get("artist_id", "")
             
             # Tìm tên nghệ sĩ
-            artist_name = ""
-            for artist in ARTISTS_DATA:
-                if str(artist["_id"]) == artist_id:
-                    artist_name = artist["name"]
-                    break
+            artist = find_artist(artist_id)
+            artist_name = artist.get("name", "") if artist else ""
 
             # Tạo prompt enrich
             extra_info = (
@@ -437,25 +450,22 @@ async def handle_user_question(prompt: str) -> str:
                 f"Tell me about the album '{album_title}' by artist {artist_name}, released in {release_year}."
             )
 
-            enriched_prompt = extra_info
-            try:
-                reply = await ask_gemini(enriched_prompt)
-            except Exception as e:
-                print("Gemini error:", e)
-                reply = (
-                    f"Album **{album_title}** của ca sĩ **{artist_name}** phát hành năm {release_year}."
-                    if language == "vi" else
-                    f"The album **{album_title}** by artist **{artist_name}**, released in {release_year}."
-                )
+            fallback = (
+                f"Album **{album_title}** của ca sĩ **{artist_name}** phát hành năm {release_year}."
+                if language == "vi" else
+                f"The album **{album_title}** by artist **{artist_name}**, released in {release_year}."
+            )
 
             # Chèn ảnh album nếu có
             if best_entry.get("image"):
-                reply = f"![Ảnh album]({best_entry['image']})\n\n" + reply
+                yield f"![Ảnh album]({best_entry['image']})\n\n"
+
+            async for chunk in _stream_gemini_or(extra_info, fallback):
+                yield chunk
 
             # Chèn link xem album nếu có
-            reply += (
+            yield (
                 f"\n\n👉 Bạn có thể xem thêm về album: [{album_title}]({best_entry['url']})"
                 if language == "vi" else
                 f"\n\n👉 You can learn more about the album: [{album_title}]({best_entry['url']})"
-            )
-            return reply
\ No newline at end of file
+            )
\ No newline at end of file
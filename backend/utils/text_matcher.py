@@ -1,5 +1,24 @@
-from difflib import get_close_matches
+from functools import lru_cache
+from typing import Tuple
+from services.fuzzy_index import FuzzyIndex, catalog_fuzzy
+from utils.text_utils import normalize_text
 
-def fuzzy_match_artist_name(input_name: str, artist_names: list, cutoff=0.75):
-    matches = get_close_matches(input_name, artist_names, n=1, cutoff=cutoff)
-    return matches[0] if matches else None
+
+@lru_cache(maxsize=64)
+def _names_index(artist_names: Tuple[str, ...]) -> FuzzyIndex:
+    # Cùng 1 danh sách (vd. get_similar_artists của cùng tên) → dùng lại index đã dựng
+    index = FuzzyIndex()
+    for i, name in enumerate(artist_names):
+        index.add(str(i), [normalize_text(name)])
+    return index
+
+
+def fuzzy_match_artist_name(input_name: str, artist_names: list = None, cutoff=0.75):
+    # Không truyền danh sách → tìm trên index nghệ sĩ của catalog
+    if artist_names is None:
+        artist = catalog_fuzzy.best("artists", input_name, cutoff=cutoff)
+        return artist.get("name") if artist else None
+
+    artist_names = tuple(artist_names)
+    matches = _names_index(artist_names).search(input_name, limit=1, cutoff=cutoff)
+    return artist_names[int(matches[0][1])] if matches else None
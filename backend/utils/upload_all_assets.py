@@ -1,5 +1,20 @@
 import os
-from cloudinary_upload import upload_audio, upload_image  # cùng thư mục
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from urllib.parse import unquote, urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Chạy được cả dạng `python utils/upload_all_assets.py` lẫn `python -m utils.upload_all_assets` (từ backend/)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pymongo import UpdateOne
+from database.db import songs_collection, artists_collection
+from services.media_upload import media_upload
+from utils.text_utils import normalize_text
 
 # ✅ Lấy đường dẫn gốc dự án
 base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -7,26 +22,205 @@ base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 # ✅ Đường dẫn mới theo vị trí thực tế trong frontend/public/
 artist_folder = os.path.join(base_dir, "frontend", "public", "Artist")
 audio_folder = os.path.join(base_dir, "frontend", "public", "audioMusic")
+cover_folder = os.path.join(base_dir, "frontend", "public", "image")
+
+MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "asset_manifest.json")
+WORKERS = int(os.getenv("ASSET_UPLOAD_WORKERS", "4"))
+RETRIES = int(os.getenv("ASSET_UPLOAD_RETRIES", "3"))
+FLUSH_EVERY = 20  # ghi manifest sau mỗi N file
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".wav", ".ogg", ".flac")
+
+# target -> (thư mục mặc định, kind, đuôi file, collection, field)
+TARGETS = {
+    "artist_images": (artist_folder, "image", IMAGE_EXTENSIONS, "artists", "image"),
+    "song_covers": (cover_folder, "image", IMAGE_EXTENSIONS, "songs", "coverArt"),
+    "song_audio": (audio_folder, "audio", AUDIO_EXTENSIONS, "songs", "audioUrl"),
+}
+
+
+def _asset_key(text: str) -> str:
+    """'Den- Vau.jpg', 'Đen Vâu', '.../Den-%20Vau.jpg' → 'denvau'"""
+    stem = os.path.splitext(os.path.basename(unquote(text or "")))[0]
+    return normalize_text(stem.replace("đ", "d").replace("Đ", "D")).replace(" ", "").replace("_", "")
+
+
+class Manifest:
+    """
+    File JSON chạy tiếp được:
+    - files:  đường dẫn -> {size, mtime, sha256}  (file không đổi thì không cần băm lại)
+    - assets: sha256 -> {url, kind}               (nội dung đã upload thì không upload lại)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self.data = {"files": {}, "assets": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def lookup(self, file_path: str):
+        """URL đã upload nếu file chưa đổi kể từ lần chạy trước, ngược lại None."""
+        stat = os.stat(file_path)
+        entry = self.data["files"].get(file_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            asset = self.data["assets"].get(entry["sha256"])
+            return asset["url"] if asset else None
+        return None
+
+    def record(self, file_path: str, result: dict, kind: str):
+        stat = os.stat(file_path)
+        with self._lock:
+            self.data["files"][file_path] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": result["sha256"]}
+            self.data["assets"][result["sha256"]] = {"url": result["url"], "kind": kind}
+            self._dirty += 1
+            if self._dirty >= FLUSH_EVERY:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
 
-# ✅ Upload ảnh nghệ sĩ
-def upload_all_images():
-    print("🚀 Uploading artist images...")
-    print("🔎 Looking for folder:", artist_folder)
+def _list_files(folder: str, extensions) -> list:
+    folder = os.path.abspath(folder)
+    if not os.path.isdir(folder):
+        print("❌ Folder not found:", folder)
+        return []
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names if name.lower().endswith(extensions)
+    )
+
+
+def _upload_with_retry(file_path: str, kind: str, retries: int) -> dict:
+    for attempt in range(1, retries + 1):
+        try:
+            with open(file_path, "rb") as f:
+                return media_upload.upload_file(f, os.path.basename(file_path), kind)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = 2 ** attempt
+            print(f"⚠️ {os.path.basename(file_path)}: {e} — retry {attempt}/{retries - 1} in {delay}s")
+            time.sleep(delay)
+
+
+def upload_files(jobs: list, manifest: Manifest, workers: int = WORKERS, retries: int = RETRIES) -> dict:
+    """jobs: [(target, file_path, kind)] → {(target, file_path): url}; file không đổi lấy URL từ manifest."""
+    urls, pending = {}, []
+    for target, file_path, kind in jobs:
+        url = manifest.lookup(file_path)
+        if url:
+            urls[(target, file_path)] = url
+        else:
+            pending.append((target, file_path, kind))
+    print(f"🚀 {len(pending)} to upload, {len(urls)} unchanged (manifest), {workers} workers")
+
+    failed = 0
     try:
-        for filename in os.listdir(artist_folder):
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                file_path = os.path.join(artist_folder, filename)
-                url = upload_image(file_path)
-                if url:
-                    print(f"✅ {filename} → {url}")
-                else:
-                    print(f"❌ Failed: {filename}")
-    except FileNotFoundError:
-        print("❌ Folder not found:", artist_folder)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asset-upload") as pool:
+            futures = {
+                pool.submit(_upload_with_retry, file_path, kind, retries): (target, file_path, kind)
+                for target, file_path, kind in pending
+            }
+            for future in as_completed(futures):
+                target, file_path, kind = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Failed: {os.path.basename(file_path)} ({e})")
+                    continue
+                manifest.record(file_path, result, kind)
+                urls[(target, file_path)] = result["url"]
+                print(f"✅ {os.path.basename(file_path)} → {result['url']}" + (" (dedup)" if result["deduplicated"] else ""))
+    finally:
+        manifest.save()
+    print(f"📦 uploaded/known {len(urls)}, failed {failed}")
+    return urls
 
-# ✅ Upload file audio
 
+def _match_documents(collection, name_field: str, url_fields: list) -> dict:
+    """asset key -> _id, khớp theo tên (title / name) hoặc tên file trong URL hiện tại."""
+    keys = {}
+    projection = {name_field: 1, **{field: 1 for field in url_fields}}
+    for doc in collection.find({}, projection):
+        for field in url_fields:
+            if doc.get(field):
+                keys.setdefault(_asset_key(urlparse(str(doc[field])).path), doc["_id"])
+        if doc.get(name_field):
+            keys.setdefault(_asset_key(doc[name_field]), doc["_id"])
+    return keys
 
-if __name__ == "__main__":
-    upload_all_images()
 
+def update_documents(urls: dict) -> dict:
+    """Gom URL theo document rồi cập nhật mỗi collection bằng đúng 1 bulk_write."""
+    now = datetime.utcnow()
+    lookups = {
+        "songs": _match_documents(songs_collection, "title", ["audioUrl", "coverArt"]),
+        "artists": _match_documents(artists_collection, "name", ["image"]),
+    }
+    updates = {"songs": {}, "artists": {}}
+    unmatched = []
+    for (target, file_path), url in urls.items():
+        _, _, _, collection, field = TARGETS[target]
+        doc_id = lookups[collection].get(_asset_key(file_path))
+        if doc_id is None:
+            unmatched.append(os.path.basename(file_path))
+            continue
+        updates[collection].setdefault(doc_id, {})[field] = url
+
+    summary = {}
+    for name, collection in (("songs", songs_collection), ("artists", artists_collection)):
+        operations = [
+            UpdateOne({"_id": doc_id}, {"$set": {**fields, "updated_at": now}})
+            for doc_id, fields in updates[name].items()
+        ]
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            summary[name] = result.modified_count
+    for name in unmatched:
+        print(f"⚠️ No song / artist matches {name}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload ảnh nghệ sĩ, cover và audio rồi cập nhật URL trong DB")
+    parser.add_argument("--artists", default=artist_folder, help="thư mục ảnh nghệ sĩ → artists.image")
+    parser.add_argument("--covers", default=cover_folder, help="thư mục cover → songs.coverArt")
+    parser.add_argument("--audio", default=audio_folder, help="thư mục audio → songs.audioUrl")
+    parser.add_argument("--only", choices=list(TARGETS), action="append", help="chỉ chạy 1 (hoặc vài) nhóm")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--no-db", action="store_true", help="chỉ upload, không cập nhật songs / artists")
+    args = parser.parse_args(argv)
+
+    folders = {"artist_images": args.artists, "song_covers": args.covers, "song_audio": args.audio}
+    jobs = []
+    for target in args.only or TARGETS:
+        _, kind, extensions, _, _ = TARGETS[target]
+        print(f"🔎 {target}: {folders[target]}")
+        jobs.extend((target, path, kind) for path in _list_files(folders[target], extensions))
+
+    manifest = Manifest(os.path.abspath(args.manifest))
+    urls = upload_files(jobs, manifest, args.workers, max(1, args.retries))
+    if not args.no_db and urls:
+        print(f"🎉 Updated: {update_documents(urls)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,21 +4,31 @@ import { useEffect, useState } from "react";
 import Image from "next/image";
 import Link from "next/link";
 import { useAuth } from "@/context/auth-context";
+import { fetchHistory } from "@/lib/api/user";
 
 export default function HistoryPage() {
   const { user } = useAuth();
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
+
+  // Tải 1 trang (cursor = null → trang đầu); API trả next_cursor = null khi đã hết lịch sử
+  const loadPage = (cursor) => {
+    setLoading(true);
+    return fetchHistory(user.id, { cursor })
+      .then((data) => {
+        setHistory((prev) => (cursor ? [...prev, ...(data.history || [])] : data.history || []));
+        setNextCursor(data.next_cursor || null);
+      })
+      .catch((err) => {
+        console.error("🔴 Lỗi khi tải lịch sử nghe:", err);
+      })
+      .finally(() => setLoading(false));
+  };
 
   useEffect(() => {
     if (user?.id) {
-      fetch(`http://localhost:8000/api/history/user/${user.id}`)
-        .then((res) => res.json())
-        .then((data) => {
-          setHistory(data.history || []);
-        })
-        .catch((err) => {
-          console.error("🔴 Lỗi khi tải lịch sử nghe:", err);
-        });
+      loadPage(null);
     }
   }, [user]);
 
@@ -60,6 +70,18 @@ export default function HistoryPage() {
           ))}
         </ul>
       )}
+
+      {nextCursor && (
+        <div className="flex justify-center mt-6">
+          <button
+            onClick={() => loadPage(nextCursor)}
+            disabled={loading}
+            className="px-4 py-2 text-sm font-medium border border-gray-300 rounded-lg hover:bg-gray-50 disabled:opacity-50"
+          >
+            {loading ? "Đang tải..." : "Tải thêm"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
@@ -4,6 +4,9 @@ import { useEffect, useState } from "react";
 import Image from "next/image";
 import Link from "next/link";
 import { useAuth } from "@/context/auth-context";
+import { fetchHistory } from "@/lib/api/user";
+
+const PREVIEW_SIZE = 6; // trang chủ chỉ cần trang đầu, xem đầy đủ ở /history
 
 export default function ListeningHistory() {
   const { user } = useAuth();
@@ -12,8 +15,7 @@ export default function ListeningHistory() {
   useEffect(() => {
     if (user?.id) {
       console.log("🟡 Gửi request lịch sử cho user:", user.id);
-      fetch(`http://localhost:8000/api/history/user/${user.id}`)
-        .then((res) => res.json())
+      fetchHistory(user.id, { limit: PREVIEW_SIZE })
         .then((data) => {
           console.log("🟢 Lịch sử nhận được:", data.history);
           setHistory(data.history || []);
@@ -39,7 +41,7 @@ export default function ListeningHistory() {
       </div>
 
       <div className="grid grid-cols-2 sm:grid-cols-3 md:grid-cols-6 gap-4">
-        {history.slice(0, 6).map((item) => (
+        {history.slice(0, PREVIEW_SIZE).map((item) => (
           <Link key={item._id} href={`/song/${item.song_id}`}>
             <div className="group cursor-pointer">
               <div className="aspect-square relative rounded-md overflow-hidden shadow-sm">
@@ -60,8 +60,18 @@ export async function fetchFollowingArtists() {
 }
 
 // lib/api/user.js
-export async function fetchHistory(userId) {
-  const res = await fetch(`http://localhost:8000/api/history/user/${userId}`);
+/**
+ * Fetch 1 trang lịch sử nghe (mới nhất trước)
+ * @param {string} userId
+ * @param {{ cursor?: string, limit?: number }} options - cursor = next_cursor của trang trước
+ * @returns {Promise<{ history: Array, next_cursor: string | null }>}
+ */
+export async function fetchHistory(userId, { cursor, limit } = {}) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (limit) params.set("limit", String(limit));
+  const query = params.toString();
+  const res = await fetch(`http://localhost:8000/api/history/user/${userId}${query ? `?${query}` : ""}`);
   if (!res.ok) throw new Error("Failed to fetch history");
   return await res.json();
 }